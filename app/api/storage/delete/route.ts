@@ -1,6 +1,7 @@
 import { NextResponse } from 'next/server';
 import { Storage } from '@google-cloud/storage';
 import fs from 'fs';
+import { trackRecordingDelete } from '@/lib/storage/recordingsManifest';
 
 // Initialize GCS client with proper error handling
 let storage: Storage;
@@ -82,6 +83,7 @@ export async function POST(request: Request) {
 
     // Delete the file
     await file.delete();
+    await trackRecordingDelete(bucket, filePath);
 
     console.log(`Successfully deleted file: ${filePath}`);
 
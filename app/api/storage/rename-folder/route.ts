@@ -1,5 +1,6 @@
 import { NextResponse } from "next/server";
 import { storage, bucketName } from "../../../../lib/storage/gcs";
+import { rebuildManifest } from "../../../../lib/storage/recordingsManifest";
 
 export async function POST(request: Request) {
   try {
@@ -90,6 +91,11 @@ export async function POST(request: Request) {
         if (file.name === credentialsPath && successful.credentialsUpdated) {
           continue;
         }
+        // The old manifest names the old paths and generations; it is rebuilt below
+        if (file.name === `${oldUsername}/recordings_manifest.json`) {
+          successful.copies++;
+          continue;
+        }
 
         const newPath = file.name.replace(`${oldUsername}/`, `${newUsername}/`);
         const newFile = bucket.file(newPath);
@@ -107,6 +113,13 @@ export async function POST(request: Request) {
       }
     }
 
+    // Index the copied recordings under their new paths
+    try {
+      await rebuildManifest(bucket, newUsername);
+    } catch (error) {
+      console.error(`Failed to rebuild recordings manifest for ${newUsername}:`, error);
+    }
+
     // Explicitly wait for all copy operations to complete before deleting
     console.log(
       `Successfully copied ${successful.copies} out of ${successful.totalFiles} files`,
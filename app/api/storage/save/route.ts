@@ -2,6 +2,7 @@ import { NextResponse } from 'next/server';
 import { Storage } from '@google-cloud/storage';
 import fs from 'fs';
 import path from 'path';
+import { rebuildManifest } from '@/lib/storage/recordingsManifest';
 
 // Initialize GCS client with proper error handling
 let storage: Storage;
@@ -118,6 +119,13 @@ export async function POST(request: Request) {
 
     console.log(`Successfully saved user credentials to ${objectKey} in ${bucketName}`);
 
+    // Start the user with an (empty) recordings index so readers never have to list their folder
+    try {
+      await rebuildManifest(bucket, username);
+    } catch (manifestError) {
+      console.warn(`Could not create recordings manifest for ${username}:`, manifestError);
+    }
+
     return NextResponse.json(
       {
         success: true,
@@ -3,6 +3,7 @@ import { Storage } from '@google-cloud/storage';
 import path from 'path';
 import fs from 'fs';
 import os from 'os';
+import { trackRecordingUpload } from '@/lib/storage/recordingsManifest';
 
 const storage = new Storage();  // Use default credentials
 const bucketName = process.env.GCP_BUCKET_NAME || 'memorial-voices';
@@ -52,6 +53,9 @@ export async function POST(request: Request) {
 
     console.log(`Audio file uploaded successfully to ${destinationPath}`);
 
+    // audio_retriever and create_voice read the per-user recordings index instead of listing
+    await trackRecordingUpload(bucket, file);
+
     return NextResponse.json({
       success: true,
       fileName: filename,
@@ -6,6 +6,7 @@ from typing import List, Optional
 import uvicorn
 from lib.api.gemini import generateGeminiResponse
 from lib.rag.retriever import retrieveContext
+from lib.audio.conversation_history import ConversationHistory
 
 app = FastAPI()
 
@@ -35,11 +36,10 @@ async def process_conversation(conversation: ConversationMessage):
         # Retrieve context from RAG system
         context = await retrieveContext(conversation.userId, conversation.message)
         
-        # Format conversation history
-        formatted_history = "\n\n".join([
-            f"User: {exchange.get('userMessage', '')}\nAI: {exchange.get('aiResponse', '')}"
-            for exchange in (conversation.conversationHistory or [])
-        ])
+        # Format conversation history, folding older exchanges into a summary so
+        # the prompt stays within the token budget however long the session runs
+        history = ConversationHistory.from_exchanges(conversation.conversationHistory)
+        formatted_history = history.format_transcript()
         
         # Create prompt
         prompt = f"""
@@ -0,0 +1,171 @@
+import os
+import time
+import struct
+import asyncio
+import itertools
+from collections import namedtuple
+from metrics import AUDIO_FLOW_WAIT_SECONDS, WS_SEND_SECONDS
+
+AUDIO_CHUNK_SIZE = int(os.getenv('AUDIO_CHUNK_SIZE', '8192'))
+# Frames a client may have outstanding before the server waits for an audio_ack
+AUDIO_CREDIT_WINDOW = int(os.getenv('AUDIO_CREDIT_WINDOW', '16'))
+# Sending pauses while the socket's unsent bytes exceed this
+AUDIO_WRITE_BUFFER_HIGH = int(os.getenv('AUDIO_WRITE_BUFFER_HIGH', str(64 * 1024)))
+AUDIO_PACE_INTERVAL = float(os.getenv('AUDIO_PACE_INTERVAL', '0.01'))
+AUDIO_ACK_TIMEOUT = float(os.getenv('AUDIO_ACK_TIMEOUT', '15'))
+
+# Binary frame: magic, version, flags, stream_id, seq, then the audio payload
+FRAME_HEADER = struct.Struct('!2sBBII')
+FRAME_MAGIC = b'AF'
+FRAME_VERSION = 1
+FLAG_START = 0x01
+FLAG_EOS = 0x02
+FLAG_ABORT = 0x04
+
+AudioFrame = namedtuple('AudioFrame', ['stream_id', 'seq', 'flags', 'payload'])
+
+
+class AudioFlowTimeout(Exception):
+    pass
+
+
+def encode_frame(stream_id, seq, payload, flags=0):
+    return FRAME_HEADER.pack(FRAME_MAGIC, FRAME_VERSION, flags, stream_id, seq) + payload
+
+
+def decode_frame(data):
+    if len(data) < FRAME_HEADER.size:
+        raise ValueError(f"Audio frame too short ({len(data)} bytes)")
+    magic, version, flags, stream_id, seq = FRAME_HEADER.unpack_from(data)
+    if magic != FRAME_MAGIC or version != FRAME_VERSION:
+        raise ValueError(f"Not an audio frame (magic={magic!r}, version={version})")
+    return AudioFrame(stream_id, seq, flags, bytes(data[FRAME_HEADER.size:]))
+
+
+class AudioStreamSender:
+    """Per-connection sender of framed audio streams.
+
+    Each stream is cut into fixed-size frames. A frame is only sent while the
+    client has fewer than `window` unacknowledged frames and the transport's
+    write buffer is below `high_water`, so a slow consumer stalls the sender
+    instead of growing server memory.
+    """
+
+    def __init__(self, websocket, chunk_size=AUDIO_CHUNK_SIZE, window=AUDIO_CREDIT_WINDOW,
+                 high_water=AUDIO_WRITE_BUFFER_HIGH, ack_timeout=AUDIO_ACK_TIMEOUT):
+        self.websocket = websocket
+        self.chunk_size = chunk_size
+        self.window = window
+        self.high_water = high_water
+        self.ack_timeout = ack_timeout
+        self._stream_ids = itertools.count(1)
+        # stream_id -> highest seq acknowledged (cumulative)
+        self._acked = {}
+        self._ack_changed = asyncio.Condition()
+
+    def config(self):
+        return {"chunk_size": self.chunk_size, "window": self.window, "header_bytes": FRAME_HEADER.size}
+
+    def open_stream(self):
+        stream_id = next(self._stream_ids)
+        self._acked[stream_id] = -1
+        return AudioStream(self, stream_id)
+
+    async def handle_ack(self, stream_id, seq):
+        """Record a client's cumulative ack: every frame up to `seq` was received"""
+        if stream_id not in self._acked or not isinstance(seq, int):
+            return
+        async with self._ack_changed:
+            if seq > self._acked[stream_id]:
+                self._acked[stream_id] = seq
+                self._ack_changed.notify_all()
+
+    def _release(self, stream_id):
+        self._acked.pop(stream_id, None)
+
+    async def _wait_for_credit(self, stream_id, seq):
+        if seq - self._acked[stream_id] <= self.window:
+            return
+        start = time.perf_counter()
+        try:
+            async with self._ack_changed:
+                await asyncio.wait_for(
+                    self._ack_changed.wait_for(lambda: seq - self._acked.get(stream_id, seq) <= self.window),
+                    self.ack_timeout
+                )
+        except asyncio.TimeoutError:
+            raise AudioFlowTimeout(f"No audio_ack for stream {stream_id} within {self.ack_timeout}s")
+        finally:
+            AUDIO_FLOW_WAIT_SECONDS.observe(time.perf_counter() - start, reason='credit')
+
+    async def _wait_for_buffer(self):
+        transport = getattr(self.websocket, 'transport', None)
+        if transport is None or transport.get_write_buffer_size() <= self.high_water:
+            return
+        start = time.perf_counter()
+        while transport.get_write_buffer_size() > self.high_water and not transport.is_closing():
+            await asyncio.sleep(AUDIO_PACE_INTERVAL)
+        AUDIO_FLOW_WAIT_SECONDS.observe(time.perf_counter() - start, reason='buffer')
+
+    async def send_frame(self, stream_id, seq, payload, flags):
+        await self._wait_for_credit(stream_id, seq)
+        await self._wait_for_buffer()
+        with WS_SEND_SECONDS.time(kind='audio_frame'):
+            await self.websocket.send(encode_frame(stream_id, seq, payload, flags))
+
+
+class AudioStream:
+    """One framed audio stream; write() arbitrary bytes, then close() to send the EOS frame"""
+
+    def __init__(self, sender, stream_id):
+        self.sender = sender
+        self.stream_id = stream_id
+        self.seq = 0
+        self.bytes_sent = 0
+        self._buffer = bytearray()
+        self._closed = False
+
+    async def _send(self, payload, flags=0):
+        if self.seq == 0:
+            flags |= FLAG_START
+        await self.sender.send_frame(self.stream_id, self.seq, payload, flags)
+        self.seq += 1
+        self.bytes_sent += len(payload)
+
+    async def write(self, data):
+        self._buffer.extend(data)
+        chunk_size = self.sender.chunk_size
+        while len(self._buffer) >= chunk_size:
+            payload = bytes(self._buffer[:chunk_size])
+            del self._buffer[:chunk_size]
+            await self._send(payload)
+
+    async def flush(self):
+        """Send any buffered remainder now as a short frame, e.g. at the end of a sentence"""
+        if self._buffer:
+            payload = bytes(self._buffer)
+            self._buffer.clear()
+            await self._send(payload)
+
+    async def close(self):
+        """Flush the remainder as the final frame, flagged end-of-stream"""
+        if self._closed:
+            return
+        self._closed = True
+        try:
+            await self._send(bytes(self._buffer), FLAG_EOS)
+        finally:
+            self._buffer.clear()
+            self.sender._release(self.stream_id)
+
+    async def abort(self):
+        """Tell the client the stream ends early without the remaining audio"""
+        if self._closed:
+            return
+        self._closed = True
+        self._buffer.clear()
+        try:
+            # Skip flow control: the abort frame must not wait behind a stalled client
+            await self.sender.websocket.send(encode_frame(self.stream_id, self.seq, b"", FLAG_EOS | FLAG_ABORT))
+        finally:
+            self.sender._release(self.stream_id)
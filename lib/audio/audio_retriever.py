@@ -1,14 +1,53 @@
 import os
 import sys
-from google.cloud import storage
+# GCS is imported by the lookups themselves, so the CLI can hand off to the worker service without it
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
-def get_audio_file(user_email: str, question_number: str):
+
+def get_manifest_audio(bucket, user_email, question_number, prefix):
+    """Latest recording for the question via the user's manifest: one small GET instead of listings.
+
+    Returns None when the manifest has nothing for this question, or when the
+    indexed recording has been deleted or replaced; a stale manifest is
+    invalidated so the next write rebuilds it.
+    """
+    from google.api_core.exceptions import NotFound
+    from storage.recordings_manifest import ensure_recordings_manifest, invalidate_recordings_manifest, latest_recording
+
+    manifest = ensure_recordings_manifest(bucket, user_email)
+    entry = (latest_recording(manifest, question_number, prefix, extensions=('.mp3',))
+             or latest_recording(manifest, question_number, prefix))
+    if entry is None:
+        return None
+    blob = bucket.blob(entry["name"])
+    try:
+        audio = blob.download_as_bytes()
+    except NotFound:
+        audio = None
+    if audio is None or (blob.generation is not None and int(blob.generation) != entry["generation"]):
+        print(f"Manifest entry {entry['name']} is stale, listing instead", file=sys.stderr)
+        invalidate_recordings_manifest(bucket, user_email)
+        return None
+    print(f"Found audio file: {entry['name']}", file=sys.stderr)
+    return audio
+
+
+def get_audio_file(user_email: str, question_number: str, storage_client=None):
     try:
-        storage_client = storage.Client.from_service_account_json('google_credentials.json')
+        if storage_client is None:
+            from google.cloud import storage
+            storage_client = storage.Client.from_service_account_json('google_credentials.json')
         bucket = storage_client.bucket('memorial-voices')
         
-        # List files in the user's recordings folder for this question
         prefix = f"{user_email}/recordings/question{question_number}/"
+        try:
+            audio = get_manifest_audio(bucket, user_email, question_number, prefix)
+            if audio is not None:
+                return audio
+        except Exception as e:
+            print(f"Recordings manifest lookup failed, listing instead: {e}", file=sys.stderr)
+
+        # List files in the user's recordings folder for this question
         blobs = bucket.list_blobs(prefix=prefix)
         
         # Filter for MP3 files and get the latest recording
@@ -44,6 +83,12 @@ if __name__ == "__main__":
         print("Usage: audio_retriever.py <user_email> <question_number>")
         sys.exit(1)
         
-    audio_data = get_audio_file(sys.argv[1], sys.argv[2])
+    try:
+        import base64
+        from worker_client import WorkerUnavailable, submit_job
+        result = submit_job('retrieve_audio', {"user_id": sys.argv[1], "question": sys.argv[2]})
+        audio_data = base64.b64decode(result['audio']) if result['audio'] else None
+    except WorkerUnavailable:
+        audio_data = get_audio_file(sys.argv[1], sys.argv[2])
     if audio_data:
         sys.stdout.buffer.write(audio_data)
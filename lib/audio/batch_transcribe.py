@@ -0,0 +1,199 @@
+import os
+import sys
+import json
+import time
+import argparse
+import tempfile
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from google.cloud import storage
+from transcribe import TRANSCRIBE_FALLBACK_ENGINE, get_speech_client, transcribe_file
+
+BATCH_TRANSCRIBE_WORKERS = int(os.getenv('BATCH_TRANSCRIBE_WORKERS', '8'))
+# Recordings decoded and batched together per wav2vec2 pass
+BATCH_TRANSCRIBE_LOCAL_GROUP = int(os.getenv('BATCH_TRANSCRIBE_LOCAL_GROUP', '32'))
+ENGINES = ('speech', 'wav2vec2')
+BUCKET_NAME = os.getenv('GCP_BUCKET_NAME', 'memorial-voices')
+RECORDING_EXTENSIONS = ('.mp3', '.webm', '.wav', '.ogg', '.opus', '.flac')
+SIDECAR_VERSION = 1
+
+
+def recordings_prefix(user_id):
+    return f"{user_id}/recordings/"
+
+
+def sidecar_path(user_id, recording_name, generation):
+    """Transcript location for one generation of a recording; a re-upload gets a new sidecar"""
+    relative = recording_name[len(recordings_prefix(user_id)):]
+    return f"{user_id}/transcripts/{relative}.{generation}.json"
+
+
+def list_recordings(bucket, user_id):
+    return [
+        blob for blob in bucket.list_blobs(prefix=recordings_prefix(user_id))
+        if blob.name.lower().endswith(RECORDING_EXTENSIONS)
+    ]
+
+
+def list_sidecars(bucket, user_id):
+    return {blob.name for blob in bucket.list_blobs(prefix=f"{user_id}/transcripts/")}
+
+
+def write_sidecar(bucket, blob, user_id, transcript, engine):
+    sidecar = {
+        "version": SIDECAR_VERSION,
+        "recording": blob.name,
+        "generation": blob.generation,
+        "transcript": transcript,
+        "engine": engine,
+        "transcribed_at": time.time(),
+    }
+    bucket.blob(sidecar_path(user_id, blob.name, blob.generation)).upload_from_string(
+        json.dumps(sidecar), content_type='application/json'
+    )
+    return sidecar
+
+
+def transcribe_recording(bucket, blob, user_id, speech_client=None, storage_client=None):
+    """Download one recording, transcribe it with Speech and write its sidecar; returns the sidecar payload"""
+    suffix = os.path.splitext(blob.name)[1]
+    with tempfile.NamedTemporaryFile(suffix=suffix) as audio_file:
+        blob.download_to_filename(audio_file.name)
+        # The recording is already in the bucket, so long clips need no staging upload.
+        # Failures are retried locally as a batch by batch_transcribe, not one by one here.
+        transcript = transcribe_file(audio_file.name, client=speech_client, storage_client=storage_client,
+                                     gcs_uri=f"gs://{bucket.name}/{blob.name}", fallback='off')
+    return write_sidecar(bucket, blob, user_id, transcript, 'speech')
+
+
+def transcribe_recordings_locally(bucket, blobs, user_id, workers=BATCH_TRANSCRIBE_WORKERS,
+                                  group_size=BATCH_TRANSCRIBE_LOCAL_GROUP):
+    """Transcribe recordings with wav2vec2, batching clips across recordings.
+
+    Downloads run on a pool; each group of recordings is then decoded and
+    transcribed together. Returns ({recording: transcript}, {recording: error}).
+    """
+    from wav2vec2_transcriber import get_transcriber
+
+    transcriber = get_transcriber()
+    transcripts = {}
+    failed = {}
+    with tempfile.TemporaryDirectory() as workdir, \
+            ThreadPoolExecutor(max_workers=max(1, min(workers, len(blobs)))) as executor:
+        for offset in range(0, len(blobs), group_size):
+            group = blobs[offset:offset + group_size]
+            paths = [os.path.join(workdir, f"{offset + i}{os.path.splitext(blob.name)[1]}")
+                     for i, blob in enumerate(group)]
+            list(executor.map(lambda item: item[0].download_to_filename(item[1]), zip(group, paths)))
+            for blob, path, transcript in zip(group, paths, transcriber.transcribe_files(paths)):
+                os.remove(path)
+                if transcript is None:
+                    failed[blob.name] = "could not decode audio"
+                    continue
+                write_sidecar(bucket, blob, user_id, transcript, 'wav2vec2')
+                transcripts[blob.name] = transcript
+    return transcripts, failed
+
+
+def batch_transcribe(user_id, workers=BATCH_TRANSCRIBE_WORKERS, force=False, storage_client=None,
+                     speech_client=None, bucket_name=BUCKET_NAME, engine='speech', fallback=TRANSCRIBE_FALLBACK_ENGINE):
+    """Transcribe every recording of a user that has no sidecar for its current generation.
+
+    Recordings and sidecars are each listed once; missing transcripts are
+    produced on a bounded pool. engine='wav2vec2' transcribes locally (for
+    bulk backfills); with Speech, recordings it fails on are retried locally
+    when fallback is 'wav2vec2'. Returns counts plus {recording: transcript}
+    for the recordings transcribed in this run.
+    """
+    if engine not in ENGINES:
+        raise ValueError(f"Unknown transcription engine: {engine}")
+    start = time.perf_counter()
+    storage_client = storage_client or storage.Client()
+    bucket = storage_client.bucket(bucket_name)
+
+    recordings = list_recordings(bucket, user_id)
+    existing = set() if force else list_sidecars(bucket, user_id)
+    pending = [blob for blob in recordings if sidecar_path(user_id, blob.name, blob.generation) not in existing]
+    print(f"{user_id}: {len(recordings)} recordings, {len(recordings) - len(pending)} already transcribed",
+          file=sys.stderr)
+
+    transcripts = {}
+    failed = {}
+    if pending and engine == 'speech':
+        speech_client = speech_client or get_speech_client()
+        with ThreadPoolExecutor(max_workers=max(1, min(workers, len(pending)))) as executor:
+            futures = {
+                executor.submit(transcribe_recording, bucket, blob, user_id, speech_client, storage_client): blob
+                for blob in pending
+            }
+            for future in as_completed(futures):
+                blob = futures[future]
+                try:
+                    transcripts[blob.name] = future.result()["transcript"]
+                except Exception as e:
+                    print(f"Error transcribing {blob.name}: {str(e)}", file=sys.stderr)
+                    failed[blob.name] = str(e)
+
+    local = pending if engine == 'wav2vec2' else []
+    if failed and fallback == 'wav2vec2':
+        print(f"Retrying {len(failed)} recordings with wav2vec2", file=sys.stderr)
+        local = [blob for blob in pending if blob.name in failed]
+    if local:
+        try:
+            local_transcripts, local_failed = transcribe_recordings_locally(bucket, local, user_id, workers)
+            for name in local_transcripts:
+                failed.pop(name, None)
+            transcripts.update(local_transcripts)
+            failed.update(local_failed)
+        except Exception as e:
+            print(f"Error transcribing locally: {str(e)}", file=sys.stderr)
+            failed.update({blob.name: str(e) for blob in local if blob.name not in failed})
+
+    return {
+        "user_id": user_id,
+        "engine": engine,
+        "recordings": len(recordings),
+        "cached": len(recordings) - len(pending),
+        "transcribed": len(transcripts),
+        "failed": failed,
+        "elapsed": round(time.perf_counter() - start, 3),
+        "transcripts": transcripts,
+    }
+
+
+def get_transcript(user_id, recording_name, generation=None, storage_client=None, bucket_name=BUCKET_NAME):
+    """Cached transcript for a recording, or None if it hasn't been transcribed at this generation"""
+    storage_client = storage_client or storage.Client()
+    bucket = storage_client.bucket(bucket_name)
+    if generation is None:
+        blob = bucket.get_blob(recording_name)
+        if blob is None:
+            return None
+        generation = blob.generation
+    sidecar = bucket.blob(sidecar_path(user_id, recording_name, generation))
+    try:
+        return json.loads(sidecar.download_as_bytes())["transcript"]
+    except Exception:
+        return None
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Transcribe all of a user's recordings, caching transcripts in GCS")
+    parser.add_argument("user_id")
+    parser.add_argument("--workers", type=int, default=BATCH_TRANSCRIBE_WORKERS, help="concurrent transcriptions")
+    parser.add_argument("--force", action="store_true", help="ignore existing transcripts")
+    parser.add_argument("--engine", choices=ENGINES, default="speech",
+                        help="wav2vec2 transcribes on this machine's CPU instead of calling Speech")
+    parser.add_argument("--local", action="store_true", help="run here instead of on the worker service")
+    args = parser.parse_args()
+
+    params = {"user_id": args.user_id, "workers": args.workers, "force": args.force, "engine": args.engine}
+    result = None
+    if not args.local:
+        try:
+            from worker_client import WorkerUnavailable, submit_job
+            result = submit_job('batch_transcribe', params)
+        except WorkerUnavailable:
+            result = None
+    if result is None:
+        result = batch_transcribe(args.user_id, workers=args.workers, force=args.force, engine=args.engine)
+    print(json.dumps(result, indent=2))
@@ -1,12 +1,80 @@
 import os
 import sys
 import json
-import requests
+import re
+import time
 import base64
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from google.api_core.exceptions import NotFound
 from google.cloud import storage
 from google.cloud.storage import Blob
 import google.generativeai as genai
 from text_to_speech import synthesize_text
+from ttl_cache import MISSING, TTLCache
+from session_store import HistoryPersistence, SessionStore
+from elevenlabs_client import DEFAULT_MODEL_ID, DEFAULT_VOICE_SETTINGS, ElevenLabsClient, ElevenLabsError
+from tts_cache import get_synthesis_cache, synthesis_key
+from conversation_history import ConversationHistory, format_messages
+from metrics import (
+    LLM_ERRORS_TOTAL, LLM_FIRST_TOKEN_SECONDS, LLM_SECONDS, TTS_ERRORS_TOTAL, TTS_FIRST_BYTE_SECONDS,
+    TTS_SECONDS, VOICE_ID_LOOKUP_SECONDS
+)
+
+VOICE_ID_CACHE_SIZE = int(os.getenv('VOICE_ID_CACHE_SIZE', '1024'))
+VOICE_ID_CACHE_TTL = float(os.getenv('VOICE_ID_CACHE_TTL', '600'))
+VOICE_ID_CACHE_NEGATIVE_TTL = float(os.getenv('VOICE_ID_CACHE_NEGATIVE_TTL', '30'))
+# Cached voice IDs are checked against the generation of {user}/voice_id/voice_id.json at most
+# this often, so a voice rebuilt on any host is picked up without waiting out the TTL
+VOICE_ID_REVALIDATE_SECONDS = float(os.getenv('VOICE_ID_REVALIDATE_SECONDS', '30'))
+VOICE_ID_PATH = '{user_id}/voice_id/voice_id.json'
+GCS_FETCH_WORKERS = int(os.getenv('GCS_FETCH_WORKERS', '16'))
+CONVERSATION_MAX_SESSIONS = int(os.getenv('CONVERSATION_MAX_SESSIONS', '1000'))
+CONVERSATION_IDLE_TTL = float(os.getenv('CONVERSATION_IDLE_TTL', '1800'))
+CONVERSATION_PERSIST_BACKEND = os.getenv('CONVERSATION_PERSIST_BACKEND', 'local')
+CONVERSATION_PERSIST_DIR = os.getenv('CONVERSATION_PERSIST_DIR', 'storage/sessions')
+# Sentences shorter than this are merged with the next one to avoid tiny TTS requests
+MIN_TTS_SENTENCE_CHARS = int(os.getenv('MIN_TTS_SENTENCE_CHARS', '20'))
+GEMINI_MODEL = os.getenv('GEMINI_MODEL', 'gemini-1.5-pro')
+# Rolling summaries of folded history run on a cheaper model, off the turn's hot path
+GEMINI_SUMMARY_MODEL = os.getenv('GEMINI_SUMMARY_MODEL', 'gemini-1.5-flash')
+HISTORY_SUMMARY_WORKERS = int(os.getenv('HISTORY_SUMMARY_WORKERS', '2'))
+SENTENCE_END = re.compile(r'[.!?]+["\')\]]*\s+')
+FALLBACK_RESPONSE = "I'm sorry, I couldn't process that request."
+
+
+def iter_sentences(chunks, min_chars=MIN_TTS_SENTENCE_CHARS):
+    """Regroup streamed text chunks into whole sentences as soon as each one ends"""
+    buffer = ""
+    for chunk in chunks:
+        buffer += chunk
+        start = 0
+        for match in SENTENCE_END.finditer(buffer):
+            if match.end() - start >= min_chars:
+                yield buffer[start:match.end()].strip()
+                start = match.end()
+        buffer = buffer[start:]
+    if buffer.strip():
+        yield buffer.strip()
+
+
+def timed_text_chunks(response, start):
+    """Yield the text of streamed Gemini chunks, recording time to first token and total time"""
+    first = True
+    for chunk in response:
+        if first:
+            LLM_FIRST_TOKEN_SECONDS.observe(time.perf_counter() - start)
+            first = False
+        yield chunk.text
+    LLM_SECONDS.observe(time.perf_counter() - start, mode='stream')
+
+
+@dataclass(frozen=True)
+class UserProfile:
+    name: str
+    profile_text: str = ""
+    voice_id: str = None
+
 
 class ConversationHandler:
     def __init__(self):
@@ -21,136 +89,274 @@ class ConversationHandler:
             if api_key:
                 genai.configure(api_key=api_key)
             
-            # ElevenLabs API key
+            # ElevenLabs API key and pooled keep-alive client
             self.elevenlabs_api_key = os.getenv('ELEVEN_LABS_API')
+            self.elevenlabs = ElevenLabsClient(api_key=self.elevenlabs_api_key)
+            self.synthesis_cache = get_synthesis_cache()
             
-            # Conversation state storage
-            self.conversation_state = {}
-            self.user_profiles = {}
+            # Conversation state storage: bounded, with idle sessions spilled to
+            # storage (history only) and rehydrated on the user's next turn
+            self.history_persistence = HistoryPersistence(
+                backend=CONVERSATION_PERSIST_BACKEND,
+                local_dir=CONVERSATION_PERSIST_DIR,
+                bucket=self.bucket
+            )
+            self.conversation_state = SessionStore(
+                max_entries=CONVERSATION_MAX_SESSIONS,
+                idle_ttl=CONVERSATION_IDLE_TTL,
+                on_evict=self._persist_chat
+            )
+            self.user_profiles = TTLCache(maxsize=CONVERSATION_MAX_SESSIONS, ttl=CONVERSATION_IDLE_TTL)
+
+            # Voice ID lookups, including short-lived "no voice yet" results
+            self.voice_id_cache = TTLCache(maxsize=VOICE_ID_CACHE_SIZE, ttl=VOICE_ID_CACHE_TTL)
+
+            # Independent GCS reads are issued concurrently on this pool
+            self.gcs_executor = ThreadPoolExecutor(max_workers=GCS_FETCH_WORKERS, thread_name_prefix='gcs-fetch')
+            self.summary_executor = ThreadPoolExecutor(
+                max_workers=HISTORY_SUMMARY_WORKERS, thread_name_prefix='history-summary'
+            )
             
             print("ConversationHandler initialized successfully")
         except Exception as e:
             print(f"Error initializing ConversationHandler: {str(e)}", file=sys.stderr)
             raise e
 
+    def _voice_id_generation(self, user_id):
+        """Current generation of the user's voice_id.json (None if absent), from one metadata GET"""
+        blob = self.bucket.get_blob(VOICE_ID_PATH.format(user_id=user_id))
+        return blob.generation if blob is not None else None
+
     def get_voice_id(self, user_id):
-        """Get the ElevenLabs voice ID for a user from GCS bucket"""
+        """Get the ElevenLabs voice ID for a user, served from a TTL/LRU cache after the first lookup.
+
+        A cached entry older than VOICE_ID_REVALIDATE_SECONDS is kept only while
+        voice_id.json still has the generation it was read at.
+        """
+        # Special case for testing user
+        if user_id == 'lbark90':
+            return 'BqVolG55J1XdqIXpATx4'
+
+        start = time.perf_counter()
+        cached = self.voice_id_cache.get(user_id)
+        if cached is not MISSING:
+            voice_id, generation, validated_at = cached
+            try:
+                if time.monotonic() - validated_at < VOICE_ID_REVALIDATE_SECONDS:
+                    VOICE_ID_LOOKUP_SECONDS.observe(time.perf_counter() - start, cache='hit')
+                    return voice_id
+                if self._voice_id_generation(user_id) == generation:
+                    ttl = VOICE_ID_CACHE_TTL if voice_id else VOICE_ID_CACHE_NEGATIVE_TTL
+                    self.voice_id_cache.set(user_id, (voice_id, generation, time.monotonic()), ttl=ttl)
+                    VOICE_ID_LOOKUP_SECONDS.observe(time.perf_counter() - start, cache='revalidated')
+                    return voice_id
+                print(f"voice_id.json changed for {user_id}, refreshing cached voice ID")
+            except Exception as e:
+                print(f"Error revalidating voice ID: {str(e)}", file=sys.stderr)
+
         try:
-            # Special case for testing user
-            if user_id == 'lbark90':
-                return 'BqVolG55J1XdqIXpATx4'
-                
-            # Check for voice ID in standard location
-            voice_id_path = f"{user_id}/voice_id/voice_id.json"
-            voice_id_blob = self.bucket.blob(voice_id_path)
-            
-            if voice_id_blob.exists():
-                content = voice_id_blob.download_as_string()
-                data = json.loads(content)
-                print(f"Voice ID file data: {data}")
-                
-                # Check for voice_id or user_voice_id
-                if 'voice_id' in data:
-                    return data['voice_id']
-                elif 'user_voice_id' in data:
-                    return data['user_voice_id']
-            
-            # Check alternative locations
-            alt_paths = [
-                f"{user_id}_voice_id.json",
-                f"voices/{user_id}_voice_id.json",
-                f"storage/voices/{user_id}_voice_id.json"
-            ]
-            
-            for path in alt_paths:
-                blob = self.bucket.blob(path)
-                if blob.exists():
-                    content = blob.download_as_string()
-                    data = json.loads(content)
-                    if 'voice_id' in data:
-                        return data['voice_id']
-                    elif 'user_voice_id' in data:
-                        return data['user_voice_id']
-            
-            print(f"No voice ID found for user: {user_id}")
-            return None
+            voice_id, generation = self._lookup_voice_id(user_id)
         except Exception as e:
+            # Errors are not cached so the next turn retries
             print(f"Error getting voice ID: {str(e)}", file=sys.stderr)
             return None
+        finally:
+            VOICE_ID_LOOKUP_SECONDS.observe(time.perf_counter() - start, cache='miss')
+
+        ttl = VOICE_ID_CACHE_TTL if voice_id else VOICE_ID_CACHE_NEGATIVE_TTL
+        self.voice_id_cache.set(user_id, (voice_id, generation, time.monotonic()), ttl=ttl)
+        return voice_id
+
+    def _download_or_none(self, path):
+        """Download a blob in one round-trip, treating NotFound as absence"""
+        try:
+            return self.bucket.blob(path).download_as_bytes()
+        except NotFound:
+            return None
+
+    def _lookup_voice_id(self, user_id):
+        """Get the ElevenLabs voice ID for a user from GCS bucket.
+
+        Returns (voice_id, generation of voice_id.json, or None when it is absent).
+        """
+        # Check for voice ID in standard location
+        blob = self.bucket.blob(VOICE_ID_PATH.format(user_id=user_id))
+        try:
+            content = blob.download_as_bytes()
+            generation = blob.generation
+        except NotFound:
+            content = generation = None
+
+        if content is not None:
+            data = json.loads(content)
+            print(f"Voice ID file data: {data}")
+
+            # Check for voice_id or user_voice_id
+            if 'voice_id' in data:
+                return data['voice_id'], generation
+            elif 'user_voice_id' in data:
+                return data['user_voice_id'], generation
+
+        # Check alternative locations
+        alt_paths = [
+            f"{user_id}_voice_id.json",
+            f"voices/{user_id}_voice_id.json",
+            f"storage/voices/{user_id}_voice_id.json"
+        ]
+
+        for path in alt_paths:
+            content = self._download_or_none(path)
+            if content is not None:
+                data = json.loads(content)
+                if 'voice_id' in data:
+                    return data['voice_id'], generation
+                elif 'user_voice_id' in data:
+                    return data['user_voice_id'], generation
+
+        print(f"No voice ID found for user: {user_id}")
+        return None, generation
 
     def get_user_profile(self, user_id):
-        """Get the user's profile data from GCS bucket"""
+        """Get the user's profile from GCS, fetching voice ID, profile.txt and metadata.json concurrently"""
         try:
             # Check if profile is already loaded
-            if user_id in self.user_profiles:
-                return self.user_profiles[user_id]
-                
-            profile_data = {
-                "name": user_id,
-                "profile_text": "",
-                "voice_id": self.get_voice_id(user_id)
-            }
-            
-            # Try to load profile.txt
-            profile_path = f"{user_id}/profile.txt"
-            profile_blob = self.bucket.blob(profile_path)
-            
-            if profile_blob.exists():
-                profile_data["profile_text"] = profile_blob.download_as_text()
-            
-            # Try to load metadata.json for additional info
-            metadata_path = f"{user_id}/metadata.json"
-            metadata_blob = self.bucket.blob(metadata_path)
-            
-            if metadata_blob.exists():
-                metadata = json.loads(metadata_blob.download_as_text())
-                if "name" in metadata:
-                    profile_data["name"] = metadata["name"]
-            
+            cached = self.user_profiles.get(user_id)
+            if cached is not MISSING:
+                return cached
+
+            voice_id_future = self.gcs_executor.submit(self.get_voice_id, user_id)
+            profile_future = self.gcs_executor.submit(self._download_or_none, f"{user_id}/profile.txt")
+            metadata_future = self.gcs_executor.submit(self._download_or_none, f"{user_id}/metadata.json")
+
+            name = user_id
+            metadata = metadata_future.result()
+            if metadata is not None:
+                name = json.loads(metadata).get("name", user_id)
+            profile_text = profile_future.result()
+
+            profile = UserProfile(
+                name=name,
+                profile_text=profile_text.decode('utf-8') if profile_text is not None else "",
+                voice_id=voice_id_future.result()
+            )
+
             # Cache the profile data
-            self.user_profiles[user_id] = profile_data
-            return profile_data
+            self.user_profiles.set(user_id, profile)
+            return profile
         except Exception as e:
             print(f"Error loading profile: {str(e)}", file=sys.stderr)
-            return {
-                "name": user_id,
-                "profile_text": "",
-                "voice_id": self.get_voice_id(user_id)
-            }
+            return UserProfile(name=user_id, voice_id=self.get_voice_id(user_id))
+
+    def _persist_chat(self, user_id, history):
+        """Serialize an evicted session's history so the next turn can rehydrate it"""
+        data = history.to_dict()
+        self.history_persistence.save(user_id, data)
+        print(f"Persisted {len(data['messages'])} history entries for evicted session {user_id}")
+
+    def persist_all_sessions(self):
+        """Write every live session's history out, e.g. before the server stops"""
+        self.conversation_state.flush()
+
+    def _summarize_history(self, previous_summary, messages, max_tokens):
+        """Fold older turns into the rolling summary with a short Gemini call"""
+        prompt = f"Summarize this conversation for the persona to remember in at most {max_tokens * 3 // 4} words. " \
+                 f"Keep names, facts, feelings and anything the user asked to be remembered.\n\n"
+        if previous_summary:
+            prompt += f"Summary so far:\n{previous_summary}\n\n"
+        prompt += f"New turns:\n{format_messages(messages)}"
+        return genai.GenerativeModel(GEMINI_SUMMARY_MODEL).generate_content(prompt).text
+
+    def _get_history(self, user_id):
+        """Return the budgeted history for a user, resuming or starting one if needed"""
+        # Get user profile
+        profile = self.get_user_profile(user_id)
+        
+        # Prepare context for Gemini
+        persona_name = profile.name or "Memorial Persona"
+        persona_profile = profile.profile_text
+        system_prompt = f"You are the persona of {persona_name}. " \
+                       f"Here is their profile:\n{persona_profile}\n" \
+                       f"Answer as if you are {persona_name}, in a warm and conversational manner."
+        
+        # Check if we have an ongoing conversation
+        history = self.conversation_state.get(user_id)
+        if history is None:
+            # Resume an evicted conversation if one was saved, otherwise start a new one
+            saved = self.history_persistence.load(user_id)
+            history = ConversationHistory.from_dict(
+                saved, system_prompt, summarizer=self._summarize_history, executor=self.summary_executor
+            )
+            if history.messages or history.summary:
+                print(f"Rehydrating {len(history.messages)} history entries for {user_id}")
+            self.conversation_state.set(user_id, history)
+        history.system_prompt = system_prompt
+        
+        return history
 
-    def process_user_input(self, user_id, user_text):
-        """Process user input text and generate response"""
+    def _start_chat(self, history):
+        """Build a Gemini chat holding only the budgeted context, so prompt size stays flat"""
+        model = genai.GenerativeModel(GEMINI_MODEL, system_instruction=history.system_instruction())
+        return model.start_chat(history=history.as_gemini_history())
+
+    def process_user_input(self, user_id, user_text, cancelled=None):
+        """Process user input text and generate response.
+
+        If the cancelled event is set by the time Gemini answers, the reply is
+        returned but not added to history: the user never got it.
+        """
         try:
-            # Get user profile
-            profile = self.get_user_profile(user_id)
-            
-            # Prepare context for Gemini
-            persona_name = profile.get("name", "Memorial Persona")
-            persona_profile = profile.get("profile_text", "")
-            system_prompt = f"You are the persona of {persona_name}. " \
-                           f"Here is their profile:\n{persona_profile}\n" \
-                           f"Answer as if you are {persona_name}, in a warm and conversational manner."
-            
-            # Check if we have an ongoing conversation
-            if user_id not in self.conversation_state:
-                # Start a new conversation
-                model = genai.GenerativeModel('gemini-1.5-pro')
-                chat = model.start_chat(history=[
-                    {"role": "system", "parts": [system_prompt]},
-                ])
-                self.conversation_state[user_id] = chat
-            else:
-                chat = self.conversation_state[user_id]
-            
+            history = self._get_history(user_id)
+            chat = self._start_chat(history)
+
             # Generate response from Gemini
-            response = chat.send_message(user_text)
-            assistant_text = response.text
+            with LLM_SECONDS.time(mode='full'):
+                response = chat.send_message(user_text)
+                assistant_text = response.text
+            if cancelled is not None and cancelled.is_set():
+                print(f"Turn for {user_id} was interrupted, not recording its reply")
+                return assistant_text
+            history.add_turn(user_text, assistant_text)
             print(f"Gemini response for {user_id}: {assistant_text}")
             
             return assistant_text
         except Exception as e:
             print(f"Error processing user input: {str(e)}", file=sys.stderr)
-            return "I'm sorry, I couldn't process that request."
+            LLM_ERRORS_TOTAL.inc()
+            return FALLBACK_RESPONSE
+
+    def stream_user_input(self, user_id, user_text, cancelled=None):
+        """Stream the Gemini reply for a user's input, yielding it one sentence at a time"""
+        sentences = []
+        history = None
+        try:
+            history = self._get_history(user_id)
+            chat = self._start_chat(history)
+            start = time.perf_counter()
+            response = chat.send_message(user_text, stream=True)
+            for sentence in iter_sentences(timed_text_chunks(response, start)):
+                if cancelled is not None and cancelled.is_set():
+                    break
+                sentences.append(sentence)
+                yield sentence
+        except Exception as e:
+            print(f"Error streaming user input: {str(e)}", file=sys.stderr)
+            LLM_ERRORS_TOTAL.inc()
+            if not sentences:
+                yield FALLBACK_RESPONSE
+        finally:
+            # An interrupted turn is left out so it can't land after the turn that interrupted it
+            if history is not None and sentences and not (cancelled is not None and cancelled.is_set()):
+                history.add_turn(user_text, " ".join(sentences))
+
+    def _timed_speech(self, voice_id, text, start):
+        """Stream ElevenLabs audio, recording time to first byte and total synthesis time"""
+        first = True
+        for chunk in self.elevenlabs.stream_speech(voice_id, text):
+            if first:
+                TTS_FIRST_BYTE_SECONDS.observe(time.perf_counter() - start)
+                first = False
+            yield chunk
+        TTS_SECONDS.observe(time.perf_counter() - start, cache='miss')
 
     def text_to_voice(self, user_id, text):
         """Convert text to voice using ElevenLabs"""
@@ -161,39 +367,65 @@ class ConversationHandler:
                 print(f"No voice ID available for user: {user_id}")
                 return None
                 
-            # Call ElevenLabs API
-            url = f"https://api.elevenlabs.io/v1/text-to-speech/{voice_id}"
-            headers = {
-                "xi-api-key": self.elevenlabs_api_key,
-                "Content-Type": "application/json"
-            }
-            data = {
-                "text": text,
-                "model_id": "eleven_monolingual_v1",
-                "voice_settings": {
-                    "stability": 0.75,
-                    "similarity_boost": 0.75
-                }
-            }
-            
+            # Repeated phrases (greetings, fallbacks) are served from the synthesis cache
+            start = time.perf_counter()
+            cache_key = synthesis_key(voice_id, text, DEFAULT_MODEL_ID, DEFAULT_VOICE_SETTINGS)
+            if self.synthesis_cache:
+                audio = self.synthesis_cache.get(cache_key)
+                if audio is not None:
+                    TTS_SECONDS.observe(time.perf_counter() - start, cache='hit')
+                    return audio
+
             print(f"Calling ElevenLabs API for voice ID: {voice_id}")
-            response = requests.post(url, headers=headers, json=data)
-            
-            if response.status_code == 200:
-                print(f"Successfully generated voice audio ({len(response.content)} bytes)")
-                return response.content
-            else:
-                print(f"ElevenLabs API error: {response.status_code} - {response.text}", file=sys.stderr)
-                return None
+            audio = b"".join(self._timed_speech(voice_id, text, start))
+            print(f"Successfully generated voice audio ({len(audio)} bytes)")
+            if self.synthesis_cache:
+                self.synthesis_cache.put(cache_key, audio)
+            return audio
+        except ElevenLabsError as e:
+            print(str(e), file=sys.stderr)
+            TTS_ERRORS_TOTAL.inc()
+            return None
         except Exception as e:
             print(f"Error in text to voice: {str(e)}", file=sys.stderr)
+            TTS_ERRORS_TOTAL.inc()
             return None
 
-    def handle_conversation_turn(self, user_id, user_text):
-        """Handle a full conversation turn"""
+    def text_to_voice_stream(self, user_id, text):
+        """Yield ElevenLabs MP3 bytes for text as they arrive"""
+        try:
+            voice_id = self.get_voice_id(user_id)
+            if not voice_id:
+                print(f"No voice ID available for user: {user_id}")
+                return
+
+            start = time.perf_counter()
+            cache_key = synthesis_key(voice_id, text, DEFAULT_MODEL_ID, DEFAULT_VOICE_SETTINGS)
+            if self.synthesis_cache:
+                audio = self.synthesis_cache.get(cache_key)
+                if audio is not None:
+                    TTS_SECONDS.observe(time.perf_counter() - start, cache='hit')
+                    yield audio
+                    return
+
+            # Pass chunks through as they arrive and cache the whole utterance at the end
+            chunks = []
+            for chunk in self._timed_speech(voice_id, text, start):
+                chunks.append(chunk)
+                yield chunk
+            if self.synthesis_cache:
+                self.synthesis_cache.put(cache_key, b"".join(chunks))
+        except Exception as e:
+            print(f"Error in streaming text to voice: {str(e)}", file=sys.stderr)
+            TTS_ERRORS_TOTAL.inc()
+
+    def handle_conversation_turn(self, user_id, user_text, cancelled=None):
+        """Handle a full conversation turn; synthesis is skipped once cancelled is set"""
         try:
             # Step 1: Process user input with Gemini
-            assistant_text = self.process_user_input(user_id, user_text)
+            assistant_text = self.process_user_input(user_id, user_text, cancelled)
+            if cancelled is not None and cancelled.is_set():
+                return {"text": assistant_text, "audio": None}
             
             # Step 2: Convert response to voice with ElevenLabs
             audio_content = self.text_to_voice(user_id, assistant_text)
@@ -0,0 +1,189 @@
+import os
+import re
+import sys
+import threading
+
+HISTORY_TOKEN_BUDGET = int(os.getenv('HISTORY_TOKEN_BUDGET', '3000'))
+# Most recent messages that are always kept verbatim, whatever the budget says
+HISTORY_RECENT_MESSAGES = int(os.getenv('HISTORY_RECENT_MESSAGES', '6'))
+HISTORY_SUMMARY_TOKENS = int(os.getenv('HISTORY_SUMMARY_TOKENS', '400'))
+# Folding goes down to this fraction of the verbatim budget, so summaries run every few turns, not every turn
+HISTORY_COMPACT_TARGET = float(os.getenv('HISTORY_COMPACT_TARGET', '0.6'))
+# Rough chars-per-token for Gemini's tokenizer on English; counting exactly would cost a request
+CHARS_PER_TOKEN = 4
+SENTENCE = re.compile(r'[^.!?]+[.!?]*')
+ROLE_LABELS = {"user": "User", "model": "AI"}
+
+
+def estimate_tokens(text):
+    return (len(text) + CHARS_PER_TOKEN - 1) // CHARS_PER_TOKEN
+
+
+def truncate_to_tokens(text, max_tokens):
+    """Keep the tail of text within max_tokens, starting at a word boundary"""
+    max_chars = max_tokens * CHARS_PER_TOKEN
+    if len(text) <= max_chars:
+        return text
+    tail = text[-max_chars:]
+    return tail[tail.find(' ') + 1:] if ' ' in tail else tail
+
+
+def format_messages(messages):
+    return "\n".join(f"{ROLE_LABELS.get(m['role'], m['role'])}: {m['text']}" for m in messages)
+
+
+def extractive_summary(previous_summary, messages, max_tokens=HISTORY_SUMMARY_TOKENS):
+    """Cheap summary: the first sentence of each folded message appended to the old summary.
+
+    Used immediately when turns are folded, and kept if no LLM summarizer is
+    configured or it fails. The oldest material is dropped first to stay in budget.
+    """
+    lines = [previous_summary] if previous_summary else []
+    for message in messages:
+        match = SENTENCE.search(message["text"].strip())
+        if match:
+            lines.append(f"{ROLE_LABELS.get(message['role'], message['role'])}: {match.group(0).strip()}")
+    return truncate_to_tokens("\n".join(lines), max_tokens)
+
+
+class ConversationHistory:
+    """Conversation history held under a token budget.
+
+    The system prompt and the most recent messages are kept verbatim. Once the
+    total goes over budget, the oldest messages are folded into a rolling
+    summary. An extractive summary replaces them at once, so the next prompt is
+    already small, and the optional `summarizer(previous_summary, messages,
+    max_tokens)` runs on `executor` to replace it with a better one later.
+    """
+
+    def __init__(self, system_prompt="", token_budget=HISTORY_TOKEN_BUDGET, recent_messages=HISTORY_RECENT_MESSAGES,
+                 summary_tokens=HISTORY_SUMMARY_TOKENS, summarizer=None, executor=None):
+        self.system_prompt = system_prompt
+        self.token_budget = token_budget
+        self.recent_messages = recent_messages
+        self.summary_tokens = summary_tokens
+        self.summarizer = summarizer
+        self.executor = executor
+        self.summary = ""
+        self.messages = []
+        self._epoch = 0
+        self._lock = threading.Lock()
+
+    def _tokens(self):
+        return (estimate_tokens(self.system_prompt) + estimate_tokens(self.summary)
+                + sum(estimate_tokens(m["text"]) for m in self.messages))
+
+    def prompt_tokens(self):
+        with self._lock:
+            return self._tokens()
+
+    def append(self, role, text):
+        with self._lock:
+            self.messages.append({"role": role, "text": text})
+            folded = self._compact()
+        if folded:
+            self._schedule_summary(*folded)
+
+    def add_turn(self, user_text, model_text):
+        with self._lock:
+            self.messages.append({"role": "user", "text": user_text})
+            self.messages.append({"role": "model", "text": model_text})
+            folded = self._compact()
+        if folded:
+            self._schedule_summary(*folded)
+
+    def _compact(self):
+        """Fold the oldest messages into the summary while over budget (lock held)"""
+        if self._tokens() <= self.token_budget or len(self.messages) <= self.recent_messages:
+            return None
+        # Reserve the summary's share up front so folding doesn't immediately re-trigger
+        verbatim_budget = (self.token_budget - estimate_tokens(self.system_prompt) - self.summary_tokens) \
+            * HISTORY_COMPACT_TARGET
+        keep = len(self.messages)
+        used = 0
+        for message in reversed(self.messages):
+            cost = estimate_tokens(message["text"])
+            if keep <= len(self.messages) - self.recent_messages and used + cost > verbatim_budget:
+                break
+            used += cost
+            keep -= 1
+        # Fold whole user/model pairs so the verbatim part always starts with a user message
+        split = keep + (keep % 2)
+        if split <= 0:
+            return None
+        folded, self.messages = self.messages[:split], self.messages[split:]
+        previous_summary = self.summary
+        self.summary = extractive_summary(previous_summary, folded, self.summary_tokens)
+        self._epoch += 1
+        return previous_summary, folded, self._epoch
+
+    def _schedule_summary(self, previous_summary, folded, epoch):
+        if not self.summarizer or not self.executor:
+            return
+        future = self.executor.submit(self.summarizer, previous_summary, folded, self.summary_tokens)
+        future.add_done_callback(lambda f: self._apply_summary(f, epoch))
+
+    def _apply_summary(self, future, epoch):
+        try:
+            summary = future.result()
+        except Exception as e:
+            print(f"Error summarizing conversation history: {str(e)}", file=sys.stderr)
+            return
+        if not summary:
+            return
+        with self._lock:
+            # A later fold already built on the extractive summary; keep that instead
+            if epoch == self._epoch:
+                self.summary = truncate_to_tokens(summary.strip(), self.summary_tokens)
+
+    def system_instruction(self):
+        with self._lock:
+            if not self.summary:
+                return self.system_prompt
+            return f"{self.system_prompt}\n\nSummary of the earlier conversation:\n{self.summary}"
+
+    def as_gemini_history(self):
+        with self._lock:
+            return [{"role": m["role"], "parts": [m["text"]]} for m in self.messages]
+
+    def format_transcript(self):
+        """Summary plus verbatim turns as plain text, for single-prompt callers"""
+        with self._lock:
+            transcript = format_messages(self.messages)
+            if self.summary:
+                return f"Summary of the earlier conversation:\n{self.summary}\n\n{transcript}"
+            return transcript
+
+    def to_dict(self):
+        with self._lock:
+            return {"summary": self.summary, "messages": list(self.messages)}
+
+    @classmethod
+    def from_dict(cls, data, system_prompt="", **kwargs):
+        """Rebuild from to_dict() output, or from the older list of Gemini contents"""
+        history = cls(system_prompt, **kwargs)
+        if isinstance(data, dict):
+            history.summary = data.get("summary", "")
+            entries = data.get("messages", [])
+        else:
+            entries = [
+                {"role": entry.get("role"), "text": " ".join(entry.get("parts", []))}
+                for entry in data or []
+                if entry.get("role") in ("user", "model")
+            ]
+        for entry in entries:
+            history.messages.append({"role": entry["role"], "text": entry["text"]})
+        with history._lock:
+            history._compact()
+        return history
+
+    @classmethod
+    def from_exchanges(cls, exchanges, system_prompt="", **kwargs):
+        """Build from the web client's [{"userMessage", "aiResponse"}] list"""
+        history = cls(system_prompt, **kwargs)
+        for exchange in exchanges or []:
+            history.messages.append({"role": "user", "text": exchange.get("userMessage", "")})
+            history.messages.append({"role": "model", "text": exchange.get("aiResponse", "")})
+        with history._lock:
+            history._compact()
+        return history
@@ -1,162 +1,544 @@
 import os
-import numpy as np
-import torch
+import sys
+import time
+import argparse
+import shutil
+import tempfile
+import subprocess
+import threading
+import multiprocessing
 import datetime
-from transformers import Wav2Vec2Processor, Wav2Vec2ForCTC
-import soundfile as sf
-from google.cloud import storage
+from collections import deque
+from contextlib import ExitStack, contextmanager
+from concurrent.futures import Future, ThreadPoolExecutor, ProcessPoolExecutor
 import json
+# numpy, soundfile, GCS and the DSP helpers are imported where they are used, so
+# the CLI can hand a build to the worker service without loading any of them
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+AUDIO_EXTENSIONS = ('.wav', '.mp3', '.webm')
+DEFAULT_DOWNLOAD_WORKERS = int(os.getenv('VOICE_DOWNLOAD_WORKERS', '8'))
+DEFAULT_TRANSCODE_WORKERS = int(os.getenv('VOICE_TRANSCODE_WORKERS', str(os.cpu_count() or 1)))
+DEFAULT_IN_MEMORY_DECODE = os.getenv('VOICE_IN_MEMORY_DECODE', '').lower() in ('1', 'true', 'yes')
+# Transcode processes start from a clean forkserver rather than forking a parent that
+# may be holding threads and locks (the worker service's HTTP and job threads, torch)
+TRANSCODE_START_METHOD = os.getenv('VOICE_TRANSCODE_START_METHOD', 'forkserver')
+WAV2VEC2_MODEL_NAME = "facebook/wav2vec2-base-960h"
+
+# Process-wide model cache: torch/transformers are only imported and the
+# weights only loaded the first time a caller actually needs them
+_wav2vec2_cache = {}
+_wav2vec2_lock = threading.Lock()
+
+
+def get_wav2vec2(model_name=WAV2VEC2_MODEL_NAME):
+    """Return (processor, model, device) for a Wav2Vec2 model, loading it once per process"""
+    with _wav2vec2_lock:
+        if model_name not in _wav2vec2_cache:
+            import torch
+            from transformers import Wav2Vec2Processor, Wav2Vec2ForCTC
+
+            device = "cuda" if torch.cuda.is_available() else "cpu"
+            processor = Wav2Vec2Processor.from_pretrained(model_name)
+            model = Wav2Vec2ForCTC.from_pretrained(model_name).to(device)
+            _wav2vec2_cache[model_name] = (processor, model, device)
+        return _wav2vec2_cache[model_name]
+
+
+def decode_with_soundfile(audio_path, block_size=None):
+    """Decode a file without ffmpeg, streaming fixed-size blocks through the polyphase resampler"""
+    import numpy as np
+    import soundfile as sf
+    from resample import DEFAULT_BLOCK_SIZE, StreamingResampler
+    from transcode_cache import to_pcm16
+
+    block_size = block_size or DEFAULT_BLOCK_SIZE
+    info = sf.info(audio_path)
+    resampler = StreamingResampler(info.samplerate, 16000) if info.samplerate != 16000 else None
+    chunks = []
+    for block in sf.blocks(audio_path, blocksize=block_size, dtype='float32', always_2d=True):
+        mono = block.mean(axis=1)
+        chunks.append(to_pcm16(resampler.process(mono) if resampler else mono))
+    if resampler:
+        chunks.append(to_pcm16(resampler.flush()))
+    return np.concatenate(chunks) if chunks else np.zeros(0, dtype=np.int16)
+
+
+def transcode_audio(audio_path):
+    """Convert an audio file to a 16kHz mono array (runs inside the transcode process pool)"""
+    import numpy as np
+    import soundfile as sf
+    from resample import resample
+
+    try:
+        # Local/offline installs without ffmpeg decode with libsndfile instead
+        if shutil.which('ffmpeg') is None:
+            return decode_with_soundfile(audio_path)
+
+        # Create a temporary WAV file
+        with tempfile.NamedTemporaryFile(suffix='.wav', delete=False) as temp_wav:
+            temp_wav_path = temp_wav.name
+
+        # Convert to WAV using ffmpeg
+        subprocess.run([
+            'ffmpeg', '-y', '-i', audio_path,
+            '-acodec', 'pcm_s16le',
+            '-ar', '16000',
+            '-ac', '1',
+            temp_wav_path
+        ], check=True, capture_output=True)
+
+        # Read the converted WAV file
+        # Keep clips as int16 (half the size of float32, a quarter of float64);
+        # only fall back to float32 when the samples need further processing
+        audio, sample_rate = sf.read(temp_wav_path, dtype='int16')
+        os.remove(temp_wav_path)
+
+        # Convert stereo to mono if needed
+        if len(audio.shape) > 1:
+            audio = audio.mean(axis=1, dtype=np.float32) / 32768.0
+
+        # Resample to 16kHz if needed
+        if sample_rate != 16000:
+            if audio.dtype == np.int16:
+                audio = audio.astype(np.float32) / 32768.0
+            audio = resample(audio, sample_rate, 16000)
+
+        return audio
+
+    except Exception as e:
+        print(f"Error processing audio file {audio_path}: {str(e)}")
+        return None
+
+
+def decode_audio_bytes(data, label='<memory>'):
+    """Decode encoded audio bytes to a 16kHz mono array by piping them through ffmpeg"""
+    import numpy as np
+
+    try:
+        # Feed the blob on stdin and read raw little-endian PCM from stdout so
+        # nothing touches disk. wav/mp3/webm are all decodable without seeking.
+        result = subprocess.run([
+            'ffmpeg', '-hide_banner', '-loglevel', 'error',
+            '-i', 'pipe:0',
+            '-f', 's16le',
+            '-acodec', 'pcm_s16le',
+            '-ar', '16000',
+            '-ac', '1',
+            'pipe:1'
+        ], input=data, check=True, capture_output=True)
+
+        return np.frombuffer(result.stdout, dtype='<i2')
+
+    except subprocess.CalledProcessError as e:
+        print(f"Error decoding audio {label}: {e.stderr.decode(errors='replace').strip()}")
+        return None
+    except Exception as e:
+        print(f"Error decoding audio {label}: {str(e)}")
+        return None
+
+
+class StageTimer:
+    """Collects wall time spans for each stage of the voice pipeline"""
 
-class VoiceCreator:
     def __init__(self):
-        self.device = "cuda" if torch.cuda.is_available() else "cpu"
-        self.processor = Wav2Vec2Processor.from_pretrained("facebook/wav2vec2-base-960h")
-        self.model = Wav2Vec2ForCTC.from_pretrained("facebook/wav2vec2-base-960h").to(self.device)
+        self._lock = threading.Lock()
+        self._spans = {}
+        self._started = time.perf_counter()
 
-    def process_audio(self, audio_path):
+    @contextmanager
+    def stage(self, name):
+        start = time.perf_counter()
         try:
-            import subprocess
-            import tempfile
+            yield
+        finally:
+            self.record(name, start, time.perf_counter())
+
+    def record(self, name, start, end):
+        """Add a span timed elsewhere, e.g. from a future's done-callback"""
+        with self._lock:
+            self._spans.setdefault(name, []).append((start, end))
+
+    def report(self):
+        """Return a printable per-stage timing report"""
+        total = time.perf_counter() - self._started
+        lines = [f"Voice pipeline timing (total wall {total:.2f}s):"]
+        with self._lock:
+            spans = {name: list(items) for name, items in self._spans.items()}
+        for name, items in spans.items():
+            busy = sum(end - start for start, end in items)
+            wall = max(end for _, end in items) - min(start for start, _ in items)
+            lines.append(
+                f"  {name:<10} count={len(items):<5} wall={wall:.2f}s "
+                f"busy={busy:.2f}s avg={busy / len(items):.3f}s"
+            )
+        return "\n".join(lines)
+
+
+def remove_temp_file(path):
+    try:
+        os.remove(path)
+    except OSError as e:
+        print(f"Warning: Could not remove temporary file {path}: {e}")
+
+
+def make_transcode_pool(workers=None):
+    return ProcessPoolExecutor(max_workers=max(1, workers or DEFAULT_TRANSCODE_WORKERS),
+                               mp_context=multiprocessing.get_context(TRANSCODE_START_METHOD))
+
+
+def warm_transcode_pool(pool, workers=None):
+    """Start every process in the pool so the first job doesn't pay for it"""
+    for future in [pool.submit(os.getpid) for _ in range(max(1, workers or DEFAULT_TRANSCODE_WORKERS))]:
+        future.result()
+
+
+class VoiceCreator:
+    def __init__(self, download_workers=None, transcode_workers=None, in_memory=None, cache_backend=None,
+                 storage_client=None, trim=None, transcode_pool=None):
+        self.download_workers = max(1, download_workers or DEFAULT_DOWNLOAD_WORKERS)
+        self.transcode_workers = max(1, transcode_workers or DEFAULT_TRANSCODE_WORKERS)
+        self.in_memory = DEFAULT_IN_MEMORY_DECODE if in_memory is None else in_memory
+        self.cache_backend = cache_backend
+        self.storage_client = storage_client
+        if trim is None:
+            from vad import VAD_ENABLED
+            trim = VAD_ENABLED
+        self.trim = trim
+        # A long-lived pool shared across builds (the worker service's); without one each build makes its own
+        self.transcode_pool = transcode_pool
+
+    @property
+    def processor(self):
+        return get_wav2vec2()[0]
 
-            # Create a temporary WAV file
-            with tempfile.NamedTemporaryFile(suffix='.wav', delete=False) as temp_wav:
-                temp_wav_path = temp_wav.name
+    @property
+    def model(self):
+        return get_wav2vec2()[1]
 
-            # Convert to WAV using ffmpeg
-            subprocess.run([
-                'ffmpeg', '-y', '-i', audio_path,
-                '-acodec', 'pcm_s16le',
-                '-ar', '16000',
-                '-ac', '1',
-                temp_wav_path
-            ], check=True, capture_output=True)
+    @property
+    def device(self):
+        return get_wav2vec2()[2]
 
-            # Read the converted WAV file
-            audio, sample_rate = sf.read(temp_wav_path)
-            os.remove(temp_wav_path)
+    def process_audio(self, audio_path):
+        # Encoded bytes are decoded entirely in memory; paths go through ffmpeg on disk
+        if isinstance(audio_path, (bytes, bytearray)):
+            audio = decode_audio_bytes(bytes(audio_path))
+        else:
+            audio = transcode_audio(audio_path)
+        if audio is not None and self.trim:
+            from vad import trim_silence
+            audio, _ = trim_silence(audio)
+        return audio
 
-            # Convert stereo to mono if needed
-            if len(audio.shape) > 1:
-                audio = audio.mean(axis=1)
+    def _download(self, blob, timer):
+        """Fetch one blob for decoding: its bytes when decoding in memory, otherwise a temp file path"""
+        with timer.stage('download'):
+            if self.in_memory:
+                return blob.download_as_bytes()
+            with tempfile.NamedTemporaryFile(delete=False, suffix=os.path.splitext(blob.name)[1]) as tmp_file:
+                temp_path = tmp_file.name
+            try:
+                blob.download_to_filename(temp_path)
+            except BaseException:
+                remove_temp_file(temp_path)
+                raise
+            return temp_path
 
-            # Resample to 16kHz if needed
-            if sample_rate != 16000:
-                from scipy import signal
-                audio = signal.resample(audio, int(len(audio) * 16000 / sample_rate))
+    def _start_transcode(self, blob, source, transcode_pool, timer):
+        """Hand downloaded audio to the transcode pool and return its future without waiting on it"""
+        start = time.perf_counter()
+        try:
+            if self.in_memory:
+                future = transcode_pool.submit(decode_audio_bytes, source, blob.name)
+            else:
+                future = transcode_pool.submit(transcode_audio, source)
+                future.add_done_callback(lambda _: remove_temp_file(source))
+        except BaseException:
+            if not self.in_memory:
+                remove_temp_file(source)
+            raise
+        future.add_done_callback(lambda _: timer.record('transcode', start, time.perf_counter()))
+        return future
 
-            return audio
+    def _load_segment(self, blob, transcode_pool, timer, cache):
+        """Runs on a download thread: the audio on a cache hit (None on failure), otherwise a transcode future.
 
+        Returning the future frees the thread for the next download as soon as
+        this blob's bytes have arrived, instead of holding it for the decode.
+        """
+        if cache is not None:
+            from transcode_cache import segment_key
+            with timer.stage('cache_get'):
+                audio = cache.get(segment_key(blob))
+            if audio is not None:
+                return audio
+        try:
+            return self._start_transcode(blob, self._download(blob, timer), transcode_pool, timer)
         except Exception as e:
-            print(f"Error processing audio file {audio_path}: {str(e)}")
+            print(f"Error downloading {blob.name}: {str(e)}")
             return None
 
-    def create_voice(self, user_id, name):
+    def _put_cached(self, cache, key, audio, timer):
+        with timer.stage('cache_put'):
+            cache.put(key, audio)
+
+    def _finish_segment(self, blob, loaded, download_pool, timer, cache):
+        """Wait for a segment's transcode, if it needed one, and queue the cache write on the download pool"""
+        if not isinstance(loaded, Future):
+            return loaded
+        try:
+            audio = loaded.result()
+        except Exception as e:
+            print(f"Error transcoding {blob.name}: {str(e)}")
+            return None
+        if audio is not None and cache is not None:
+            from transcode_cache import segment_key
+            download_pool.submit(self._put_cached, cache, segment_key(blob), audio, timer)
+        return audio
+
+    def iter_processed_audio(self, blobs, timer, cache=None):
+        """Yield (blob, audio) in listing order while downloads and transcodes run concurrently"""
+        # Bound the number of in-flight blobs so temp files and decoded clips
+        # waiting on an earlier, slower blob cannot pile up without limit
+        window = self.download_workers * 2
+        with ExitStack() as stack:
+            download_pool = stack.enter_context(ThreadPoolExecutor(max_workers=self.download_workers))
+            transcode_pool = self.transcode_pool or stack.enter_context(make_transcode_pool(self.transcode_workers))
+            pending = deque()
+            for blob in blobs:
+                future = download_pool.submit(self._load_segment, blob, transcode_pool, timer, cache)
+                pending.append((blob, future))
+                if len(pending) >= window:
+                    done_blob, done_future = pending.popleft()
+                    yield done_blob, self._finish_segment(done_blob, done_future.result(), download_pool, timer,
+                                                          cache)
+            while pending:
+                done_blob, done_future = pending.popleft()
+                yield done_blob, self._finish_segment(done_blob, done_future.result(), download_pool, timer, cache)
+
+    def create_voice(self, user_id, name, rebuild=False, trim=None):
+        import soundfile as sf
+        from google.cloud import storage
+        from storage.recordings_manifest import invalidate_recordings_manifest, load_recordings_manifest, manifest_blobs
+        from transcode_cache import DEFAULT_CACHE_BACKEND, TranscodeCache, segment_key, load_manifest, save_manifest
+        from vad import describe, merge_stats, trim_silence, vad_settings
+
+        trim = self.trim if trim is None else trim
         try:
             # Initialize Google Cloud Storage client with default credentials
-            storage_client = storage.Client()
+            storage_client = self.storage_client or storage.Client()
             bucket = storage_client.bucket('memorial-voices')
             
             # Check if voice already exists
+            folder = name.replace(' ', '_')
             voice_id = f"voice_{user_id}_{name.replace(' ', '_').lower()}"
-            voice_blob = bucket.blob(f"{name.replace(' ', '_')}/voice/{voice_id}.wav")
+            voice_blob = bucket.blob(f"{folder}/voice/{voice_id}.wav")
+            manifest_path = f"{folder}/voice/{voice_id}.manifest.json"
             
-            if voice_blob.exists():
+            voice_exists = voice_blob.exists()
+            manifest = load_manifest(bucket, manifest_path) if voice_exists else None
+            if voice_exists and manifest is None and not rebuild:
+                # Voices built before the manifest existed are left alone unless a rebuild is forced
                 print(f"Voice already exists for {name}")
                 return voice_id
 
             name_parts = name.split()
             prefix = f"{name_parts[0]}_{name_parts[1]}"
-            blobs = list(bucket.list_blobs(prefix=prefix))
+            timer = StageTimer()
+            with timer.stage('list'):
+                # The folder's recordings manifest replaces the paginated listing when it has one
+                recordings_manifest = load_recordings_manifest(bucket, folder)
+                if recordings_manifest is not None:
+                    blobs = manifest_blobs(bucket, recordings_manifest)
+                else:
+                    blobs = list(bucket.list_blobs(prefix=prefix))
+            # Skip our own outputs: the combined voice and cached segments live under the same prefix
+            audio_blobs = [
+                blob for blob in blobs
+                if blob.name.endswith(AUDIO_EXTENSIONS)
+                and '/voice/' not in blob.name
+                and '/voice_cache/' not in blob.name
+            ]
+            segment_keys = [segment_key(blob) for blob in audio_blobs]
+            # Segments are cached untrimmed, so changing the VAD settings only rebuilds the voice
+            trim_settings = vad_settings() if trim else None
+
+            if voice_exists and manifest is not None and not rebuild:
+                # source_keys covers every recording the last build tried, including ones that failed to
+                # decode; manifests written before it existed only list the segments that made it in
+                built_from = manifest.get('source_keys') or [
+                    segment['cache_key'] for segment in manifest.get('segments', [])
+                ]
+                if built_from == segment_keys and manifest.get('vad') == trim_settings:
+                    print(f"Voice already up to date for {name}")
+                    return voice_id
+                print(f"Recordings or trim settings changed since the last build, rebuilding voice for {name}")
+
+            # Decoded segments are cached locally by default, or next to the voice in the bucket
+            cache_backend = self.cache_backend or DEFAULT_CACHE_BACKEND
+            cache = None
+            if cache_backend != 'off':
+                cache = TranscodeCache(backend=cache_backend, bucket=bucket, prefix=f"{folder}/voice_cache")
 
             print(f"Creating voice for user {user_id} with name {name}")
-            voice_id = f"voice_{user_id}_{name.replace(' ', '_').lower()}"
-            processed_audio = []
+            output_path = f"storage/voices/{voice_id}.wav"
+            os.makedirs(os.path.dirname(output_path), exist_ok=True)
 
-            print(f"Found {len(blobs)} audio files in GCP bucket")
+            print(f"Found {len(audio_blobs)} audio files in GCP bucket")
+            print(f"Processing {len(audio_blobs)} files with {self.download_workers} download "
+                  f"and {self.transcode_workers} transcode workers"
+                  f"{' (in-memory decode)' if self.in_memory else ''}")
             processed_count = 0
-            for blob in blobs:
-                if blob.name.endswith(('.wav', '.mp3', '.webm')):
-                    print(f"Processing file {processed_count + 1}/{len(blobs)}: {blob.name}")
-                    import tempfile
-                    with tempfile.NamedTemporaryFile(delete=False, suffix=os.path.splitext(blob.name)[1]) as tmp_file:
-                        temp_path = tmp_file.name
-                        blob.download_to_filename(temp_path)
-                        audio = self.process_audio(temp_path)
-                        if audio is not None:
-                            processed_audio.append(audio)
-                            print(f"Successfully processed {blob.name}")
-                        else:
-                            print(f"Failed to process {blob.name}")
-                        try:
-                            os.remove(temp_path)
-                        except OSError as e:
-                            print(f"Warning: Could not remove temporary file {temp_path}: {e}")
+            written_count = 0
+            segments = []
+            failed = []
+            failed_blobs = []
+            trim_stats = {}
+            # Append each clip to the open WAV as soon as it is ready so peak
+            # memory is bounded by the in-flight window, not the whole voice
+            with sf.SoundFile(output_path, 'w', samplerate=16000, channels=1,
+                              format='WAV', subtype='PCM_16') as voice_file:
+                processed = self.iter_processed_audio(audio_blobs, timer, cache)
+                for key, (blob, audio) in zip(segment_keys, processed):
+                    print(f"Processed file {processed_count + 1}/{len(audio_blobs)}: {blob.name}")
+                    if audio is not None:
+                        if trim:
+                            with timer.stage('trim'):
+                                audio, stats = trim_silence(audio)
+                            merge_stats(trim_stats, stats)
+                        with timer.stage('assemble'):
+                            voice_file.write(audio)
+                        written_count += 1
+                        segments.append({
+                            "blob": blob.name,
+                            "generation": blob.generation,
+                            "md5": blob.md5_hash,
+                            "cache_key": key,
+                            "samples": len(audio),
+                        })
+                        print(f"Successfully processed {blob.name}")
+                    else:
+                        failed.append({"blob": blob.name, "cache_key": key})
+                        failed_blobs.append(blob)
+                        print(f"Failed to process {blob.name}")
                     processed_count += 1
             print(f"Completed processing {processed_count} files")
+            # A manifest entry whose generation is gone means a write bypassed the manifest; drop
+            # it so the next build lists the folder (and the changed listing triggers a rebuild)
+            if recordings_manifest is not None and any(not blob.exists() for blob in failed_blobs):
+                print(f"Recordings manifest for {folder} is stale, invalidating it")
+                invalidate_recordings_manifest(bucket, folder)
+            if cache is not None:
+                print(f"Transcode cache: {cache.hits} hits, {cache.misses} misses")
+            if trim_stats:
+                print(f"Silence trimming {describe(trim_stats)}")
 
-            if processed_audio and any(audio is not None for audio in processed_audio):
-                # Filter out None values and combine valid audio
-                valid_audio = [audio for audio in processed_audio if audio is not None]
-                if valid_audio:
-                    combined_audio = np.concatenate(valid_audio)
-                    output_path = f"storage/voices/{voice_id}.wav"
-                    os.makedirs(os.path.dirname(output_path), exist_ok=True)
-
-                    # Save processed audio
-                    sf.write(output_path, combined_audio, 16000, format='WAV', subtype='PCM_16')
-                else:
-                    print("No valid audio files were processed successfully")
-                    return None
+            if not written_count:
+                print("No valid audio files were processed successfully")
+                try:
+                    os.remove(output_path)
+                except OSError:
+                    pass
+                return None
 
-                # Upload to GCS
-                voice_filename = f"{voice_id}.wav"
-                gcs_path = f"{name.replace(' ', '_')}/voice/{voice_filename}"
-                voice_blob = bucket.blob(gcs_path)
+            # Upload to GCS
+            voice_filename = f"{voice_id}.wav"
+            gcs_path = f"{name.replace(' ', '_')}/voice/{voice_filename}"
+            voice_blob = bucket.blob(gcs_path)
 
-                try:
+            try:
+                with timer.stage('upload'):
                     voice_blob.upload_from_filename(output_path)
-                    print(f"Voice file successfully uploaded to GCS at path: {gcs_path}")
-
-                    # Create a voice_id.json file to store the voice ID
-                    voice_id_json = {
-                        "voice_id": voice_id,
-                        "created_at": f"{datetime.datetime.now().isoformat()}"
-                    }
-                    
-                    # Save the voice ID JSON file locally
-                    json_output_path = f"storage/voices/{user_id}_voice_id.json"
-                    with open(json_output_path, 'w') as f:
-                        json.dump(voice_id_json, f)
-                        
-                    # Upload the voice ID JSON file to GCS
-                    json_gcs_path = f"{user_id}/voice_id/voice_id.json"
-                    json_blob = bucket.blob(json_gcs_path)
-                    json_blob.upload_from_filename(json_output_path)
-                    
-                    # Verify upload
-                    if voice_blob.exists():
-                        print(f"Voice created and verified in GCS: {voice_id}")
-                        print(f"Voice ID JSON file created at: {json_gcs_path}")
-                        return voice_id
-                    else:
-                        raise Exception("Upload verification failed")
-                except Exception as e:
-                    print(f"Error uploading to GCS: {str(e)}")
-                    raise e
+                print(f"Voice file successfully uploaded to GCS at path: {gcs_path}")
+                print(timer.report(), file=sys.stderr)
 
-            else:
-                print("No audio files found to process")
-                return None
+                # Record which cached segments make up this voice so the next
+                # build can tell whether anything changed
+                save_manifest(bucket, manifest_path, {
+                    "voice_id": voice_id,
+                    "updated_at": datetime.datetime.now().isoformat(),
+                    "sample_rate": 16000,
+                    "vad": trim_settings,
+                    "source_keys": segment_keys,
+                    "segments": segments,
+                    # Retried only when the recordings change or on --rebuild
+                    "failed": failed,
+                })
+
+                # Create a voice_id.json file to store the voice ID
+                voice_id_json = {
+                    "voice_id": voice_id,
+                    "created_at": f"{datetime.datetime.now().isoformat()}"
+                }
+
+                # Save the voice ID JSON file locally
+                json_output_path = f"storage/voices/{user_id}_voice_id.json"
+                with open(json_output_path, 'w') as f:
+                    json.dump(voice_id_json, f)
+
+                # Upload the voice ID JSON file to GCS
+                json_gcs_path = f"{user_id}/voice_id/voice_id.json"
+                json_blob = bucket.blob(json_gcs_path)
+                json_blob.upload_from_filename(json_output_path)
+
+                # Verify upload
+                if voice_blob.exists():
+                    print(f"Voice created and verified in GCS: {voice_id}")
+                    print(f"Voice ID JSON file created at: {json_gcs_path}")
+                    return voice_id
+                else:
+                    raise Exception("Upload verification failed")
+            except Exception as e:
+                print(f"Error uploading to GCS: {str(e)}")
+                raise e
 
         except Exception as e:
             print(f"Error creating voice: {str(e)}")
             raise e
 
 if __name__ == "__main__":
-    import sys
-    if len(sys.argv) != 3:
-        print("Usage: python create_voice.py <user_id> <name>")
-        sys.exit(1)
+    parser = argparse.ArgumentParser(description="Create a combined voice file from a user's recordings")
+    parser.add_argument("user_id", help="User ID")
+    parser.add_argument("name", help="Full name used for the bucket folder")
+    parser.add_argument("--download-workers", type=int, default=None,
+                        help="Concurrent blob downloads (default: $VOICE_DOWNLOAD_WORKERS or 8)")
+    parser.add_argument("--transcode-workers", type=int, default=None,
+                        help="ffmpeg transcode processes (default: $VOICE_TRANSCODE_WORKERS or CPU count); "
+                             "needs --local, the worker service's pool is sized when it starts")
+    parser.add_argument("--in-memory", action="store_true", default=None,
+                        help="Pipe blobs through ffmpeg stdin/stdout instead of temp files "
+                             "(default: $VOICE_IN_MEMORY_DECODE)")
+    parser.add_argument("--cache", choices=["local", "gcs", "off"], default=None,
+                        help="Where decoded segments are cached (default: $VOICE_CACHE_BACKEND or local)")
+    parser.add_argument("--rebuild", action="store_true",
+                        help="Rebuild even if a voice without a manifest already exists")
+    parser.add_argument("--no-trim", dest="trim", action="store_false", default=None,
+                        help="Keep silences instead of trimming them (default: $VAD_ENABLED)")
+    parser.add_argument("--local", action="store_true",
+                        help="Run in this process instead of submitting to the worker service")
+    args = parser.parse_args()
+
+    if args.transcode_workers is not None and not args.local:
+        parser.error("--transcode-workers only applies with --local; "
+                     "set VOICE_TRANSCODE_WORKERS where the worker service runs instead")
+
+    voice_id = None
+    if not args.local:
+        from worker_client import WorkerUnavailable, submit_job
+        try:
+            result = submit_job('create_voice', {"user_id": args.user_id, "name": args.name, "rebuild": args.rebuild,
+                                                 "trim": args.trim, "download_workers": args.download_workers,
+                                                 "in_memory": args.in_memory, "cache_backend": args.cache})
+            voice_id = result['voice_id']
+        except WorkerUnavailable:
+            print("Worker service unavailable, creating voice in this process", file=sys.stderr)
+            args.local = True
+
+    if args.local:
+        creator = VoiceCreator(download_workers=args.download_workers, transcode_workers=args.transcode_workers,
+                               in_memory=args.in_memory, cache_backend=args.cache)
+        voice_id = creator.create_voice(args.user_id, args.name, rebuild=args.rebuild, trim=args.trim)
 
-    creator = VoiceCreator()
-    creator.create_voice(sys.argv[1], sys.argv[2])
\ No newline at end of file
+    if voice_id:
+        print(voice_id)
\ No newline at end of file
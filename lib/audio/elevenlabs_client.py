@@ -0,0 +1,123 @@
+import os
+import sys
+import time
+import random
+import threading
+import requests
+from requests.adapters import HTTPAdapter
+
+ELEVENLABS_API_BASE = os.getenv('ELEVENLABS_API_BASE', 'https://api.elevenlabs.io')
+ELEVENLABS_CONNECT_TIMEOUT = float(os.getenv('ELEVENLABS_CONNECT_TIMEOUT', '3.05'))
+ELEVENLABS_READ_TIMEOUT = float(os.getenv('ELEVENLABS_READ_TIMEOUT', '30'))
+ELEVENLABS_MAX_RETRIES = int(os.getenv('ELEVENLABS_MAX_RETRIES', '3'))
+ELEVENLABS_POOL_SIZE = int(os.getenv('ELEVENLABS_POOL_SIZE', '16'))
+ELEVENLABS_BACKOFF = float(os.getenv('ELEVENLABS_BACKOFF', '0.25'))
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+STREAM_CHUNK_SIZE = 16384
+
+DEFAULT_MODEL_ID = "eleven_monolingual_v1"
+DEFAULT_VOICE_SETTINGS = {
+    "stability": 0.75,
+    "similarity_boost": 0.75
+}
+
+
+class ElevenLabsError(Exception):
+    def __init__(self, message, status_code=None):
+        super().__init__(message)
+        self.status_code = status_code
+
+
+class ElevenLabsClient:
+    """Keep-alive, pooled ElevenLabs TTS client with timeouts and jittered retries"""
+
+    def __init__(self, api_key=None, base_url=ELEVENLABS_API_BASE, connect_timeout=ELEVENLABS_CONNECT_TIMEOUT,
+                 read_timeout=ELEVENLABS_READ_TIMEOUT, max_retries=ELEVENLABS_MAX_RETRIES,
+                 pool_size=ELEVENLABS_POOL_SIZE, backoff=ELEVENLABS_BACKOFF):
+        self.base_url = base_url.rstrip('/')
+        self.timeout = (connect_timeout, read_timeout)
+        self.max_retries = max_retries
+        self.backoff = backoff
+
+        # One session = one connection pool; TCP+TLS handshakes are paid once per
+        # pooled connection instead of once per utterance
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=0)
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+        self.session.headers.update({
+            "xi-api-key": api_key if api_key is not None else os.getenv('ELEVEN_LABS_API', ''),
+            "Content-Type": "application/json",
+            "Accept": "audio/mpeg",
+        })
+
+    def _retry_delay(self, attempt, response=None):
+        """Honor Retry-After when present, otherwise full-jitter exponential backoff"""
+        retry_after = response.headers.get('Retry-After') if response is not None else None
+        if retry_after:
+            try:
+                return float(retry_after)
+            except ValueError:
+                pass
+        return random.uniform(0, self.backoff * (2 ** attempt))
+
+    def _open_stream(self, voice_id, text, model_id, voice_settings):
+        """POST to the streaming TTS endpoint, retrying 429/5xx and connection errors"""
+        url = f"{self.base_url}/v1/text-to-speech/{voice_id}/stream"
+        payload = {
+            "text": text,
+            "model_id": model_id,
+            "voice_settings": voice_settings
+        }
+        for attempt in range(self.max_retries + 1):
+            try:
+                response = self.session.post(url, json=payload, stream=True, timeout=self.timeout)
+            except (requests.ConnectionError, requests.Timeout) as e:
+                if attempt >= self.max_retries:
+                    raise ElevenLabsError(f"ElevenLabs request failed: {str(e)}") from e
+                delay = self._retry_delay(attempt)
+                print(f"ElevenLabs request error ({str(e)}), retrying in {delay:.2f}s", file=sys.stderr)
+                time.sleep(delay)
+                continue
+
+            if response.status_code == 200:
+                return response
+            if response.status_code in RETRY_STATUSES and attempt < self.max_retries:
+                delay = self._retry_delay(attempt, response)
+                response.close()
+                print(f"ElevenLabs returned {response.status_code}, retrying in {delay:.2f}s", file=sys.stderr)
+                time.sleep(delay)
+                continue
+
+            message = response.text
+            response.close()
+            raise ElevenLabsError(f"ElevenLabs API error: {response.status_code} - {message}",
+                                  status_code=response.status_code)
+
+    def stream_speech(self, voice_id, text, model_id=DEFAULT_MODEL_ID, voice_settings=None):
+        """Yield MP3 bytes as they arrive from the streaming endpoint"""
+        response = self._open_stream(voice_id, text, model_id, voice_settings or DEFAULT_VOICE_SETTINGS)
+        with response:
+            for chunk in response.iter_content(chunk_size=STREAM_CHUNK_SIZE):
+                if chunk:
+                    yield chunk
+
+    def synthesize(self, voice_id, text, model_id=DEFAULT_MODEL_ID, voice_settings=None):
+        """Return the complete MP3 for text"""
+        return b"".join(self.stream_speech(voice_id, text, model_id, voice_settings))
+
+    def close(self):
+        self.session.close()
+
+
+_client = None
+_client_lock = threading.Lock()
+
+
+def get_elevenlabs_client():
+    """Return the process-wide ElevenLabs client, creating it on first use"""
+    global _client
+    with _client_lock:
+        if _client is None:
+            _client = ElevenLabsClient()
+        return _client
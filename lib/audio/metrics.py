@@ -0,0 +1,237 @@
+import math
+import time
+import threading
+from contextlib import contextmanager
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _format_labels(names, values, extra=None):
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(f'{extra[0]}="{_escape(extra[1])}"')
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format_value(value):
+    if value == math.inf:
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class _Metric:
+    kind = None
+
+    def __init__(self, name, help_text, labelnames=()):
+        self.name = name
+        self.help = help_text
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        self._values = {}
+
+    def _key(self, labels):
+        if set(labels) != set(self.labelnames):
+            raise ValueError(f"{self.name} expects labels {self.labelnames}, got {tuple(labels)}")
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def header(self):
+        return [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+
+
+class Counter(_Metric):
+    kind = 'counter'
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def render(self):
+        with self._lock:
+            items = sorted(self._values.items())
+        return self.header() + [
+            f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}" for key, value in items
+        ]
+
+
+class Gauge(_Metric):
+    kind = 'gauge'
+
+    def __init__(self, name, help_text, labelnames=(), callback=None):
+        super().__init__(name, help_text, labelnames)
+        # callback() -> {label tuple: value}, evaluated at scrape time
+        self.callback = callback
+
+    def set(self, value, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def dec(self, amount=1, **labels):
+        self.inc(-amount, **labels)
+
+    def render(self):
+        if self.callback is not None:
+            items = sorted(self.callback().items())
+        else:
+            with self._lock:
+                items = sorted(self._values.items())
+        return self.header() + [
+            f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}" for key, value in items
+        ]
+
+
+class Histogram(_Metric):
+    kind = 'histogram'
+
+    def __init__(self, name, help_text, labelnames=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, help_text, labelnames)
+        self.buckets = tuple(sorted(buckets)) + (math.inf,)
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                state = self._values[key] = {"counts": [0] * len(self.buckets), "sum": 0.0, "count": 0}
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    state["counts"][i] += 1
+                    break
+            state["sum"] += value
+            state["count"] += 1
+
+    @contextmanager
+    def time(self, **labels):
+        """Observe the wall time of the with-block"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def render(self):
+        with self._lock:
+            items = sorted((key, dict(state, counts=list(state["counts"]))) for key, state in self._values.items())
+        lines = self.header()
+        for key, state in items:
+            cumulative = 0
+            for bound, count in zip(self.buckets, state["counts"]):
+                cumulative += count
+                labels = _format_labels(self.labelnames, key, ("le", _format_value(bound)))
+                lines.append(f"{self.name}_bucket{labels} {cumulative}")
+            labels = _format_labels(self.labelnames, key)
+            lines.append(f"{self.name}_sum{labels} {_format_value(state['sum'])}")
+            lines.append(f"{self.name}_count{labels} {state['count']}")
+        return lines
+
+
+class MetricsRegistry:
+    """Process-wide set of metrics rendered in the Prometheus text exposition format"""
+
+    def __init__(self):
+        self._metrics = {}
+        self._lock = threading.Lock()
+
+    def _register(self, metric):
+        with self._lock:
+            existing = self._metrics.get(metric.name)
+            if existing is not None:
+                return existing
+            self._metrics[metric.name] = metric
+            return metric
+
+    def counter(self, name, help_text, labelnames=()):
+        return self._register(Counter(name, help_text, labelnames))
+
+    def gauge(self, name, help_text, labelnames=(), callback=None):
+        return self._register(Gauge(name, help_text, labelnames, callback))
+
+    def histogram(self, name, help_text, labelnames=(), buckets=DEFAULT_BUCKETS):
+        return self._register(Histogram(name, help_text, labelnames, buckets))
+
+    def render(self):
+        with self._lock:
+            metrics = list(self._metrics.values())
+        lines = []
+        for metric in metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+def _add_label(sample, name, value):
+    """Add one label to a sample line of the text exposition format"""
+    series, _, rest = sample.partition(" ")
+    pair = f'{name}="{_escape(value)}"'
+    if series.endswith("}"):
+        series = series[:-1] + "," + pair + "}"
+    else:
+        series = series + "{" + pair + "}"
+    return f"{series} {rest}"
+
+
+def merge_expositions(sources, label="process"):
+    """Merge rendered registries from several processes into one exposition.
+
+    sources is [(label value, text)]; every sample gets the label, and the
+    samples of each metric family are grouped under a single HELP/TYPE header.
+    """
+    families = {}
+    for value, text in sources:
+        family = None
+        for line in text.splitlines():
+            if not line:
+                continue
+            if line.startswith("# "):
+                parts = line.split(" ", 3)
+                if len(parts) >= 3 and parts[1] in ("HELP", "TYPE"):
+                    family = families.setdefault(parts[2], {"header": {}, "samples": []})
+                    family["header"].setdefault(parts[1], line)
+                continue
+            if family is not None:
+                family["samples"].append(_add_label(line, label, value))
+    lines = []
+    for family in families.values():
+        lines.extend(family["header"][kind] for kind in ("HELP", "TYPE") if kind in family["header"])
+        lines.extend(family["samples"])
+    return "\n".join(lines) + "\n"
+
+
+REGISTRY = MetricsRegistry()
+
+# Conversation turn latency, shared by the handler and the socket server
+PROFILE_LOAD_SECONDS = REGISTRY.histogram(
+    'conversation_profile_load_seconds', 'Time to load a user profile at conversation start')
+VOICE_ID_LOOKUP_SECONDS = REGISTRY.histogram(
+    'conversation_voice_id_lookup_seconds', 'Voice ID lookup time', ['cache'])
+LLM_FIRST_TOKEN_SECONDS = REGISTRY.histogram(
+    'conversation_llm_first_token_seconds', 'Gemini time to first streamed token')
+LLM_SECONDS = REGISTRY.histogram(
+    'conversation_llm_seconds', 'Gemini generation time for a full reply', ['mode'])
+TTS_FIRST_BYTE_SECONDS = REGISTRY.histogram(
+    'conversation_tts_first_byte_seconds', 'ElevenLabs time to first audio byte')
+TTS_SECONDS = REGISTRY.histogram(
+    'conversation_tts_seconds', 'Time to synthesize one utterance', ['cache'])
+WS_SEND_SECONDS = REGISTRY.histogram(
+    'conversation_ws_send_seconds', 'Time spent in websocket send', ['kind'])
+TURN_SECONDS = REGISTRY.histogram(
+    'conversation_turn_seconds', 'End-to-end conversation turn time', ['mode'])
+TURN_FIRST_AUDIO_SECONDS = REGISTRY.histogram(
+    'conversation_turn_first_audio_seconds', 'Time from user message to first audio sent', ['mode'])
+TURNS_TOTAL = REGISTRY.counter(
+    'conversation_turns_total', 'Conversation turns by outcome', ['mode', 'outcome'])
+LLM_ERRORS_TOTAL = REGISTRY.counter(
+    'conversation_llm_errors_total', 'Gemini calls that failed')
+TTS_ERRORS_TOTAL = REGISTRY.counter(
+    'conversation_tts_errors_total', 'TTS calls that failed')
+AUDIO_FLOW_WAIT_SECONDS = REGISTRY.histogram(
+    'conversation_audio_flow_wait_seconds', 'Time framed audio sends spent waiting on flow control', ['reason'])
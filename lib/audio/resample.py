@@ -0,0 +1,140 @@
+import math
+import numpy as np
+
+DEFAULT_BLOCK_SIZE = 65536
+# Filter half-length in samples of the lower of the two rates
+DEFAULT_HALF_WIDTH = 24
+# Passband edge as a fraction of the lower Nyquist rate, so the transition
+# band sits below Nyquist instead of straddling it
+DEFAULT_ROLLOFF = 0.9
+KAISER_BETA = 8.0
+
+
+def design_lowpass(up, down, half_width=DEFAULT_HALF_WIDTH, rolloff=DEFAULT_ROLLOFF, beta=KAISER_BETA):
+    """Kaiser-windowed sinc anti-aliasing filter for an up/down rational resampler"""
+    # Odd length keeps the group delay a whole number of upsampled samples
+    num_taps = 2 * half_width * max(up, down) + 1
+    # Cut off below the lower of the two Nyquist rates, expressed at the upsampled rate
+    cutoff = rolloff * 0.5 / max(up, down)
+    n = np.arange(num_taps) - (num_taps - 1) / 2
+    taps = 2 * cutoff * np.sinc(2 * cutoff * n) * np.kaiser(num_taps, beta)
+    # Unity passband gain after zero-stuffing by `up`
+    return taps * (up / taps.sum())
+
+
+class StreamingResampler:
+    """Polyphase FIR resampler that converts audio block by block with bounded memory.
+
+    Feed blocks of any size to process(); each call returns every output sample
+    that can be computed so far. Call flush() once at the end to drain the filter
+    tail. Only one filter length of input history is kept between calls, so
+    memory depends on the block size, not on the length of the recording.
+    """
+
+    def __init__(self, orig_sr, target_sr, half_width=DEFAULT_HALF_WIDTH, dtype=np.float32):
+        g = math.gcd(int(orig_sr), int(target_sr))
+        self.up = int(target_sr) // g
+        self.down = int(orig_sr) // g
+        self.dtype = dtype
+
+        taps = design_lowpass(self.up, self.down, half_width)
+        # Offset outputs by the filter's group delay so the result is time-aligned
+        self.offset = (len(taps) - 1) // 2
+        self.taps_per_phase = -(-len(taps) // self.up)
+        taps = np.concatenate((taps, np.zeros(self.taps_per_phase * self.up - len(taps))))
+        # phases[p, j] = taps[p + j * up]: the taps that touch real input samples
+        # for an output landing on phase p of the zero-stuffed signal
+        self.phases = taps.reshape(self.taps_per_phase, self.up).T.astype(dtype)
+        self._reversed_phases = np.ascontiguousarray(self.phases[:, ::-1])
+
+        # Input history, with leading zeros standing in for samples before the start
+        self._buffer = np.zeros(self.taps_per_phase - 1, dtype=dtype)
+        self._buffer_start = -(self.taps_per_phase - 1)
+        self._next_output = 0
+        self._samples_in = 0
+        self._flushed = False
+
+    @property
+    def _buffer_end(self):
+        return self._buffer_start + len(self._buffer)
+
+    def _emit(self, stop):
+        """Compute outputs [next_output, stop) from the buffered input"""
+        if stop <= self._next_output:
+            return np.zeros(0, dtype=self.dtype)
+
+        count = stop - self._next_output
+        out = np.empty(count, dtype=self.dtype)
+        buffer = np.ascontiguousarray(self._buffer)
+        itemsize = buffer.itemsize
+        # Outputs `up` apart share a filter phase and their input windows sit
+        # exactly `down` samples apart, so each phase class is one strided
+        # (rows x taps) view of the buffer times one tap vector - no gather copy
+        for k in range(min(self.up, count)):
+            n0 = self._next_output + k
+            position = n0 * self.down + self.offset
+            phase = position % self.up
+            first = position // self.up - self._buffer_start - (self.taps_per_phase - 1)
+            rows = len(range(k, count, self.up))
+            windows = np.lib.stride_tricks.as_strided(
+                buffer[first:], shape=(rows, self.taps_per_phase),
+                strides=(self.down * itemsize, itemsize), writeable=False
+            )
+            out[k::self.up] = windows @ self._reversed_phases[phase]
+        self._next_output = stop
+
+        # Drop history no future output can reach
+        keep_from = (self._next_output * self.down + self.offset) // self.up - (self.taps_per_phase - 1)
+        drop = min(max(0, keep_from - self._buffer_start), len(self._buffer))
+        if drop:
+            self._buffer = self._buffer[drop:]
+            self._buffer_start += drop
+        return out
+
+    def process(self, block):
+        """Consume a block of mono samples and return the newly available output"""
+        if self._flushed:
+            raise RuntimeError("StreamingResampler has already been flushed")
+        block = np.asarray(block, dtype=self.dtype)
+        if block.ndim != 1:
+            raise ValueError("StreamingResampler expects mono (1-D) blocks")
+        self._buffer = np.concatenate((self._buffer, block))
+        self._samples_in += len(block)
+
+        # Output n needs input up to index (n * down + offset) // up
+        ready = (self._buffer_end * self.up - 1 - self.offset) // self.down + 1
+        return self._emit(max(ready, self._next_output))
+
+    def flush(self):
+        """Drain the filter tail; the total output is ceil(samples_in * target / orig)"""
+        if self._flushed:
+            return np.zeros(0, dtype=self.dtype)
+        self._flushed = True
+        total = -(-self._samples_in * self.up // self.down)
+        if total <= self._next_output:
+            return np.zeros(0, dtype=self.dtype)
+        last_needed = ((total - 1) * self.down + self.offset) // self.up
+        pad = max(0, last_needed + 1 - self._buffer_end)
+        self._buffer = np.concatenate((self._buffer, np.zeros(pad, dtype=self.dtype)))
+        return self._emit(total)
+
+
+def resample_blocks(blocks, orig_sr, target_sr, half_width=DEFAULT_HALF_WIDTH):
+    """Resample an iterable of mono blocks, yielding output blocks as they become available"""
+    resampler = StreamingResampler(orig_sr, target_sr, half_width)
+    for block in blocks:
+        out = resampler.process(block)
+        if len(out):
+            yield out
+    tail = resampler.flush()
+    if len(tail):
+        yield tail
+
+
+def resample(audio, orig_sr, target_sr, block_size=DEFAULT_BLOCK_SIZE, half_width=DEFAULT_HALF_WIDTH):
+    """Resample a whole mono array through the streaming resampler in fixed-size blocks"""
+    if orig_sr == target_sr:
+        return np.asarray(audio)
+    blocks = (audio[i:i + block_size] for i in range(0, len(audio), block_size))
+    out = list(resample_blocks(blocks, orig_sr, target_sr, half_width))
+    return np.concatenate(out) if out else np.zeros(0, dtype=np.float32)
@@ -0,0 +1,143 @@
+import os
+import sys
+import json
+import time
+import hashlib
+import tempfile
+import threading
+from collections import OrderedDict
+
+
+class SessionStore:
+    """Bounded map of live sessions with idle expiry; evicted entries go to on_evict"""
+
+    def __init__(self, max_entries=1000, idle_ttl=1800.0, on_evict=None):
+        self.max_entries = max_entries
+        self.idle_ttl = idle_ttl
+        self.on_evict = on_evict
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _collect_evictions(self, now):
+        """Pop idle entries, then least recently used ones over the cap (lock held)"""
+        evicted = []
+        while self._entries:
+            key, (value, last_used) = next(iter(self._entries.items()))
+            if now - last_used < self.idle_ttl and len(self._entries) <= self.max_entries:
+                break
+            del self._entries[key]
+            evicted.append((key, value))
+        return evicted
+
+    def _evict(self, evicted):
+        # Persistence can be slow, so it runs outside the lock
+        if not self.on_evict:
+            return
+        for key, value in evicted:
+            try:
+                self.on_evict(key, value)
+            except Exception as e:
+                print(f"Error persisting evicted session {key}: {str(e)}", file=sys.stderr)
+
+    def get(self, key):
+        """Return the live session for key (refreshing its idle timer), or None"""
+        now = time.monotonic()
+        with self._lock:
+            evicted = self._collect_evictions(now)
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries[key] = (entry[0], now)
+                self._entries.move_to_end(key)
+        self._evict(evicted)
+        return entry[0] if entry is not None else None
+
+    def set(self, key, value):
+        now = time.monotonic()
+        with self._lock:
+            self._entries[key] = (value, now)
+            self._entries.move_to_end(key)
+            evicted = self._collect_evictions(now)
+        self._evict(evicted)
+
+    def pop(self, key):
+        with self._lock:
+            entry = self._entries.pop(key, None)
+        return entry[0] if entry is not None else None
+
+    def sweep(self):
+        """Evict idle sessions without waiting for the next access"""
+        with self._lock:
+            evicted = self._collect_evictions(time.monotonic())
+        self._evict(evicted)
+        return len(evicted)
+
+    def flush(self):
+        """Evict every session, e.g. before shutdown so nothing is lost"""
+        with self._lock:
+            evicted = list((key, value) for key, (value, _) in self._entries.items())
+            self._entries.clear()
+        self._evict(evicted)
+
+    def __contains__(self, key):
+        with self._lock:
+            return key in self._entries
+
+    def __len__(self):
+        with self._lock:
+            return len(self._entries)
+
+
+class HistoryPersistence:
+    """Saves serialized conversation history to local disk or the bucket"""
+
+    def __init__(self, backend='local', local_dir='storage/sessions', bucket=None):
+        self.backend = backend
+        self.local_dir = local_dir
+        self.bucket = bucket
+        if backend == 'gcs' and bucket is None:
+            raise ValueError("The gcs history backend needs a bucket")
+
+    def _local_path(self, user_id):
+        # user_id comes from the client, so it is hashed rather than used as a file name
+        digest = hashlib.sha256(str(user_id).encode("utf-8")).hexdigest()
+        return os.path.join(self.local_dir, f"{digest}.json")
+
+    def _blob_path(self, user_id):
+        return f"{user_id}/sessions/conversation_history.json"
+
+    def save(self, user_id, history):
+        if self.backend == 'off':
+            return
+        payload = json.dumps({"user_id": user_id, "saved_at": time.time(), "history": history})
+        if self.backend == 'local':
+            os.makedirs(self.local_dir, exist_ok=True)
+            # A unique temp file per write, so concurrent saves for one user can't interleave
+            fd, tmp_path = tempfile.mkstemp(dir=self.local_dir, suffix='.partial')
+            try:
+                with os.fdopen(fd, 'w') as f:
+                    f.write(payload)
+                os.replace(tmp_path, self._local_path(user_id))
+            except BaseException:
+                os.unlink(tmp_path)
+                raise
+        else:
+            self.bucket.blob(self._blob_path(user_id)).upload_from_string(payload, content_type='application/json')
+
+    def load(self, user_id):
+        """Return the saved history list for a user, or None"""
+        if self.backend == 'off':
+            return None
+        try:
+            if self.backend == 'local':
+                with open(self._local_path(user_id)) as f:
+                    return json.load(f)["history"]
+            from google.api_core.exceptions import NotFound
+            try:
+                return json.loads(self.bucket.blob(self._blob_path(user_id)).download_as_text())["history"]
+            except NotFound:
+                return None
+        except FileNotFoundError:
+            return None
+        except Exception as e:
+            print(f"Error loading saved history for {user_id}: {str(e)}", file=sys.stderr)
+            return None
@@ -4,17 +4,32 @@ import json
 import time
 import asyncio
 import websockets
+# create_protocol and extra_headers only exist on the legacy server, which newer
+# releases no longer expose as websockets.serve
+from websockets.legacy.server import serve
 
 import http
 
 import threading
 import signal
+import argparse
+import contextvars
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
 from google.cloud import storage
 import speech_recognition as sr
 import sys
 import os
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 from audio.conversation_handler import ConversationHandler
+from audio_framing import AudioStreamSender
+from socket_supervisor import (
+    CORS_HEADERS, REAPED_CONNECTIONS_TOTAL, SOCKET_DRAIN_TIMEOUT, SOCKET_IDLE_TIMEOUT, SOCKET_REAP_INTERVAL,
+    LimitedServerProtocol, run_supervisor
+)
+from metrics import (
+    PROFILE_LOAD_SECONDS, REGISTRY, TURN_FIRST_AUDIO_SECONDS, TURN_SECONDS, TURNS_TOTAL, WS_SEND_SECONDS
+)
 
 import fcntl
 import errno
@@ -22,8 +37,23 @@ import errno
 # Globals
 conversation_handler = None
 active_connections = {}
+# Blocking GCS/Gemini/ElevenLabs calls run here so they never stall the event loop
+CONVERSATION_EXECUTOR_WORKERS = int(os.environ.get("CONVERSATION_EXECUTOR_WORKERS", 32))
+blocking_executor = None
+# Executor futures of the running turn's connection; a new turn waits for them before submitting its own
+turn_jobs = contextvars.ContextVar("turn_jobs", default=None)
+# Audio chunks buffered between a TTS stream thread and the socket before the thread blocks
+AUDIO_QUEUE_CHUNKS = int(os.environ.get("AUDIO_QUEUE_CHUNKS", 8))
+# Sentences synthesized ahead of the one being sent in a streaming turn; later ones wait their turn
+STREAM_TTS_LOOKAHEAD = int(os.environ.get("STREAM_TTS_LOOKAHEAD", 2))
 server = None
 server_thread = None
+# Set while a worker finishes in-flight turns before shutting down
+draining = False
+SOCKET_WORKERS = int(os.environ.get("SOCKET_WORKERS", 1))
+# Client messages are small JSON commands; cap them so one client can't buffer megabytes
+SOCKET_MAX_MESSAGE_BYTES = int(os.environ.get("SOCKET_MAX_MESSAGE_BYTES", 256 * 1024))
+SOCKET_MAX_QUEUE = int(os.environ.get("SOCKET_MAX_QUEUE", 16))
 LOCK_FILE = '/tmp/socket_server.lock'
 
 def acquire_lock():
@@ -36,6 +66,142 @@ def acquire_lock():
             return None
         raise
 
+def submit_blocking(fn, *args):
+    """Submit a blocking call to the sized executor and return an awaitable for it.
+
+    Inside a turn the job is also tracked in turn_jobs until its thread
+    finishes; cancelling the awaiting task does not stop a job that has started.
+    """
+    loop = asyncio.get_running_loop()
+    job = blocking_executor.submit(fn, *args)
+    jobs = turn_jobs.get()
+    if jobs is not None:
+        jobs.add(job)
+        job.add_done_callback(lambda done: loop.call_soon_threadsafe(jobs.discard, done))
+    return asyncio.wrap_future(job)
+
+async def run_blocking(fn, *args):
+    """Run a blocking conversation call on the sized executor and await its result"""
+    return await submit_blocking(fn, *args)
+
+async def send_timed(websocket, payload, kind):
+    """Send one websocket message, recording how long the send took"""
+    with WS_SEND_SECONDS.time(kind=kind):
+        await websocket.send(payload)
+
+async def iter_blocking(gen_fn, *args, maxsize=AUDIO_QUEUE_CHUNKS, cancelled=None):
+    """Iterate a blocking generator on the executor through a bounded queue.
+
+    A full queue blocks the producing thread, so a slow consumer throttles the
+    upstream read instead of buffering it all in memory. The thread also stops
+    once the cancelled event is set.
+    """
+    loop = asyncio.get_running_loop()
+    items = asyncio.Queue(maxsize)
+    finished_marker = object()
+    stopped = threading.Event()
+
+    def produce():
+        try:
+            for item in gen_fn(*args):
+                future = asyncio.run_coroutine_threadsafe(items.put(item), loop)
+                while True:
+                    try:
+                        future.result(timeout=0.5)
+                        break
+                    except FutureTimeoutError:
+                        if stopped.is_set() or (cancelled is not None and cancelled.is_set()):
+                            future.cancel()
+                            return
+                if stopped.is_set() or (cancelled is not None and cancelled.is_set()):
+                    return
+        finally:
+            asyncio.run_coroutine_threadsafe(items.put(finished_marker), loop)
+
+    producer = submit_blocking(produce)
+    try:
+        while True:
+            item = await items.get()
+            if item is finished_marker:
+                break
+            yield item
+        await producer
+    finally:
+        stopped.set()
+        while not items.empty():
+            items.get_nowait()
+
+async def open_audio_stream(websocket, audio_sender):
+    """Announce a new framed audio stream to the client and return it"""
+    audio_stream = audio_sender.open_stream()
+    await send_timed(websocket, json.dumps({
+        "type": "assistant_audio_stream",
+        "stream_id": audio_stream.stream_id,
+        "format": "audio/mpeg"
+    }), "text")
+    return audio_stream
+
+async def abort_audio_stream(audio_stream):
+    """Best-effort end-of-stream for an interrupted or failed framed stream"""
+    if audio_stream is None:
+        return
+    try:
+        await asyncio.wait_for(audio_stream.abort(), 1)
+    except Exception:
+        pass
+
+def synthesis_cache_stats():
+    cache = conversation_handler.synthesis_cache if conversation_handler else None
+    if not cache:
+        return {}
+    return {(name,): value for name, value in cache.stats().items()}
+
+def connection_stats():
+    return {(): len(active_connections)}
+
+def busy_connection_stats():
+    return {(): sum(1 for c in active_connections.values() if c["turn_task"] and not c["turn_task"].done())}
+
+REGISTRY.gauge('tts_synthesis_cache', 'Synthesis cache counters and sizes', ['stat'], callback=synthesis_cache_stats)
+REGISTRY.gauge('socket_active_connections', 'Open websocket connections', callback=connection_stats)
+REGISTRY.gauge('socket_busy_connections', 'Connections with a turn in flight', callback=busy_connection_stats)
+
+async def process_request(path, headers):
+    # Plain HTTP scrape endpoint for per-turn latency metrics
+    if path.split('?', 1)[0] == '/metrics':
+        return http.HTTPStatus.OK, [
+            ('Content-Type', 'text/plain; version=0.0.4; charset=utf-8')
+        ], REGISTRY.render().encode('utf-8')
+
+    if draining:
+        return http.HTTPStatus.SERVICE_UNAVAILABLE, [('Retry-After', '5')], b'Server restarting'
+
+    upgrade_header = headers.get('Upgrade', '')
+    if not upgrade_header or 'websocket' not in upgrade_header.lower():
+        return http.HTTPStatus.UPGRADE_REQUIRED, [], b'WebSocket upgrade required'
+
+    return None
+
+async def reap_idle_connections(interval=SOCKET_REAP_INTERVAL, idle_timeout=SOCKET_IDLE_TIMEOUT):
+    """Periodically close connections that have gone quiet, and expire idle sessions"""
+    while True:
+        await asyncio.sleep(interval)
+        now = time.time()
+        idle = [
+            connection["websocket"] for connection in list(active_connections.values())
+            if now - connection["last_activity"] > idle_timeout
+            and not (connection["turn_task"] and not connection["turn_task"].done())
+        ]
+        if idle:
+            print(f"Closing {len(idle)} idle connections")
+            REAPED_CONNECTIONS_TOTAL.inc(len(idle))
+            await asyncio.gather(*(ws.close(1000, "idle timeout") for ws in idle), return_exceptions=True)
+        if conversation_handler:
+            try:
+                await run_blocking(conversation_handler.conversation_state.sweep)
+            except Exception as e:
+                print(f"Error sweeping idle sessions: {str(e)}")
+
 def initialize_conversation_handler():
     global conversation_handler
     try:
@@ -46,6 +212,199 @@ def initialize_conversation_handler():
         print(f"Error initializing conversation handler: {str(e)}")
         return False
 
+async def stream_turn(user_id, user_text, cancelled=None):
+    """Yield ("assistant_text", sentence) and ("audio_chunk", bytes) events for one turn.
+
+    Gemini output is consumed sentence by sentence in a worker thread; TTS for
+    a sentence starts as soon as it is complete, while later sentences are
+    still generating, but at most STREAM_TTS_LOOKAHEAD sentences ahead of the
+    one being sent. Audio is yielded in sentence order, each chunk as soon as
+    it and every earlier chunk are ready.
+    """
+    loop = asyncio.get_running_loop()
+    sentences = asyncio.Queue()
+    finished_marker = object()
+    stopped = cancelled if cancelled is not None else threading.Event()
+
+    def produce():
+        try:
+            for sentence in conversation_handler.stream_user_input(user_id, user_text, stopped):
+                # Stop pulling from Gemini once the turn has been cancelled
+                if stopped.is_set():
+                    break
+                loop.call_soon_threadsafe(sentences.put_nowait, sentence)
+        finally:
+            loop.call_soon_threadsafe(sentences.put_nowait, finished_marker)
+
+    def synthesize(sentence):
+        # Sentences queued behind an interrupt are never sent, so don't pay for them
+        return None if stopped.is_set() else conversation_handler.text_to_voice(user_id, sentence)
+
+    producer = submit_blocking(produce)
+    pending_audio = deque()
+    unsynthesized = deque()
+    next_sentence = asyncio.ensure_future(sentences.get())
+    generating = True
+
+    def start_synthesis():
+        while unsynthesized and len(pending_audio) <= STREAM_TTS_LOOKAHEAD:
+            pending_audio.append(submit_blocking(synthesize, unsynthesized.popleft()))
+
+    try:
+        while generating or pending_audio:
+            waiting = [next_sentence] if generating else []
+            if pending_audio:
+                waiting.append(pending_audio[0])
+            await asyncio.wait(waiting, return_when=asyncio.FIRST_COMPLETED)
+
+            while pending_audio and pending_audio[0].done():
+                audio = pending_audio.popleft().result()
+                if audio:
+                    yield "audio_chunk", audio
+            start_synthesis()
+
+            if generating and next_sentence.done():
+                sentence = next_sentence.result()
+                if sentence is finished_marker:
+                    generating = False
+                else:
+                    yield "assistant_text", sentence
+                    unsynthesized.append(sentence)
+                    start_synthesis()
+                    next_sentence = asyncio.ensure_future(sentences.get())
+        await producer
+    except Exception as e:
+        yield "error", str(e)
+    finally:
+        stopped.set()
+        next_sentence.cancel()
+
+def cancel_turn(connection):
+    """Cancel the connection's in-flight turn, returning True if one was running.
+
+    The task is cancelled and the turn's event is set so its executor jobs
+    skip whatever Gemini/ElevenLabs work and history writes remain.
+    """
+    if connection.get("turn_cancelled") is not None:
+        connection["turn_cancelled"].set()
+    task = connection.get("turn_task")
+    if task and not task.done():
+        task.cancel()
+        return True
+    return False
+
+async def run_turn(websocket, user_id, user_text, stream=False, audio_sender=None, cancelled=None, jobs=None):
+    """Produce and send one conversation turn; runs as its own task per connection.
+
+    With an audio_sender the turn's audio goes out as one framed, flow-controlled
+    stream instead of whole binary messages. jobs is the connection's set of
+    executor futures: the turn waits until an interrupted predecessor's threads
+    have finished, so one connection never holds more than one turn's jobs.
+    """
+    mode = "stream" if stream else "full"
+    start = time.perf_counter()
+    first_audio = True
+    outcome = "completed"
+    audio_stream = None
+    try:
+        if jobs:
+            await asyncio.wait([asyncio.wrap_future(job) for job in list(jobs)])
+        if jobs is not None:
+            turn_jobs.set(jobs)
+        if stream:
+            # Streaming mode: text and audio go out sentence by sentence
+            sentences = []
+            audio_chunks = 0
+            async for message_type, message_data in stream_turn(user_id, user_text, cancelled):
+                if message_type == "assistant_text":
+                    sentences.append(message_data)
+                    await send_timed(websocket, json.dumps({
+                        "type": "assistant_text_chunk",
+                        "text": message_data
+                    }), "text")
+                elif message_type == "audio_chunk":
+                    if first_audio:
+                        TURN_FIRST_AUDIO_SECONDS.observe(time.perf_counter() - start, mode=mode)
+                        first_audio = False
+                    if audio_sender:
+                        if audio_stream is None:
+                            audio_stream = await open_audio_stream(websocket, audio_sender)
+                        await audio_stream.write(message_data)
+                        # Don't hold a sentence's tail back waiting for the next sentence
+                        await audio_stream.flush()
+                    else:
+                        await send_timed(websocket, json.dumps({
+                            "type": "assistant_audio_chunk",
+                            "index": audio_chunks
+                        }), "text")
+                        await send_timed(websocket, message_data, "audio")
+                    audio_chunks += 1
+                elif message_type == "error":
+                    print(f"Error in streaming turn: {message_data}")
+                    outcome = "error"
+                    break
+
+            if audio_stream:
+                await audio_stream.close()
+            await send_timed(websocket, json.dumps({
+                "type": "assistant_turn_complete",
+                "text": " ".join(sentences),
+                "audio_chunks": audio_chunks
+            }), "text")
+            return
+
+        if audio_sender:
+            # Framed mode: audio frames go out as ElevenLabs produces them, so
+            # playback can start before synthesis finishes
+            assistant_text = await run_blocking(conversation_handler.process_user_input, user_id, user_text, cancelled)
+            await send_timed(websocket, json.dumps({
+                "type": "assistant_text",
+                "text": assistant_text
+            }), "text")
+            async for chunk in iter_blocking(conversation_handler.text_to_voice_stream, user_id, assistant_text,
+                                             cancelled=cancelled):
+                if audio_stream is None:
+                    TURN_FIRST_AUDIO_SECONDS.observe(time.perf_counter() - start, mode=mode)
+                    audio_stream = await open_audio_stream(websocket, audio_sender)
+                await audio_stream.write(chunk)
+            if audio_stream:
+                await audio_stream.close()
+            return
+
+        # Process the user input and get response
+        response = await run_blocking(conversation_handler.handle_conversation_turn, user_id, user_text, cancelled)
+
+        # Send text response
+        await send_timed(websocket, json.dumps({
+            "type": "assistant_text",
+            "text": response["text"]
+        }), "text")
+
+        # Send audio response if available
+        if response.get("audio"):
+            await send_timed(websocket, json.dumps({
+                "type": "assistant_audio_ready",
+                "message": "Audio ready to stream"
+            }), "text")
+
+            # Send binary audio data
+            TURN_FIRST_AUDIO_SECONDS.observe(time.perf_counter() - start, mode=mode)
+            await send_timed(websocket, response["audio"], "audio")
+    except asyncio.CancelledError:
+        print(f"Turn cancelled for {user_id}")
+        outcome = "cancelled"
+        await abort_audio_stream(audio_stream)
+        raise
+    except websockets.exceptions.ConnectionClosed:
+        outcome = "disconnected"
+    except Exception as e:
+        print(f"Error in conversation turn for {user_id}: {str(e)}")
+        outcome = "error"
+        await abort_audio_stream(audio_stream)
+    finally:
+        TURN_SECONDS.observe(time.perf_counter() - start, mode=mode)
+        TURNS_TOTAL.inc(mode=mode, outcome=outcome)
+
 async def handle_client(websocket):
     """Handle a client WebSocket connection"""
     connection_id = None
@@ -55,7 +414,11 @@ async def handle_client(websocket):
         active_connections[connection_id] = {
             "websocket": websocket,
             "user_id": None,
-            "last_activity": time.time()
+            "last_activity": time.time(),
+            "turn_task": None,
+            "turn_cancelled": None,
+            "turn_jobs": set(),
+            "audio_sender": None
         }
 
         print(f"New connection established: {connection_id}")
@@ -83,12 +446,19 @@ async def handle_client(websocket):
                     active_connections[connection_id]["user_id"] = user_id
 
                     # Load user profile
-                    profile = conversation_handler.get_user_profile(user_id)
+                    with PROFILE_LOAD_SECONDS.time():
+                        profile = await run_blocking(conversation_handler.get_user_profile, user_id)
 
-                    await websocket.send(json.dumps({
+                    # Clients that opt in get turn audio as framed, acked streams
+                    started = {
                         "type": "conversation_started",
-                        "message": f"Profile loaded for {profile.get('name', user_id)}"
-                    }))
+                        "message": f"Profile loaded for {profile.name}"
+                    }
+                    if data.get("audio_framing"):
+                        audio_sender = AudioStreamSender(websocket)
+                        active_connections[connection_id]["audio_sender"] = audio_sender
+                        started["audio_framing"] = audio_sender.config()
+                    await websocket.send(json.dumps(started))
 
                 elif message_type == "user_message":
                     # Process a text message from the user
@@ -100,27 +470,46 @@ async def handle_client(websocket):
                         }))
                         continue
 
+                    if draining:
+                        await websocket.send(json.dumps({
+                            "type": "error",
+                            "message": "Server is restarting, reconnect shortly"
+                        }))
+                        continue
+
                     user_text = data.get("text", "")
                     print(f"Received message from {user_id}: {user_text}")
 
-                    # Process the user input and get response
-                    response = conversation_handler.handle_conversation_turn(user_id, user_text)
-
-                    # Send text response
-                    await websocket.send(json.dumps({
-                        "type": "assistant_text",
-                        "text": response["text"]
-                    }))
-
-                    # Send audio response if available
-                    if response.get("audio"):
+                    # Run the turn as its own task so this loop keeps reading pings
+                    # and cancel requests while the reply is produced; a new
+                    # message interrupts whatever turn is still in flight
+                    connection = active_connections[connection_id]
+                    if cancel_turn(connection):
                         await websocket.send(json.dumps({
-                            "type": "assistant_audio_ready",
-                            "message": "Audio ready to stream"
+                            "type": "turn_interrupted",
+                            "cancelled": True
                         }))
-
-                        # Send binary audio data
-                        await websocket.send(response["audio"])
+                    connection["turn_cancelled"] = threading.Event()
+                    connection["turn_task"] = asyncio.create_task(
+                        run_turn(websocket, user_id, user_text, bool(data.get("stream")), connection["audio_sender"],
+                                 connection["turn_cancelled"], connection["turn_jobs"])
+                    )
+                    # A long reply shouldn't count as idle time once it has been delivered
+                    connection["turn_task"].add_done_callback(
+                        lambda _: connection.__setitem__("last_activity", time.time())
+                    )
+
+                elif message_type == "audio_ack":
+                    audio_sender = active_connections[connection_id]["audio_sender"]
+                    if audio_sender:
+                        await audio_sender.handle_ack(data.get("stream_id"), data.get("seq"))
+
+                elif message_type in ("cancel_turn", "interrupt"):
+                    cancelled = cancel_turn(active_connections[connection_id])
+                    await websocket.send(json.dumps({
+                        "type": "turn_interrupted",
+                        "cancelled": cancelled
+                    }))
 
             except json.JSONDecodeError:
                 print(f"Received invalid JSON message")
@@ -136,45 +525,67 @@ async def handle_client(websocket):
     finally:
         # Clean up connection
         if connection_id and connection_id in active_connections:
+            cancel_turn(active_connections[connection_id])
             del active_connections[connection_id]
         print(f"Connection closed: {connection_id}")
 
-async def start_websocket_server():
+async def drain_server(timeout=SOCKET_DRAIN_TIMEOUT):
+    """Stop accepting connections, let in-flight turns finish, persist sessions, then close"""
+    global draining
+    if draining or not server:
+        return
+    draining = True
+    print("Draining WebSocket server...")
+    server.server.close()
+
+    turns = [c["turn_task"] for c in active_connections.values() if c["turn_task"] and not c["turn_task"].done()]
+    if turns:
+        print(f"Waiting for {len(turns)} in-flight turns")
+        await asyncio.wait(turns, timeout=timeout)
+    if conversation_handler:
+        await run_blocking(conversation_handler.persist_all_sessions)
+    server.close()
+
+async def start_websocket_server(host="0.0.0.0", port=None, drain_on_signal=False):
     """Start the WebSocket server"""
-    global server
+    global server, blocking_executor
     try:
-        host = "0.0.0.0"
-        port = int(os.environ.get("PORT", 8080))
+        if port is None:
+            port = int(os.environ.get("PORT", 8080))
+
+        blocking_executor = ThreadPoolExecutor(
+            max_workers=CONVERSATION_EXECUTOR_WORKERS,
+            thread_name_prefix="conversation"
+        )
 
         # Initialize the conversation handler first
         if not initialize_conversation_handler():
             print("Failed to initialize conversation handler, cannot start server")
             return False
 
-        async def process_request(path, headers):
-            upgrade_header = headers.get('Upgrade', '')
-            if not upgrade_header or 'websocket' not in upgrade_header.lower():
-                return http.HTTPStatus.UPGRADE_REQUIRED, [], b'WebSocket upgrade required'
-
-            return None, {
-                'Access-Control-Allow-Origin': '*',
-                'Access-Control-Allow-Headers': '*',
-                'Access-Control-Allow-Methods': 'GET, POST, OPTIONS',
-                'Access-Control-Allow-Credentials': 'true',
-            }
-
-        server = await websockets.serve(
+        server = await serve(
             handle_client,
             host,
             port,
             ping_interval=30,
             ping_timeout=10,
             compression=None,
-            process_request=process_request
+            max_size=SOCKET_MAX_MESSAGE_BYTES,
+            max_queue=SOCKET_MAX_QUEUE,
+            process_request=process_request,
+            create_protocol=LimitedServerProtocol,
+            extra_headers=CORS_HEADERS
         )
+        reaper = asyncio.create_task(reap_idle_connections())
+
+        if drain_on_signal:
+            loop = asyncio.get_running_loop()
+            for sig in (signal.SIGTERM, signal.SIGINT):
+                loop.add_signal_handler(sig, lambda: asyncio.ensure_future(drain_server()))
 
         print(f"WebSocket server started on {host}:{port}")
         await server.wait_closed()
+        reaper.cancel()
         return True
 
     except Exception as e:
@@ -185,6 +596,22 @@ def run_server():
     """Run the WebSocket server in a separate thread"""
     asyncio.run(start_websocket_server())
 
+def run_worker(host, port):
+    """Run one supervised worker in the foreground; SIGTERM drains it"""
+    asyncio.run(start_websocket_server(host, port, drain_on_signal=True))
+
+def run_workers(worker_count):
+    """Run the supervisor, its sticky router and `worker_count` worker processes"""
+    lock_fd = acquire_lock()
+    if not lock_fd:
+        print("Server is already running (lock exists)")
+        return {"status": "running", "message": "Server is already running"}
+
+    port = int(os.environ.get("PORT", 8080))
+    print(f"Socket supervisor running with PID: {os.getpid()}")
+    run_supervisor(worker_count, "0.0.0.0", port)
+    return {"status": "stopped", "message": "Socket workers stopped"}
+
 def start_server():
     """Start the WebSocket server in a separate thread"""
     global server_thread
@@ -214,6 +641,8 @@ def start_server():
 def stop_server():
     """Stop the WebSocket server"""
     global server, server_thread
+    if conversation_handler:
+        conversation_handler.persist_all_sessions()
     if server:
         try:
             server.close()
@@ -234,16 +663,25 @@ signal.signal(signal.SIGINT, signal_handler)
 signal.signal(signal.SIGTERM, signal_handler)
 
 if __name__ == "__main__":
-    if len(sys.argv) > 1:
-        command = sys.argv[1]
-        if command == "start":
-            result = start_server()
-            print(json.dumps(result))
-        elif command == "stop":
-            result = stop_server()
-            print(json.dumps(result))
-        else:
-            print(f"Unknown command: {command}")
+    parser = argparse.ArgumentParser(description="Conversation WebSocket server")
+    parser.add_argument("command", nargs="?", choices=["start", "stop", "worker"])
+    parser.add_argument("--workers", type=int, default=SOCKET_WORKERS,
+                        help="worker processes behind a sticky user_id router (default 1: single process)")
+    parser.add_argument("--host", default="0.0.0.0", help="bind address for the worker command")
+    parser.add_argument("--port", type=int, help="port for the worker command")
+    args = parser.parse_args()
+
+    if args.command == "worker":
+        run_worker(args.host, args.port)
+    elif args.command == "stop":
+        result = stop_server()
+        print(json.dumps(result))
+    elif args.workers > 1:
+        result = run_workers(args.workers)
+        print(json.dumps(result))
+    elif args.command == "start":
+        result = start_server()
+        print(json.dumps(result))
     else:
         result = start_server()
         print(json.dumps(result))
@@ -251,4 +689,4 @@ if __name__ == "__main__":
             while True:
                 time.sleep(1)
         except KeyboardInterrupt:
-            stop_server()
\ No newline at end of file
+            stop_server()
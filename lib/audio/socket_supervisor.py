@@ -0,0 +1,408 @@
+import os
+import sys
+import json
+import http
+import signal
+import asyncio
+import time
+import hmac
+import hashlib
+import secrets
+import subprocess
+import urllib.request
+from collections import Counter
+from urllib.parse import parse_qs, urlsplit
+import websockets
+# extra_headers and function process_request hooks are legacy API, so use it explicitly
+from websockets.legacy.client import connect
+from websockets.legacy.server import WebSocketServerProtocol, serve
+from metrics import REGISTRY, merge_expositions
+
+SOCKET_WORKER_HOST = os.environ.get("SOCKET_WORKER_HOST", "127.0.0.1")
+SOCKET_WORKER_BASE_PORT = int(os.environ.get("SOCKET_WORKER_BASE_PORT", 9100))
+# How long draining workers may spend finishing in-flight turns on SIGTERM
+SOCKET_DRAIN_TIMEOUT = float(os.environ.get("SOCKET_DRAIN_TIMEOUT", 30))
+# Workers load Gemini/GCS clients at startup, so give the first connect a while
+SOCKET_BACKEND_CONNECT_TIMEOUT = float(os.environ.get("SOCKET_BACKEND_CONNECT_TIMEOUT", 20))
+SOCKET_RESTART_BACKOFF = float(os.environ.get("SOCKET_RESTART_BACKOFF", 1))
+# Per-worker budget for the router's /metrics to scrape a worker's registry
+SOCKET_METRICS_SCRAPE_TIMEOUT = float(os.environ.get("SOCKET_METRICS_SCRAPE_TIMEOUT", 2))
+# Set when a load balancer in front of the server appends the client to X-Forwarded-For
+SOCKET_TRUST_FORWARDED_FOR = os.environ.get("SOCKET_TRUST_FORWARDED_FOR", "").lower() in ("1", "true", "yes")
+# The router tells workers who the real client is; workers only trust it alongside the router secret
+CLIENT_IP_HEADER = "X-Conversation-Client-IP"
+ROUTER_SECRET_HEADER = "X-Conversation-Router-Secret"
+# Shared by the router and its workers; the supervisor generates one per run when unset
+SOCKET_ROUTER_SECRET = os.environ.get("SOCKET_ROUTER_SECRET", "")
+# Connections with no client message and no turn running for this long are closed
+SOCKET_IDLE_TIMEOUT = float(os.environ.get("SOCKET_IDLE_TIMEOUT", 300))
+SOCKET_REAP_INTERVAL = float(os.environ.get("SOCKET_REAP_INTERVAL", 30))
+SOCKET_MAX_CONNECTIONS = int(os.environ.get("SOCKET_MAX_CONNECTIONS", 1000))
+SOCKET_MAX_CONNECTIONS_PER_IP = int(os.environ.get("SOCKET_MAX_CONNECTIONS_PER_IP", 20))
+SOCKET_SERVER_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "socket_server.py")
+
+# Close codes sent to clients when their worker goes away
+CLOSE_GOING_AWAY = 1001
+CLOSE_SERVICE_RESTART = 1012
+CLOSE_TRY_AGAIN_LATER = 1013
+# Codes that only describe a missing close frame and may not be sent in one
+UNSENDABLE_CLOSE_CODES = (1005, 1006, 1015)
+
+CORS_HEADERS = {
+    'Access-Control-Allow-Origin': '*',
+    'Access-Control-Allow-Headers': '*',
+    'Access-Control-Allow-Methods': 'GET, POST, OPTIONS',
+    'Access-Control-Allow-Credentials': 'true',
+}
+
+# Accepted upgrades, counted from handshake until the TCP connection is gone
+accepted_connections = Counter()
+
+REGISTRY.gauge('socket_accepted_connections', 'Upgraded TCP connections, including ones still closing',
+               callback=lambda: {(): sum(accepted_connections.values())})
+REGISTRY.gauge('socket_connection_ips', 'Distinct client IPs with open connections',
+               callback=lambda: {(): len(accepted_connections)})
+REJECTED_CONNECTIONS_TOTAL = REGISTRY.counter(
+    'socket_rejected_connections_total', 'Upgrades refused by connection limits', ['reason'])
+REAPED_CONNECTIONS_TOTAL = REGISTRY.counter(
+    'socket_reaped_connections_total', 'Connections closed for being idle')
+ROUTED_CONNECTIONS = REGISTRY.gauge(
+    'socket_router_connections', 'Client connections proxied to each worker', ['worker'])
+WORKER_METRICS_UP = REGISTRY.gauge(
+    'socket_worker_metrics_up', 'Whether the last /metrics scrape of each worker succeeded', ['worker'])
+WORKER_RESTARTS_TOTAL = REGISTRY.counter(
+    'socket_worker_restarts_total', 'Worker processes restarted after exiting unexpectedly', ['worker'])
+
+
+def worker_for_user(user_id, worker_count):
+    """Stable user_id -> worker index, so a user's conversation state stays in one process"""
+    digest = hashlib.sha1(user_id.encode("utf-8")).digest()
+    return int.from_bytes(digest[:8], "big") % worker_count
+
+
+def from_router(headers):
+    """True when a request carries this run's router secret"""
+    secret = headers.get(ROUTER_SECRET_HEADER)
+    return bool(SOCKET_ROUTER_SECRET and secret and hmac.compare_digest(secret, SOCKET_ROUTER_SECRET))
+
+
+def client_ip(remote_address, headers):
+    """Best-known client address for a connection, used for per-IP limits"""
+    ip = remote_address[0] if remote_address else "unknown"
+    if headers.get(CLIENT_IP_HEADER) and from_router(headers):
+        return headers[CLIENT_IP_HEADER]
+    if SOCKET_TRUST_FORWARDED_FOR and headers.get("X-Forwarded-For"):
+        # The last entry is the one our own load balancer appended; earlier ones are client-supplied
+        return headers["X-Forwarded-For"].split(",")[-1].strip()
+    return ip
+
+
+class LimitedServerProtocol(WebSocketServerProtocol):
+    """Server protocol that enforces global and per-IP connection limits at upgrade time.
+
+    The serve() process_request hook runs first; limits only apply to requests
+    it lets through. Slots are taken when the upgrade is accepted and released
+    when the TCP connection is lost, so half-closed sockets still count until
+    they are gone. Used by both the router and single-process workers.
+    """
+
+    client_ip = None
+
+    async def process_request(self, path, headers):
+        response = await super().process_request(path, headers)
+        if response is not None:
+            return response
+
+        ip = client_ip(self.remote_address, headers)
+        if sum(accepted_connections.values()) >= SOCKET_MAX_CONNECTIONS:
+            REJECTED_CONNECTIONS_TOTAL.inc(reason="max_connections")
+            return http.HTTPStatus.SERVICE_UNAVAILABLE, [('Retry-After', '5')], b'Server at connection limit'
+        if accepted_connections[ip] >= SOCKET_MAX_CONNECTIONS_PER_IP:
+            REJECTED_CONNECTIONS_TOTAL.inc(reason="per_ip")
+            return http.HTTPStatus.TOO_MANY_REQUESTS, [('Retry-After', '5')], b'Too many connections from this address'
+
+        self.client_ip = ip
+        accepted_connections[ip] += 1
+        return None
+
+    def connection_lost(self, exc):
+        super().connection_lost(exc)
+        if self.client_ip is not None:
+            accepted_connections[self.client_ip] -= 1
+            if accepted_connections[self.client_ip] <= 0:
+                del accepted_connections[self.client_ip]
+            self.client_ip = None
+
+
+def start_conversation_user(message):
+    """Return the user_id of a start_conversation message, or None for anything else"""
+    if not isinstance(message, str) or '"start_conversation"' not in message:
+        return None
+    try:
+        data = json.loads(message)
+    except json.JSONDecodeError:
+        return None
+    if data.get("type") != "start_conversation":
+        return None
+    return data.get("user_id") or None
+
+
+class SocketRouter:
+    """Front router that pins each client connection to the worker owning its user_id.
+
+    The user comes from a `user_id` query parameter on the upgrade request or
+    from the first start_conversation message. Frames are relayed verbatim in
+    both directions, so the worker protocol (including framed audio and acks)
+    passes through unchanged. Connection limits apply at the upgrade, and
+    connections with no frames either way for SOCKET_IDLE_TIMEOUT are closed,
+    including ones that never identify a user.
+    """
+
+    def __init__(self, worker_ports, worker_host=SOCKET_WORKER_HOST, secret=SOCKET_ROUTER_SECRET):
+        self.worker_ports = list(worker_ports)
+        self.worker_host = worker_host
+        self.secret = secret
+        self.draining = False
+        self.server = None
+        self.reaper = None
+        self._counts = [0] * len(self.worker_ports)
+        self._metrics_up = [0] * len(self.worker_ports)
+        # Client websocket -> time of the last frame relayed in either direction
+        self._last_activity = {}
+        ROUTED_CONNECTIONS.callback = lambda: {(str(i),): n for i, n in enumerate(self._counts)}
+        WORKER_METRICS_UP.callback = lambda: {(str(i),): up for i, up in enumerate(self._metrics_up)}
+
+    async def _connect_backend(self, index, peer_ip):
+        uri = f"ws://{self.worker_host}:{self.worker_ports[index]}"
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + SOCKET_BACKEND_CONNECT_TIMEOUT
+        while True:
+            try:
+                # Audio can arrive as one large binary message, so no size cap on the worker side
+                return await connect(uri, compression=None, max_size=None, ping_interval=None,
+                                      extra_headers={CLIENT_IP_HEADER: peer_ip, ROUTER_SECRET_HEADER: self.secret})
+            except OSError:
+                if loop.time() >= deadline:
+                    raise
+                await asyncio.sleep(0.25)
+
+    async def _pump(self, backend, websocket):
+        """Relay worker -> client, then close the client with the worker's close code and reason"""
+        try:
+            async for message in backend:
+                self._last_activity[websocket] = time.time()
+                await websocket.send(message)
+        except websockets.exceptions.ConnectionClosed:
+            pass
+        code, reason = backend.close_code, backend.close_reason
+        if code is None or code in UNSENDABLE_CLOSE_CODES:
+            # No close frame from the worker, so it died or the link dropped
+            code = CLOSE_GOING_AWAY if self.draining else CLOSE_SERVICE_RESTART
+            reason = "worker closed"
+        await websocket.close(code, reason)
+
+    async def _attach(self, websocket, user_id):
+        index = worker_for_user(user_id, len(self.worker_ports))
+        # The limit check already resolved the address; it never trusts a client's own CLIENT_IP_HEADER
+        backend = await self._connect_backend(index, websocket.client_ip)
+        self._counts[index] += 1
+        pump = asyncio.create_task(self._pump(backend, websocket))
+        return index, backend, pump
+
+    async def _detach(self, attached):
+        if attached is None:
+            return
+        index, backend, pump = attached
+        self._counts[index] -= 1
+        pump.cancel()
+        await backend.close()
+
+    async def handle_client(self, websocket):
+        if self.draining:
+            await websocket.close(CLOSE_TRY_AGAIN_LATER, "server draining")
+            return
+
+        attached = None
+        user_id = None
+        self._last_activity[websocket] = time.time()
+        try:
+            path = getattr(websocket, "path", "") or ""
+            query_user = parse_qs(urlsplit(path).query).get("user_id", [None])[0]
+            if query_user:
+                user_id = query_user
+                attached = await self._attach(websocket, user_id)
+
+            async for message in websocket:
+                self._last_activity[websocket] = time.time()
+                message_user = start_conversation_user(message)
+                if message_user and message_user != user_id:
+                    # A different user on this connection lives on a different worker
+                    await self._detach(attached)
+                    user_id = message_user
+                    attached = await self._attach(websocket, user_id)
+                if attached is None:
+                    await websocket.send(json.dumps({
+                        "type": "error",
+                        "message": "User not identified, send start_conversation first"
+                    }))
+                    continue
+                await attached[1].send(message)
+        except websockets.exceptions.ConnectionClosed:
+            pass
+        except (OSError, websockets.exceptions.InvalidHandshake) as e:
+            print(f"Router could not reach worker for {user_id}: {str(e)}")
+            await websocket.close(CLOSE_TRY_AGAIN_LATER, "worker unavailable")
+        finally:
+            self._last_activity.pop(websocket, None)
+            await self._detach(attached)
+
+    async def reap_idle_connections(self, interval=SOCKET_REAP_INTERVAL, idle_timeout=SOCKET_IDLE_TIMEOUT):
+        """Periodically close client connections that have gone quiet"""
+        while True:
+            await asyncio.sleep(interval)
+            now = time.time()
+            idle = [ws for ws, last in list(self._last_activity.items()) if now - last > idle_timeout]
+            if idle:
+                print(f"Router closing {len(idle)} idle connections")
+                REAPED_CONNECTIONS_TOTAL.inc(len(idle))
+                await asyncio.gather(*(ws.close(1000, "idle timeout") for ws in idle), return_exceptions=True)
+
+    def _scrape_worker(self, index):
+        url = f"http://{self.worker_host}:{self.worker_ports[index]}/metrics"
+        try:
+            with urllib.request.urlopen(url, timeout=SOCKET_METRICS_SCRAPE_TIMEOUT) as response:
+                text = response.read().decode("utf-8")
+        except (OSError, ValueError) as e:
+            print(f"Could not scrape metrics from worker {index}: {str(e)}")
+            self._metrics_up[index] = 0
+            return None
+        self._metrics_up[index] = 1
+        return text
+
+    async def render_metrics(self):
+        """Router registry plus every reachable worker's, each sample labelled with its process"""
+        scraped = await asyncio.gather(*(
+            asyncio.to_thread(self._scrape_worker, index) for index in range(len(self.worker_ports))
+        ))
+        sources = [("router", REGISTRY.render())]
+        sources += [(f"worker-{index}", text) for index, text in enumerate(scraped) if text is not None]
+        return merge_expositions(sources)
+
+    async def process_request(self, path, headers):
+        if path.split('?', 1)[0] == '/metrics':
+            return http.HTTPStatus.OK, [
+                ('Content-Type', 'text/plain; version=0.0.4; charset=utf-8')
+            ], (await self.render_metrics()).encode('utf-8')
+        if self.draining:
+            return http.HTTPStatus.SERVICE_UNAVAILABLE, [], b'Server draining'
+
+        upgrade_header = headers.get('Upgrade', '')
+        if not upgrade_header or 'websocket' not in upgrade_header.lower():
+            return http.HTTPStatus.UPGRADE_REQUIRED, [], b'WebSocket upgrade required'
+
+        return None
+
+    async def start(self, host, port):
+        self.server = await serve(
+            self.handle_client,
+            host,
+            port,
+            ping_interval=30,
+            ping_timeout=10,
+            compression=None,
+            process_request=self.process_request,
+            create_protocol=LimitedServerProtocol,
+            extra_headers=CORS_HEADERS
+        )
+        self.reaper = asyncio.create_task(self.reap_idle_connections())
+
+    def stop_accepting(self):
+        self.draining = True
+        if self.server:
+            self.server.server.close()
+
+    async def close(self):
+        if self.reaper:
+            self.reaper.cancel()
+        if self.server:
+            self.server.close()
+            await self.server.wait_closed()
+
+
+class Supervisor:
+    """Runs N socket_server workers on private ports behind a sticky SocketRouter.
+
+    Workers that exit unexpectedly are restarted on the same port, so the
+    user -> worker mapping never changes. SIGTERM/SIGINT drains: the router
+    stops accepting, workers finish in-flight turns and persist sessions, and
+    only then does the supervisor exit.
+    """
+
+    def __init__(self, worker_count, host, port, base_port=SOCKET_WORKER_BASE_PORT):
+        self.worker_count = worker_count
+        self.host = host
+        self.port = port
+        self.worker_ports = [base_port + i for i in range(worker_count)]
+        self.processes = [None] * worker_count
+        self.secret = SOCKET_ROUTER_SECRET or secrets.token_urlsafe(32)
+        self.router = SocketRouter(self.worker_ports, secret=self.secret)
+        self.stopping = None
+
+    def spawn(self, index):
+        env = dict(os.environ, SOCKET_WORKER_INDEX=str(index), SOCKET_ROUTER_SECRET=self.secret)
+        command = [sys.executable, SOCKET_SERVER_PATH, "worker",
+                   "--host", SOCKET_WORKER_HOST, "--port", str(self.worker_ports[index])]
+        self.processes[index] = subprocess.Popen(command, env=env)
+        print(f"Started socket worker {index} (pid {self.processes[index].pid}) on port {self.worker_ports[index]}")
+
+    async def monitor(self):
+        while not self.stopping.is_set():
+            for index, process in enumerate(self.processes):
+                if process.poll() is not None and not self.stopping.is_set():
+                    print(f"Socket worker {index} exited with {process.returncode}, restarting")
+                    WORKER_RESTARTS_TOTAL.inc(worker=index)
+                    await asyncio.sleep(SOCKET_RESTART_BACKOFF)
+                    if not self.stopping.is_set():
+                        self.spawn(index)
+            try:
+                await asyncio.wait_for(self.stopping.wait(), 1)
+            except asyncio.TimeoutError:
+                pass
+
+    async def drain(self):
+        self.router.stop_accepting()
+        for process in self.processes:
+            if process.poll() is None:
+                process.send_signal(signal.SIGTERM)
+
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + SOCKET_DRAIN_TIMEOUT + 5
+        while any(p.poll() is None for p in self.processes) and loop.time() < deadline:
+            await asyncio.sleep(0.2)
+        for index, process in enumerate(self.processes):
+            if process.poll() is None:
+                print(f"Socket worker {index} did not drain in time, killing it")
+                process.kill()
+                process.wait()
+        await self.router.close()
+
+    async def run(self):
+        self.stopping = asyncio.Event()
+        loop = asyncio.get_running_loop()
+        for sig in (signal.SIGTERM, signal.SIGINT):
+            loop.add_signal_handler(sig, self.stopping.set)
+
+        for index in range(self.worker_count):
+            self.spawn(index)
+        await self.router.start(self.host, self.port)
+        print(f"Socket router on {self.host}:{self.port} -> {self.worker_count} workers "
+              f"(ports {self.worker_ports[0]}-{self.worker_ports[-1]})")
+
+        await self.monitor()
+        print("Draining socket workers...")
+        await self.drain()
+        print("Socket workers stopped")
+
+
+def run_supervisor(worker_count, host, port):
+    asyncio.run(Supervisor(worker_count, host, port).run())
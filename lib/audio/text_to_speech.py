@@ -4,6 +4,15 @@ import os
 import json
 from google.cloud import texttospeech
 import json
+from tts_cache import get_synthesis_cache, synthesis_key
+
+GOOGLE_TTS_MODEL_ID = "google-texttospeech"
+GOOGLE_TTS_SETTINGS = {
+    "language_code": "en-US",
+    "audio_encoding": "MP3",
+    "speaking_rate": 1.0,
+    "pitch": 0.0
+}
 
 def synthesize_text(voice_id, text):
     try:
@@ -14,6 +23,15 @@ def synthesize_text(voice_id, text):
         if not text:
             print("Error: No text provided", file=sys.stderr)
             sys.exit(1)
+
+        # Serve repeated phrases from the synthesis cache before touching credentials
+        cache = get_synthesis_cache()
+        cache_key = synthesis_key(voice_id, text, GOOGLE_TTS_MODEL_ID, GOOGLE_TTS_SETTINGS)
+        if cache:
+            audio = cache.get(cache_key)
+            if audio is not None:
+                sys.stdout.buffer.write(audio)
+                return
             
         # Initialize client with credentials
         try:
@@ -39,14 +57,14 @@ def synthesize_text(voice_id, text):
         synthesis_input = texttospeech.SynthesisInput(text=text)
 
         voice = texttospeech.VoiceSelectionParams(
-            language_code="en-US",
+            language_code=GOOGLE_TTS_SETTINGS["language_code"],
             name=voice_id if voice_id else "en-US-Standard-A"
         )
 
         audio_config = texttospeech.AudioConfig(
             audio_encoding=texttospeech.AudioEncoding.MP3,
-            speaking_rate=1.0,
-            pitch=0.0
+            speaking_rate=GOOGLE_TTS_SETTINGS["speaking_rate"],
+            pitch=GOOGLE_TTS_SETTINGS["pitch"]
         )
 
         response = client.synthesize_speech(
@@ -55,6 +73,8 @@ def synthesize_text(voice_id, text):
             audio_config=audio_config
         )
 
+        if cache:
+            cache.put(cache_key, response.audio_content)
         sys.stdout.buffer.write(response.audio_content)
     except Exception as e:
         print(f"Error in text-to-speech: {str(e)}", file=sys.stderr)
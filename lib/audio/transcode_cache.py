@@ -0,0 +1,114 @@
+import os
+import sys
+import json
+import hashlib
+import tempfile
+import numpy as np
+
+# Bump when the decode pipeline changes in a way that alters the cached PCM
+TRANSCODE_VERSION = 1
+CACHE_SAMPLE_RATE = 16000
+DEFAULT_CACHE_BACKEND = os.getenv('VOICE_CACHE_BACKEND', 'local')
+DEFAULT_CACHE_DIR = os.getenv('VOICE_CACHE_DIR', 'storage/cache/transcode')
+
+
+def to_pcm16(audio):
+    """Return audio as an int16 array, scaling float input from [-1, 1)"""
+    if audio.dtype == np.int16:
+        return audio
+    return (np.clip(audio, -1.0, 32767 / 32768) * 32768).astype(np.int16)
+
+
+def segment_key(blob):
+    """Content-address a source blob by its md5 (or generation when GCS has no md5)"""
+    identity = blob.md5_hash or f"{blob.name}#{blob.generation}"
+    digest = hashlib.sha256(f"v{TRANSCODE_VERSION}:{CACHE_SAMPLE_RATE}:{identity}".encode()).hexdigest()
+    return digest[:32]
+
+
+class TranscodeCache:
+    """Store of decoded 16kHz mono int16 PCM, one raw .pcm object per source blob"""
+
+    def __init__(self, backend=None, local_dir=None, bucket=None, prefix=None):
+        self.backend = backend or DEFAULT_CACHE_BACKEND
+        self.local_dir = local_dir or DEFAULT_CACHE_DIR
+        self.bucket = bucket
+        self.prefix = (prefix or 'voice_cache').rstrip('/')
+        self.hits = 0
+        self.misses = 0
+
+        if self.backend == 'gcs' and bucket is None:
+            raise ValueError("The gcs transcode cache backend needs a bucket")
+        if self.backend == 'local':
+            os.makedirs(self.local_dir, exist_ok=True)
+
+    @property
+    def enabled(self):
+        return self.backend in ('local', 'gcs')
+
+    def _local_path(self, key):
+        return os.path.join(self.local_dir, f"{key}.pcm")
+
+    def _blob_path(self, key):
+        return f"{self.prefix}/{key}.pcm"
+
+    def get(self, key):
+        """Return cached PCM for key, or None on a miss"""
+        if not self.enabled:
+            return None
+        try:
+            if self.backend == 'local':
+                with open(self._local_path(key), 'rb') as f:
+                    data = f.read()
+            else:
+                from google.api_core.exceptions import NotFound
+                try:
+                    data = self.bucket.blob(self._blob_path(key)).download_as_bytes()
+                except NotFound:
+                    data = None
+        except FileNotFoundError:
+            data = None
+        except Exception as e:
+            print(f"Warning: transcode cache read failed for {key}: {str(e)}", file=sys.stderr)
+            data = None
+
+        if data is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return np.frombuffer(data, dtype='<i2')
+
+    def put(self, key, audio):
+        """Store decoded audio under key; failures only cost a future cache miss"""
+        if not self.enabled:
+            return
+        data = to_pcm16(audio).astype('<i2', copy=False).tobytes()
+        try:
+            if self.backend == 'local':
+                # Write then rename so concurrent readers never see a partial segment
+                fd, tmp_path = tempfile.mkstemp(dir=self.local_dir, suffix='.partial')
+                with os.fdopen(fd, 'wb') as f:
+                    f.write(data)
+                os.replace(tmp_path, self._local_path(key))
+            else:
+                self.bucket.blob(self._blob_path(key)).upload_from_string(
+                    data, content_type='application/octet-stream'
+                )
+        except Exception as e:
+            print(f"Warning: transcode cache write failed for {key}: {str(e)}", file=sys.stderr)
+
+
+def load_manifest(bucket, path):
+    """Load the segment manifest describing the current voice file, or None"""
+    from google.api_core.exceptions import NotFound
+    try:
+        return json.loads(bucket.blob(path).download_as_text())
+    except NotFound:
+        return None
+    except Exception as e:
+        print(f"Warning: could not read voice manifest {path}: {str(e)}", file=sys.stderr)
+        return None
+
+
+def save_manifest(bucket, path, manifest):
+    bucket.blob(path).upload_from_string(json.dumps(manifest, indent=2), content_type='application/json')
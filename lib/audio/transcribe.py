@@ -1,34 +1,314 @@
-
 from google.cloud import speech_v1
 import os
+import sys
 import argparse
+import uuid
+import tempfile
+import threading
+import subprocess
+from vad import VAD_ENABLED, describe, trim_silence
+
+# Sync recognize rejects audio over ~60s and streaming sessions end at ~305s
+SPEECH_SYNC_MAX_SECONDS = float(os.getenv('SPEECH_SYNC_MAX_SECONDS', '55'))
+SPEECH_STREAMING_MAX_SECONDS = float(os.getenv('SPEECH_STREAMING_MAX_SECONDS', '290'))
+# Inline content limit for recognize / long_running_recognize; longer files need a gs:// URI
+SPEECH_INLINE_MAX_BYTES = 10 * 1024 * 1024
+SPEECH_STREAM_CHUNK_BYTES = int(os.getenv('SPEECH_STREAM_CHUNK_BYTES', str(32 * 1024)))
+SPEECH_LONG_RUNNING_TIMEOUT = float(os.getenv('SPEECH_LONG_RUNNING_TIMEOUT', '900'))
+SPEECH_LANGUAGE_CODE = os.getenv('SPEECH_LANGUAGE_CODE', 'en-US')
+# MP3 has no rate in the config by default; recordings from the app are 44.1kHz
+SPEECH_MP3_SAMPLE_RATE = int(os.getenv('SPEECH_MP3_SAMPLE_RATE', '44100'))
+# Long files over the inline limit are staged here for long-running recognition
+SPEECH_STAGING_BUCKET = os.getenv('SPEECH_STAGING_BUCKET', os.getenv('GCP_BUCKET_NAME', 'memorial-voices'))
+SPEECH_STAGING_PREFIX = os.getenv('SPEECH_STAGING_PREFIX', 'speech-staging')
+# Local engine used when a Speech API call fails ('off' to just raise); one-shot CLI runs
+# turn it off since loading the model would cost more than the request
+TRANSCRIBE_FALLBACK_ENGINE = os.getenv('TRANSCRIBE_FALLBACK_ENGINE', 'wav2vec2')
+# Speech bills by audio duration, so silence is trimmed first when that saves at least this much
+TRANSCRIBE_TRIM_SILENCE = os.getenv('TRANSCRIBE_TRIM_SILENCE', '1' if VAD_ENABLED else '0').lower() in ('1', 'true', 'yes')
+TRANSCRIBE_TRIM_MIN_SECONDS = float(os.getenv('TRANSCRIBE_TRIM_MIN_SECONDS', '1.0'))
+# A trimmed copy can't use the caller's gcs_uri and may have to be staged, so with one trimming
+# must save at least this much to be worth it
+TRANSCRIBE_TRIM_STAGED_MIN_SECONDS = float(os.getenv('TRANSCRIBE_TRIM_STAGED_MIN_SECONDS', '30'))
+# Used to estimate duration when the file can't be read or decoded at all (~128 kbps)
+FALLBACK_BYTES_PER_SECOND = 16000
+MODES = ('auto', 'sync', 'streaming', 'long_running')
+
+ENCODINGS = {
+    '.mp3': 'MP3',
+    '.webm': 'WEBM_OPUS',
+    '.ogg': 'OGG_OPUS',
+    '.opus': 'OGG_OPUS',
+    '.wav': 'LINEAR16',
+    '.flac': 'FLAC',
+}
+
+_speech_client = None
+_speech_client_lock = threading.Lock()
+
+
+def get_speech_client():
+    """Process-wide SpeechClient; its gRPC channel is reused by every transcription"""
+    global _speech_client
+    if _speech_client is None:
+        with _speech_client_lock:
+            if _speech_client is None:
+                _speech_client = speech_v1.SpeechClient()
+    return _speech_client
+
 
-def transcribe_audio(audio_file_path: str, user_id: str, question_number: int):
+def set_speech_client(client):
+    """Install the client get_speech_client() returns, e.g. a warm worker's or a fake"""
+    global _speech_client
+    with _speech_client_lock:
+        _speech_client = client
+
+
+def decoded_duration(path):
+    """Duration found by decoding the whole file to a null sink.
+
+    WebM/Opus from MediaRecorder is written as a live stream with no duration
+    in its header, so this is the only reliable measure for app recordings.
+    """
+    output = subprocess.run(
+        ['ffmpeg', '-hide_banner', '-loglevel', 'error', '-nostats', '-i', path, '-vn',
+         '-f', 'null', '-progress', 'pipe:1', '-'],
+        capture_output=True, check=True, text=True
+    ).stdout
+    # -progress prints out_time_us=<microseconds> blocks; the last one is the end of the stream
+    times = [line[len('out_time_us='):] for line in output.splitlines() if line.startswith('out_time_us=')]
+    return int([value for value in times if value.isdigit()][-1]) / 1e6
+
+
+def audio_duration(path):
+    """Duration in seconds from the file header, ffprobe, decoding, or failing all of them the file size"""
+    try:
+        import soundfile as sf
+        return sf.info(path).duration
+    except Exception:
+        pass
+    try:
+        output = subprocess.run(
+            ['ffprobe', '-v', 'error', '-show_entries', 'format=duration', '-of', 'csv=p=0', path],
+            capture_output=True, check=True, text=True
+        ).stdout
+        # Headerless WebM reports N/A, which falls through to decoding
+        return float(output.strip())
+    except (OSError, subprocess.CalledProcessError, ValueError):
+        pass
+    try:
+        return decoded_duration(path)
+    except (OSError, subprocess.CalledProcessError, ValueError, IndexError):
+        pass
+    return os.path.getsize(path) / FALLBACK_BYTES_PER_SECOND
+
+
+def choose_mode(duration, size):
+    """Pick the cheapest recognition mode that can handle the clip"""
+    if duration <= SPEECH_SYNC_MAX_SECONDS and size <= SPEECH_INLINE_MAX_BYTES:
+        return 'sync'
+    if duration <= SPEECH_STREAMING_MAX_SECONDS:
+        return 'streaming'
+    return 'long_running'
+
+
+def recognition_config(path, encoding=None, sample_rate_hertz=None, language_code=SPEECH_LANGUAGE_CODE,
+                       default_encoding='WEBM_OPUS'):
+    encoding = encoding or ENCODINGS.get(os.path.splitext(path)[1].lower(), default_encoding)
+    if encoding == 'MP3' and not sample_rate_hertz:
+        sample_rate_hertz = SPEECH_MP3_SAMPLE_RATE
+    config = {
+        "encoding": getattr(speech_v1.RecognitionConfig.AudioEncoding, encoding),
+        "language_code": language_code,
+        "enable_automatic_punctuation": True,
+    }
+    if sample_rate_hertz:
+        config["sample_rate_hertz"] = sample_rate_hertz
+    return speech_v1.RecognitionConfig(**config)
+
+
+def join_results(results, final_only=False):
+    return " ".join(
+        result.alternatives[0].transcript.strip()
+        for result in results
+        if result.alternatives and (not final_only or result.is_final)
+    ).strip()
+
+
+def iter_file_chunks(path, chunk_size=SPEECH_STREAM_CHUNK_BYTES):
+    with open(path, 'rb') as audio_file:
+        while True:
+            chunk = audio_file.read(chunk_size)
+            if not chunk:
+                return
+            yield chunk
+
+
+def recognize_sync(client, config, path):
+    with open(path, 'rb') as audio_file:
+        audio = speech_v1.RecognitionAudio(content=audio_file.read())
+    return join_results(client.recognize(config=config, audio=audio).results)
+
+
+def recognize_streaming(client, config, path):
+    """gRPC streaming recognition fed from disk, so the file is never held in memory"""
+    streaming_config = speech_v1.StreamingRecognitionConfig(config=config, interim_results=False)
+    requests = (speech_v1.StreamingRecognizeRequest(audio_content=chunk) for chunk in iter_file_chunks(path))
+    responses = client.streaming_recognize(config=streaming_config, requests=requests)
+    parts = [join_results(response.results, final_only=True) for response in responses]
+    return " ".join(part for part in parts if part)
+
+
+def stage_to_gcs(path, storage_client=None):
+    """Upload a local file to the staging prefix; returns (gs:// URI, blob to delete afterwards)"""
+    if storage_client is None:
+        from google.cloud import storage
+        storage_client = storage.Client()
+    blob = storage_client.bucket(SPEECH_STAGING_BUCKET).blob(
+        f"{SPEECH_STAGING_PREFIX}/{uuid.uuid4().hex}{os.path.splitext(path)[1]}"
+    )
+    blob.upload_from_filename(path)
+    return f"gs://{SPEECH_STAGING_BUCKET}/{blob.name}", blob
+
+
+def recognize_long_running(client, config, path, gcs_uri=None, storage_client=None,
+                           timeout=SPEECH_LONG_RUNNING_TIMEOUT):
+    staged = None
+    if gcs_uri:
+        audio = speech_v1.RecognitionAudio(uri=gcs_uri)
+    elif os.path.getsize(path) <= SPEECH_INLINE_MAX_BYTES:
+        with open(path, 'rb') as audio_file:
+            audio = speech_v1.RecognitionAudio(content=audio_file.read())
+    else:
+        gcs_uri, staged = stage_to_gcs(path, storage_client)
+        audio = speech_v1.RecognitionAudio(uri=gcs_uri)
+    try:
+        operation = client.long_running_recognize(config=config, audio=audio)
+        return join_results(operation.result(timeout=timeout).results)
+    finally:
+        if staged is not None:
+            try:
+                staged.delete()
+            except Exception as e:
+                print(f"Error deleting staged audio {gcs_uri}: {str(e)}", file=sys.stderr)
+
+
+def trim_for_recognition(path, min_seconds=TRANSCRIBE_TRIM_MIN_SECONDS):
+    """Write a silence-trimmed 16kHz FLAC copy of a recording.
+
+    Returns the temp file path, or None when the file can't be decoded or
+    trimming would save less than min_seconds; the caller deletes the copy.
+    """
+    import soundfile as sf
+    from create_voice import transcode_audio
+
+    audio = transcode_audio(path)
+    if audio is None or not len(audio):
+        return None
+    trimmed, stats = trim_silence(audio)
+    if stats["removed_seconds"] < min_seconds:
+        return None
+    with tempfile.NamedTemporaryFile(suffix='.flac', delete=False) as trimmed_file:
+        trimmed_path = trimmed_file.name
+    sf.write(trimmed_path, trimmed, 16000, format='FLAC', subtype='PCM_16')
+    print(f"Trimmed {path}: {describe(stats)}", file=sys.stderr)
+    return trimmed_path
+
+
+def transcribe_file(path, mode='auto', encoding=None, sample_rate_hertz=None, language_code=SPEECH_LANGUAGE_CODE,
+                    gcs_uri=None, client=None, default_encoding='WEBM_OPUS', storage_client=None,
+                    fallback=TRANSCRIBE_FALLBACK_ENGINE, trim=TRANSCRIBE_TRIM_SILENCE):
+    """Transcribe an audio file, choosing sync, streaming or long-running recognition by duration.
+
+    Long clips over the inline size limit use gcs_uri when the same audio is
+    already in a bucket, and are otherwise staged there for the duration of the call.
+    With trim, silence is removed from clips too long for sync recognition and the
+    shorter FLAC copy is what gets sent; with a gcs_uri only when that saves at
+    least TRANSCRIBE_TRIM_STAGED_MIN_SECONDS.
+    If the Speech API call fails and fallback is 'wav2vec2' the file is transcribed locally instead.
+    """
+    trimmed_path = None
+    duration = None
+    if trim:
+        try:
+            duration = audio_duration(path)
+            # Sync-sized clips go out in one inline call either way, so the extra decode isn't worth it
+            if duration > SPEECH_SYNC_MAX_SECONDS:
+                min_seconds = TRANSCRIBE_TRIM_MIN_SECONDS
+                if gcs_uri:
+                    min_seconds = max(min_seconds, TRANSCRIBE_TRIM_STAGED_MIN_SECONDS)
+                trimmed_path = trim_for_recognition(path, min_seconds)
+        except Exception as e:
+            print(f"Error trimming {path}, transcribing it untrimmed: {str(e)}", file=sys.stderr)
+    if trimmed_path:
+        # The bucket copy is the untrimmed original, so gcs_uri no longer applies
+        path, encoding, sample_rate_hertz, gcs_uri, duration = trimmed_path, 'FLAC', 16000, None, None
+    try:
+        return transcribe_with_fallback(path, mode, encoding, sample_rate_hertz, language_code, gcs_uri, client,
+                                        default_encoding, storage_client, fallback, duration=duration)
+    finally:
+        if trimmed_path:
+            os.remove(trimmed_path)
+
+
+def transcribe_with_fallback(path, mode, encoding, sample_rate_hertz, language_code, gcs_uri, client,
+                             default_encoding, storage_client, fallback, duration=None):
+    from google.api_core.exceptions import GoogleAPICallError, RetryError
+    try:
+        return transcribe_speech(path, mode, encoding, sample_rate_hertz, language_code, gcs_uri, client,
+                                 default_encoding, storage_client, duration=duration)
+    except (GoogleAPICallError, RetryError) as e:
+        # Only Speech outages and rejections fall back; bugs and bad input still surface
+        if fallback != 'wav2vec2':
+            raise
+        print(f"Speech recognition failed for {path} ({str(e)}), falling back to wav2vec2", file=sys.stderr)
+        try:
+            from wav2vec2_transcriber import transcribe_local
+            transcript = transcribe_local(path)
+        except Exception as local_error:
+            print(f"Local transcription failed for {path}: {str(local_error)}", file=sys.stderr)
+            raise e
+        if transcript is None:
+            raise e
+        return transcript
+
+
+def transcribe_speech(path, mode='auto', encoding=None, sample_rate_hertz=None, language_code=SPEECH_LANGUAGE_CODE,
+                      gcs_uri=None, client=None, default_encoding='WEBM_OPUS', storage_client=None, duration=None):
+    """Run one Speech API recognition; duration, when the caller already measured it, saves probing again"""
+    client = client or get_speech_client()
+    config = recognition_config(path, encoding, sample_rate_hertz, language_code, default_encoding)
+    chosen = mode == 'auto'
+    if chosen:
+        if duration is None:
+            duration = audio_duration(path)
+        mode = choose_mode(duration, os.path.getsize(path))
+        print(f"Transcribing {path} ({duration:.1f}s) with {mode} recognition", file=sys.stderr)
+
+    if mode == 'sync':
+        from google.api_core.exceptions import InvalidArgument
+        try:
+            return recognize_sync(client, config, path)
+        except InvalidArgument as e:
+            # The duration was underestimated; long-running has no length limit, so it can't fail the same way
+            if not chosen or 'too long' not in str(e).lower():
+                raise
+            print(f"Sync recognition rejected {path} as too long, retrying with long_running", file=sys.stderr)
+            return recognize_long_running(client, config, path, gcs_uri, storage_client)
+    if mode == 'streaming':
+        return recognize_streaming(client, config, path)
+    if mode == 'long_running':
+        return recognize_long_running(client, config, path, gcs_uri, storage_client)
+    raise ValueError(f"Unknown transcription mode: {mode}")
+
+
+def transcribe_audio(audio_file_path: str, user_id: str, question_number: int, mode: str = 'auto',
+                     fallback: str = TRANSCRIBE_FALLBACK_ENGINE):
     """
     Transcribe audio using Google Cloud Speech-to-Text
     """
     try:
-        client = speech_v1.SpeechClient()
-
-        with open(audio_file_path, 'rb') as audio_file:
-            content = audio_file.read()
-
-        audio = speech_v1.RecognitionAudio(content=content)
-        
-        config = speech_v1.RecognitionConfig(
-            encoding=speech_v1.RecognitionConfig.AudioEncoding.WEBM_OPUS,
-            language_code="en-US",
-            enable_automatic_punctuation=True,
-        )
-
-        response = client.recognize(config=config, audio=audio)
-        
-        transcript = ""
-        for result in response.results:
-            transcript += result.alternatives[0].transcript + " "
-            
-        return transcript.strip()
-        
+        return transcribe_file(audio_file_path, mode=mode, fallback=fallback)
     except Exception as e:
         print(f"Error transcribing audio: {str(e)}")
         return None
@@ -38,9 +318,10 @@ if __name__ == "__main__":
     parser.add_argument("--audio", required=True, help="Path to audio file")
     parser.add_argument("--user", required=True, help="User ID")
     parser.add_argument("--question", required=True, help="Question number")
-    
+    parser.add_argument("--mode", choices=MODES, default="auto", help="Recognition mode (default: by duration)")
+
     args = parser.parse_args()
-    
-    transcript = transcribe_audio(args.audio, args.user, int(args.question))
+
+    transcript = transcribe_audio(args.audio, args.user, int(args.question), args.mode, fallback='off')
     if transcript:
         print(f"Transcription: {transcript}")
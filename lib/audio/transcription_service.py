@@ -1,29 +1,30 @@
-
-from google.cloud import speech_v1
 import os
 
-def transcribe_audio(audio_file_path, user_id=None):
-    client = speech_v1.SpeechClient()
-
-    # Read the audio file
-    with open(audio_file_path, 'rb') as audio_file:
-        content = audio_file.read()
+def transcribe_audio(audio_file_path, user_id=None, client=None, mode='auto', fallback=None):
+    """Transcribe a recording; sync, streaming or long-running recognition is chosen by duration.
 
-    # Configure the recognition
-    audio = speech_v1.RecognitionAudio(content=content)
-    config = speech_v1.RecognitionConfig(
-        encoding=speech_v1.RecognitionConfig.AudioEncoding.MP3,
-        sample_rate_hertz=44100,
-        language_code="en-US",
-        enable_automatic_punctuation=True
-    )
+    fallback defaults to TRANSCRIBE_FALLBACK_ENGINE. transcribe (the Speech
+    client and numpy) is only imported here, so the CLI can hand off to the
+    worker service without loading it.
+    """
+    from transcribe import TRANSCRIBE_FALLBACK_ENGINE, transcribe_file
 
-    # Perform the transcription
-    response = client.recognize(config=config, audio=audio)
+    if fallback is None:
+        fallback = TRANSCRIBE_FALLBACK_ENGINE
+    return transcribe_file(audio_file_path, mode=mode, client=client, default_encoding='MP3', fallback=fallback)
 
-    # Combine all transcriptions
-    transcript = ""
-    for result in response.results:
-        transcript += result.alternatives[0].transcript + " "
+if __name__ == "__main__":
+    import sys
+    if len(sys.argv) < 2:
+        print("Usage: python transcription_service.py <audio_path> [user_id]", file=sys.stderr)
+        sys.exit(1)
 
-    return transcript.strip()
+    audio_path = sys.argv[1]
+    user_id = sys.argv[2] if len(sys.argv) > 2 else None
+    try:
+        from worker_client import WorkerUnavailable, submit_job
+        transcript = submit_job('transcribe', {"audio_path": os.path.abspath(audio_path), "user_id": user_id})['transcript']
+    except WorkerUnavailable:
+        # A one-off process would spend longer loading wav2vec2 than the request is worth
+        transcript = transcribe_audio(audio_path, user_id, fallback='off')
+    print(transcript or "")
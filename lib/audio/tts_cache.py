@@ -0,0 +1,173 @@
+import os
+import sys
+import json
+import hashlib
+import tempfile
+import threading
+from collections import OrderedDict
+
+TTS_CACHE_ENABLED = os.getenv('TTS_CACHE_ENABLED', '1').lower() not in ('0', 'false', 'no')
+TTS_CACHE_DIR = os.getenv('TTS_CACHE_DIR', 'storage/cache/tts')
+TTS_CACHE_MAX_DISK_MB = float(os.getenv('TTS_CACHE_MAX_DISK_MB', '512'))
+TTS_CACHE_MAX_MEMORY_MB = float(os.getenv('TTS_CACHE_MAX_MEMORY_MB', '64'))
+
+
+def normalize_text(text):
+    """Collapse whitespace so trivially different spellings of a phrase share an entry"""
+    return " ".join(text.split())
+
+
+def synthesis_key(voice_id, text, model_id, voice_settings):
+    """Content address for one synthesized utterance"""
+    material = json.dumps([voice_id, normalize_text(text), model_id, voice_settings or {}], sort_keys=True)
+    return hashlib.sha256(material.encode()).hexdigest()
+
+
+class SynthesisCache:
+    """Synthesized audio keyed by (voice, text, model, settings): in-memory LRU over a size-capped disk tier"""
+
+    def __init__(self, directory=TTS_CACHE_DIR, max_disk_bytes=int(TTS_CACHE_MAX_DISK_MB * 1024 * 1024),
+                 max_memory_bytes=int(TTS_CACHE_MAX_MEMORY_MB * 1024 * 1024)):
+        self.directory = directory
+        self.max_disk_bytes = max_disk_bytes
+        self.max_memory_bytes = max_memory_bytes
+        self._lock = threading.Lock()
+        self._memory = OrderedDict()
+        self._memory_bytes = 0
+        # key -> size, least recently used first
+        self._disk = OrderedDict()
+        self._disk_bytes = 0
+        self.counters = {
+            "memory_hits": 0,
+            "disk_hits": 0,
+            "misses": 0,
+            "stores": 0,
+            "memory_evictions": 0,
+            "disk_evictions": 0,
+        }
+        os.makedirs(self.directory, exist_ok=True)
+        self._load_disk_index()
+
+    def _path(self, key):
+        return os.path.join(self.directory, f"{key}.mp3")
+
+    def _load_disk_index(self):
+        """Rebuild the disk LRU from file mtimes, which get() refreshes on every hit"""
+        entries = []
+        for filename in os.listdir(self.directory):
+            if not filename.endswith('.mp3'):
+                continue
+            try:
+                stat = os.stat(os.path.join(self.directory, filename))
+            except OSError:
+                continue
+            entries.append((stat.st_mtime, filename[:-4], stat.st_size))
+        for _, key, size in sorted(entries):
+            self._disk[key] = size
+            self._disk_bytes += size
+
+    def _remember(self, key, audio):
+        """Insert into the memory tier, evicting least recently used entries (lock held)"""
+        if len(audio) > self.max_memory_bytes:
+            return
+        if key in self._memory:
+            self._memory_bytes -= len(self._memory.pop(key))
+        self._memory[key] = audio
+        self._memory_bytes += len(audio)
+        while self._memory_bytes > self.max_memory_bytes:
+            _, evicted = self._memory.popitem(last=False)
+            self._memory_bytes -= len(evicted)
+            self.counters["memory_evictions"] += 1
+
+    def get(self, key):
+        """Return cached audio bytes, or None on a miss"""
+        with self._lock:
+            audio = self._memory.get(key)
+            if audio is not None:
+                self._memory.move_to_end(key)
+                self.counters["memory_hits"] += 1
+                return audio
+            on_disk = key in self._disk
+
+        if on_disk:
+            try:
+                with open(self._path(key), 'rb') as f:
+                    audio = f.read()
+                os.utime(self._path(key))
+            except OSError:
+                audio = None
+
+        with self._lock:
+            if audio is None:
+                if on_disk and key in self._disk:
+                    self._disk_bytes -= self._disk.pop(key)
+                self.counters["misses"] += 1
+                return None
+            if key in self._disk:
+                self._disk.move_to_end(key)
+            self._remember(key, audio)
+            self.counters["disk_hits"] += 1
+            return audio
+
+    def put(self, key, audio):
+        """Store audio in both tiers; disk failures only cost a future miss"""
+        if not audio:
+            return
+        try:
+            fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix='.partial')
+            with os.fdopen(fd, 'wb') as f:
+                f.write(audio)
+            os.replace(tmp_path, self._path(key))
+            stored = True
+        except OSError as e:
+            print(f"Warning: could not write TTS cache entry {key}: {str(e)}", file=sys.stderr)
+            stored = False
+
+        evicted = []
+        with self._lock:
+            self._remember(key, audio)
+            self.counters["stores"] += 1
+            if stored:
+                if key in self._disk:
+                    self._disk_bytes -= self._disk.pop(key)
+                self._disk[key] = len(audio)
+                self._disk_bytes += len(audio)
+                while self._disk_bytes > self.max_disk_bytes and len(self._disk) > 1:
+                    old_key, size = self._disk.popitem(last=False)
+                    self._disk_bytes -= size
+                    self.counters["disk_evictions"] += 1
+                    evicted.append(old_key)
+
+        for old_key in evicted:
+            try:
+                os.remove(self._path(old_key))
+            except OSError:
+                pass
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self.counters)
+            stats.update({
+                "memory_entries": len(self._memory),
+                "memory_bytes": self._memory_bytes,
+                "disk_entries": len(self._disk),
+                "disk_bytes": self._disk_bytes,
+            })
+        lookups = stats["memory_hits"] + stats["disk_hits"] + stats["misses"]
+        stats["hit_ratio"] = (stats["memory_hits"] + stats["disk_hits"]) / lookups if lookups else 0.0
+        return stats
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_synthesis_cache():
+    """Return the process-wide synthesis cache, or None when disabled"""
+    global _cache
+    if not TTS_CACHE_ENABLED:
+        return None
+    with _cache_lock:
+        if _cache is None:
+            _cache = SynthesisCache()
+        return _cache
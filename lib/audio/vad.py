@@ -0,0 +1,117 @@
+import os
+import numpy as np
+
+VAD_ENABLED = os.getenv('VAD_ENABLED', '1').lower() in ('1', 'true', 'yes')
+VAD_FRAME_MS = int(os.getenv('VAD_FRAME_MS', '20'))
+# A frame is speech when its energy is within VAD_RELATIVE_DB of the clip's loud
+# frames (95th percentile) and above the absolute floor
+VAD_RELATIVE_DB = float(os.getenv('VAD_RELATIVE_DB', '35'))
+VAD_FLOOR_DB = float(os.getenv('VAD_FLOOR_DB', '-55'))
+# Speech bursts shorter than this are clicks and bumps, not words
+VAD_MIN_SPEECH_MS = int(os.getenv('VAD_MIN_SPEECH_MS', '60'))
+# Audio kept either side of speech so word onsets and tails aren't clipped
+VAD_HANGOVER_MS = int(os.getenv('VAD_HANGOVER_MS', '200'))
+# Pauses inside a clip are shortened to this rather than removed, so phrasing survives
+VAD_MAX_GAP_MS = int(os.getenv('VAD_MAX_GAP_MS', '400'))
+
+
+def vad_settings():
+    """The settings that change trimming output, e.g. to tell whether a trimmed build is stale"""
+    return {
+        "frame_ms": VAD_FRAME_MS,
+        "relative_db": VAD_RELATIVE_DB,
+        "floor_db": VAD_FLOOR_DB,
+        "min_speech_ms": VAD_MIN_SPEECH_MS,
+        "hangover_ms": VAD_HANGOVER_MS,
+        "max_gap_ms": VAD_MAX_GAP_MS,
+    }
+
+
+def frame_energy_db(audio, frame_samples):
+    """Mean-square energy per frame in dBFS; the last partial frame is zero-padded"""
+    samples = audio.astype(np.float32)
+    if audio.dtype == np.int16:
+        samples /= 32768.0
+    frames = -(-len(samples) // frame_samples)
+    padded = np.zeros(frames * frame_samples, dtype=np.float32)
+    padded[:len(samples)] = samples
+    padded = padded.reshape(frames, frame_samples)
+    return 10 * np.log10(np.einsum('ij,ij->i', padded, padded) / frame_samples + 1e-10)
+
+
+def runs(mask):
+    """(starts, ends) of the runs of True in a boolean array"""
+    edges = np.flatnonzero(np.diff(np.concatenate(([False], mask, [False])).astype(np.int8)))
+    return edges[0::2], edges[1::2]
+
+
+def speech_frames(energy_db, frame_ms=VAD_FRAME_MS, relative_db=VAD_RELATIVE_DB, floor_db=VAD_FLOOR_DB,
+                  min_speech_ms=VAD_MIN_SPEECH_MS, hangover_ms=VAD_HANGOVER_MS):
+    """Boolean speech mask per frame: thresholded energy, short bursts dropped, then dilated by the hangover"""
+    if not len(energy_db):
+        return np.zeros(0, dtype=bool)
+    threshold = max(np.percentile(energy_db, 95) - relative_db, floor_db)
+    speech = energy_db > threshold
+
+    starts, ends = runs(speech)
+    short = (ends - starts) * frame_ms < min_speech_ms
+    for start, end in zip(starts[short], ends[short]):
+        speech[start:end] = False
+
+    hangover = hangover_ms // frame_ms
+    if hangover and speech.any():
+        speech = np.convolve(speech, np.ones(2 * hangover + 1), mode='same') > 0.5
+    return speech
+
+
+def trim_silence(audio, sample_rate=16000, frame_ms=VAD_FRAME_MS, relative_db=VAD_RELATIVE_DB,
+                 floor_db=VAD_FLOOR_DB, min_speech_ms=VAD_MIN_SPEECH_MS, hangover_ms=VAD_HANGOVER_MS,
+                 max_gap_ms=VAD_MAX_GAP_MS):
+    """Drop leading and trailing silence and shorten long pauses.
+
+    Returns (trimmed audio, stats) where stats has input, output and removed
+    seconds. A clip with no detectable speech is returned unchanged rather
+    than emptied, since that usually means the thresholds don't suit it.
+    """
+    frame_samples = max(1, sample_rate * frame_ms // 1000)
+    speech = speech_frames(frame_energy_db(audio, frame_samples), frame_ms, relative_db, floor_db,
+                           min_speech_ms, hangover_ms)
+
+    keep = speech.copy()
+    if speech.any():
+        max_gap = max_gap_ms // frame_ms
+        starts, ends = runs(~speech)
+        for start, end in zip(starts, ends):
+            if start == 0 or end == len(speech):
+                continue
+            if end - start <= max_gap:
+                keep[start:end] = True
+                continue
+            # Keep the edges of a long pause and cut its middle
+            keep[start:start + max_gap // 2] = True
+            keep[end - (max_gap - max_gap // 2):end] = True
+        trimmed = audio[np.repeat(keep, frame_samples)[:len(audio)]]
+    else:
+        trimmed = audio
+
+    input_seconds = len(audio) / sample_rate
+    output_seconds = len(trimmed) / sample_rate
+    return trimmed, {
+        "input_seconds": round(input_seconds, 3),
+        "output_seconds": round(output_seconds, 3),
+        "removed_seconds": round(input_seconds - output_seconds, 3),
+    }
+
+
+def merge_stats(total, stats):
+    """Add one clip's trim stats into a running total"""
+    for key, value in stats.items():
+        total[key] = round(total.get(key, 0.0) + value, 3)
+    return total
+
+
+def describe(stats):
+    removed = stats.get("removed_seconds", 0.0)
+    share = removed / stats["input_seconds"] * 100 if stats.get("input_seconds") else 0.0
+    return (f"removed {removed:.1f}s of silence ({share:.0f}%): "
+            f"{stats.get('input_seconds', 0.0):.1f}s -> {stats.get('output_seconds', 0.0):.1f}s")
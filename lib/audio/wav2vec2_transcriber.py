@@ -0,0 +1,182 @@
+import os
+import sys
+import time
+import argparse
+import numpy as np
+from create_voice import WAV2VEC2_MODEL_NAME, get_wav2vec2, transcode_audio
+from vad import VAD_ENABLED, describe, merge_stats, trim_silence
+
+SAMPLE_RATE = 16000
+# Padded audio per forward pass; bounds peak memory whatever the clip mix
+WAV2VEC2_BATCH_SECONDS = float(os.getenv('WAV2VEC2_BATCH_SECONDS', '240'))
+WAV2VEC2_MAX_BATCH = int(os.getenv('WAV2VEC2_MAX_BATCH', '16'))
+# Self-attention cost grows with the square of the clip length, so long recordings are cut into chunks
+WAV2VEC2_CHUNK_SECONDS = float(os.getenv('WAV2VEC2_CHUNK_SECONDS', '30'))
+WAV2VEC2_THREADS = int(os.getenv('WAV2VEC2_THREADS', str(os.cpu_count() or 1)))
+# Chunk boundaries are moved to the quietest 20ms frame in this window so words aren't cut in half
+CHUNK_SEARCH_SECONDS = 2.0
+FRAME_SAMPLES = SAMPLE_RATE // 50
+
+
+def to_float(audio):
+    if audio.dtype == np.int16:
+        return audio.astype(np.float32) / 32768.0
+    return np.asarray(audio, dtype=np.float32)
+
+
+def split_chunks(audio, chunk_seconds=WAV2VEC2_CHUNK_SECONDS):
+    """Cut a 16kHz clip into pieces of at most chunk_seconds, splitting at low-energy frames"""
+    chunk = int(chunk_seconds * SAMPLE_RATE)
+    search = min(int(CHUNK_SEARCH_SECONDS * SAMPLE_RATE), chunk // 2)
+    pieces = []
+    start = 0
+    while len(audio) - start > chunk:
+        window = audio[start + chunk - search:start + chunk]
+        frames = window[:len(window) // FRAME_SAMPLES * FRAME_SAMPLES].reshape(-1, FRAME_SAMPLES)
+        quietest = int(np.argmin(np.einsum('ij,ij->i', frames, frames))) if len(frames) else 0
+        end = start + chunk - search + quietest * FRAME_SAMPLES + FRAME_SAMPLES // 2
+        pieces.append(audio[start:end])
+        start = end
+    pieces.append(audio[start:])
+    return pieces
+
+
+def frame_lengths(sample_lengths, config):
+    """Logit frames the feature encoder produces for each input length, from the public conv config"""
+    lengths = sample_lengths
+    for kernel, stride in zip(config.conv_kernel, config.conv_stride):
+        lengths = (lengths - kernel) // stride + 1
+    if getattr(config, 'add_adapter', False):
+        for _ in range(config.num_adapter_layers):
+            lengths = (lengths - 1) // config.adapter_stride + 1
+    return lengths
+
+
+def make_batches(lengths, max_batch=WAV2VEC2_MAX_BATCH, batch_seconds=WAV2VEC2_BATCH_SECONDS):
+    """Group item indexes longest-first so each batch pads to a similar length.
+
+    A batch grows while batch_size * longest_item stays within batch_seconds of
+    audio, so batches of short clips are wide and batches of long ones narrow.
+    """
+    budget = batch_seconds * SAMPLE_RATE
+    batches = []
+    current = []
+    for index in sorted(range(len(lengths)), key=lambda i: lengths[i], reverse=True):
+        longest = lengths[current[0]] if current else lengths[index]
+        if current and (len(current) >= max_batch or (len(current) + 1) * longest > budget):
+            batches.append(current)
+            current = []
+        current.append(index)
+    if current:
+        batches.append(current)
+    return batches
+
+
+class Wav2Vec2Transcriber:
+    """Offline CTC transcription with the Wav2Vec2 model create_voice already loads.
+
+    Clips are chunked, bucketed by length into padded batches and run under
+    torch.inference_mode; the logits are greedy-decoded (argmax, collapse
+    repeats, drop blanks). No network calls once the weights are cached.
+    """
+
+    def __init__(self, model_name=WAV2VEC2_MODEL_NAME, threads=WAV2VEC2_THREADS, max_batch=WAV2VEC2_MAX_BATCH,
+                 batch_seconds=WAV2VEC2_BATCH_SECONDS, chunk_seconds=WAV2VEC2_CHUNK_SECONDS, trim=VAD_ENABLED):
+        import torch
+
+        self.torch = torch
+        self.processor, self.model, self.device = get_wav2vec2(model_name)
+        self.model.eval()
+        if threads:
+            torch.set_num_threads(threads)
+        self.max_batch = max_batch
+        self.batch_seconds = batch_seconds
+        self.chunk_seconds = chunk_seconds
+        self.trim = trim
+        # Models trained without an attention mask (wav2vec2-base) degrade when given one;
+        # they expect plain zero padding, which is what bucketing keeps small
+        self.pass_attention_mask = getattr(self.processor.feature_extractor, 'return_attention_mask', False)
+
+    def _decode_batch(self, clips):
+        torch = self.torch
+        inputs = self.processor(clips, sampling_rate=SAMPLE_RATE, return_tensors='pt', padding=True,
+                                return_attention_mask=True)
+        attention_mask = inputs.attention_mask.to(self.device)
+        with torch.inference_mode():
+            logits = self.model(
+                inputs.input_values.to(self.device),
+                attention_mask=attention_mask if self.pass_attention_mask else None
+            ).logits
+        predicted = logits.argmax(dim=-1)
+        # Frames that only cover padding are forced to the blank token before decoding
+        valid = frame_lengths(attention_mask.sum(-1), self.model.config)
+        frames = torch.arange(predicted.shape[1], device=predicted.device)
+        predicted[frames[None, :] >= valid[:, None]] = self.processor.tokenizer.pad_token_id
+        return [text.strip().lower() for text in self.processor.batch_decode(predicted)]
+
+    def transcribe_arrays(self, clips):
+        """Transcribe 16kHz mono arrays; returns one transcript per clip, in order"""
+        owners = []
+        pieces = []
+        for owner, clip in enumerate(clips):
+            for piece in split_chunks(to_float(clip), self.chunk_seconds):
+                if len(piece) >= FRAME_SAMPLES:
+                    owners.append(owner)
+                    pieces.append(piece)
+
+        texts = [None] * len(pieces)
+        for batch in make_batches([len(piece) for piece in pieces], self.max_batch, self.batch_seconds):
+            for index, text in zip(batch, self._decode_batch([pieces[i] for i in batch])):
+                texts[index] = text
+
+        transcripts = [[] for _ in clips]
+        for owner, text in zip(owners, texts):
+            if text:
+                transcripts[owner].append(text)
+        return [" ".join(parts) for parts in transcripts]
+
+    def transcribe_files(self, paths):
+        """Decode and transcribe files together; unreadable files come back as None"""
+        decoded = [transcode_audio(path) for path in paths]
+        readable = [i for i, audio in enumerate(decoded) if audio is not None]
+        if self.trim:
+            totals = {}
+            for i in readable:
+                decoded[i], stats = trim_silence(decoded[i])
+                merge_stats(totals, stats)
+            if totals:
+                print(f"Trimmed {len(readable)} files: {describe(totals)}", file=sys.stderr)
+        texts = self.transcribe_arrays([decoded[i] for i in readable])
+        transcripts = [None] * len(paths)
+        for index, text in zip(readable, texts):
+            transcripts[index] = text
+        return transcripts
+
+
+_transcriber = None
+
+
+def get_transcriber():
+    """Process-wide transcriber, built on first use"""
+    global _transcriber
+    if _transcriber is None:
+        _transcriber = Wav2Vec2Transcriber()
+    return _transcriber
+
+
+def transcribe_local(path):
+    return get_transcriber().transcribe_files([path])[0]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Transcribe audio files locally with Wav2Vec2")
+    parser.add_argument("audio", nargs='+', help="audio files")
+    parser.add_argument("--threads", type=int, default=WAV2VEC2_THREADS, help="torch intra-op threads")
+    parser.add_argument("--max-batch", type=int, default=WAV2VEC2_MAX_BATCH)
+    args = parser.parse_args()
+
+    transcriber = Wav2Vec2Transcriber(threads=args.threads, max_batch=args.max_batch)
+    start = time.perf_counter()
+    for path, transcript in zip(args.audio, transcriber.transcribe_files(args.audio)):
+        print(f"{path}: {transcript}")
+    print(f"Transcribed {len(args.audio)} files in {time.perf_counter() - start:.1f}s", file=sys.stderr)
@@ -0,0 +1,55 @@
+import os
+import json
+import urllib.error
+import urllib.request
+
+DEFAULT_WORKER_URL = os.getenv(
+    'VOICE_WORKER_URL',
+    f"http://{os.getenv('VOICE_WORKER_HOST', '127.0.0.1')}:{os.getenv('VOICE_WORKER_PORT', '8765')}"
+)
+WORKER_DISABLED = os.getenv('VOICE_WORKER_DISABLED', '').lower() in ('1', 'true', 'yes')
+
+
+class WorkerUnavailable(Exception):
+    """The worker service is not running or could not be reached"""
+
+
+class WorkerJobFailed(Exception):
+    """The worker ran the job but it raised an error"""
+
+
+def submit_job(kind, params, wait=True, timeout=3600, url=DEFAULT_WORKER_URL):
+    """Submit a job to the worker service and, by default, wait for its result"""
+    if WORKER_DISABLED:
+        raise WorkerUnavailable("Worker service disabled by VOICE_WORKER_DISABLED")
+
+    query = f"?wait={timeout}" if wait else ""
+    request = urllib.request.Request(
+        f"{url}/jobs{query}",
+        data=json.dumps({"kind": kind, "params": params}).encode(),
+        headers={"Content-Type": "application/json"},
+        method="POST",
+    )
+    try:
+        with urllib.request.urlopen(request, timeout=timeout + 30 if wait else 30) as response:
+            job = json.loads(response.read())
+    except urllib.error.HTTPError as e:
+        raise WorkerJobFailed(e.read().decode(errors='replace')) from e
+    except (urllib.error.URLError, ConnectionError, TimeoutError) as e:
+        raise WorkerUnavailable(str(e)) from e
+
+    if not wait:
+        return job
+    if job['status'] == 'failed':
+        raise WorkerJobFailed(job['error'])
+    if job['status'] != 'succeeded':
+        raise WorkerJobFailed(f"Job {job['job_id']} still {job['status']} after {timeout}s")
+    return job['result']
+
+
+def get_job(job_id, url=DEFAULT_WORKER_URL):
+    try:
+        with urllib.request.urlopen(f"{url}/jobs/{job_id}", timeout=30) as response:
+            return json.loads(response.read())
+    except urllib.error.URLError as e:
+        raise WorkerUnavailable(str(e)) from e
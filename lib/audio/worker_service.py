@@ -0,0 +1,237 @@
+import os
+import sys
+import json
+import time
+import uuid
+import base64
+import argparse
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs
+
+DEFAULT_HOST = os.getenv('VOICE_WORKER_HOST', '127.0.0.1')
+DEFAULT_PORT = int(os.getenv('VOICE_WORKER_PORT', '8765'))
+DEFAULT_CONCURRENCY = int(os.getenv('VOICE_WORKER_CONCURRENCY', '2'))
+MAX_FINISHED_JOBS = 1000
+
+
+class Job:
+    def __init__(self, kind, params):
+        self.id = uuid.uuid4().hex
+        self.kind = kind
+        self.params = params
+        self.status = 'queued'
+        self.result = None
+        self.error = None
+        self.created_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+
+    def to_dict(self):
+        return {
+            "job_id": self.id,
+            "kind": self.kind,
+            "status": self.status,
+            "result": self.result,
+            "error": self.error,
+            "created_at": self.created_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+        }
+
+
+class WorkerService:
+    """Runs voice, audio retrieval and transcription jobs in one warm process"""
+
+    def __init__(self, concurrency=DEFAULT_CONCURRENCY):
+        self.concurrency = max(1, concurrency)
+        self.executor = ThreadPoolExecutor(max_workers=self.concurrency)
+        self.jobs = OrderedDict()
+        self.lock = threading.Lock()
+        self.changed = threading.Condition(self.lock)
+        self.handlers = {}
+        self._warm_up()
+
+    def _warm_up(self):
+        """Import the job modules and build their clients once, up front"""
+        from google.cloud import storage
+        from create_voice import VoiceCreator, make_transcode_pool, warm_transcode_pool
+        import audio_retriever
+        import batch_transcribe
+        import transcribe
+        import transcription_service
+
+        self.storage_client = storage.Client()
+        self.speech_client = transcribe.get_speech_client()
+        # One transcode pool for the life of the service, shared by every create_voice job
+        self.transcode_pool = make_transcode_pool()
+        warm_transcode_pool(self.transcode_pool)
+        self.voice_creator = VoiceCreator(storage_client=self.storage_client, transcode_pool=self.transcode_pool)
+        self.handlers = {
+            'create_voice': self._run_create_voice,
+            'retrieve_audio': self._run_retrieve_audio,
+            'transcribe': self._run_transcribe,
+            'batch_transcribe': self._run_batch_transcribe,
+        }
+        self._audio_retriever = audio_retriever
+        self._transcription_service = transcription_service
+        self._batch_transcribe = batch_transcribe
+        print(f"Worker service warmed up with {self.concurrency} job slots")
+
+    def _run_create_voice(self, params):
+        # Per-job overrides get their own creator on the same pool; the model cache is process-wide anyway
+        overrides = {key: params[key] for key in ('download_workers', 'in_memory', 'cache_backend')
+                     if params.get(key) is not None}
+        creator = self.voice_creator
+        if overrides:
+            from create_voice import VoiceCreator
+            creator = VoiceCreator(storage_client=self.storage_client, transcode_pool=self.transcode_pool,
+                                   **overrides)
+        voice_id = creator.create_voice(params['user_id'], params['name'],
+                                        rebuild=params.get('rebuild', False), trim=params.get('trim'))
+        return {"voice_id": voice_id}
+
+    def _run_retrieve_audio(self, params):
+        audio = self._audio_retriever.get_audio_file(params['user_id'], params['question'],
+                                                     storage_client=self.storage_client)
+        return {"audio": base64.b64encode(audio).decode('ascii') if audio else None}
+
+    def _run_transcribe(self, params):
+        transcript = self._transcription_service.transcribe_audio(params['audio_path'], params.get('user_id'),
+                                                                  client=self.speech_client)
+        return {"transcript": transcript}
+
+    def _run_batch_transcribe(self, params):
+        kwargs = {key: params[key] for key in ('workers', 'force', 'engine') if key in params}
+        return self._batch_transcribe.batch_transcribe(params['user_id'], storage_client=self.storage_client,
+                                                       speech_client=self.speech_client, **kwargs)
+
+    def submit(self, kind, params):
+        if kind not in self.handlers:
+            raise ValueError(f"Unknown job kind: {kind}")
+        job = Job(kind, params or {})
+        with self.lock:
+            self.jobs[job.id] = job
+            self._prune()
+        self.executor.submit(self._run, job)
+        return job
+
+    def _run(self, job):
+        with self.changed:
+            job.status = 'running'
+            job.started_at = time.time()
+        try:
+            result = self.handlers[job.kind](job.params)
+            status, error = 'succeeded', None
+        except Exception as e:
+            print(f"Job {job.id} ({job.kind}) failed: {str(e)}", file=sys.stderr)
+            result, status, error = None, 'failed', str(e)
+        with self.changed:
+            job.result = result
+            job.error = error
+            job.status = status
+            job.finished_at = time.time()
+            self.changed.notify_all()
+
+    def _prune(self):
+        """Forget the oldest finished jobs once the history is full (lock held)"""
+        finished = [job_id for job_id, job in self.jobs.items() if job.finished_at is not None]
+        for job_id in finished[:max(0, len(self.jobs) - MAX_FINISHED_JOBS)]:
+            del self.jobs[job_id]
+
+    def get(self, job_id):
+        with self.lock:
+            return self.jobs.get(job_id)
+
+    def wait(self, job, timeout=None):
+        """Block until the job finishes or the timeout passes"""
+        deadline = None if timeout is None else time.time() + timeout
+        with self.changed:
+            while job.finished_at is None:
+                remaining = None if deadline is None else deadline - time.time()
+                if remaining is not None and remaining <= 0:
+                    break
+                self.changed.wait(remaining)
+        return job
+
+    def status(self):
+        with self.lock:
+            counts = {}
+            for job in self.jobs.values():
+                counts[job.status] = counts.get(job.status, 0) + 1
+        return {"status": "ok", "concurrency": self.concurrency, "jobs": counts, "pid": os.getpid()}
+
+
+def make_handler(service):
+    class WorkerRequestHandler(BaseHTTPRequestHandler):
+        protocol_version = 'HTTP/1.1'
+
+        def _send_json(self, status, payload):
+            body = json.dumps(payload).encode()
+            self.send_response(status)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def do_GET(self):
+            url = urlparse(self.path)
+            if url.path == '/health':
+                return self._send_json(200, service.status())
+            if url.path.startswith('/jobs/'):
+                job = service.get(url.path[len('/jobs/'):])
+                if job is None:
+                    return self._send_json(404, {"error": "Job not found"})
+                wait = parse_qs(url.query).get('wait', [None])[0]
+                if wait is not None:
+                    service.wait(job, float(wait))
+                return self._send_json(200, job.to_dict())
+            self._send_json(404, {"error": "Not found"})
+
+        def do_POST(self):
+            url = urlparse(self.path)
+            if url.path != '/jobs':
+                return self._send_json(404, {"error": "Not found"})
+            try:
+                length = int(self.headers.get('Content-Length', 0))
+                payload = json.loads(self.rfile.read(length) or b'{}')
+                job = service.submit(payload.get('kind'), payload.get('params'))
+            except (ValueError, json.JSONDecodeError) as e:
+                return self._send_json(400, {"error": str(e)})
+
+            wait = parse_qs(url.query).get('wait', [None])[0]
+            if wait is not None:
+                service.wait(job, float(wait))
+            self._send_json(200 if job.finished_at else 202, job.to_dict())
+
+        def log_message(self, format, *args):
+            print(f"Worker {self.address_string()} - {format % args}", file=sys.stderr)
+
+    return WorkerRequestHandler
+
+
+def run_worker_service(host=DEFAULT_HOST, port=DEFAULT_PORT, concurrency=DEFAULT_CONCURRENCY):
+    service = WorkerService(concurrency)
+    httpd = ThreadingHTTPServer((host, port), make_handler(service))
+    httpd.daemon_threads = True
+    print(f"Worker service listening on http://{host}:{port}")
+    try:
+        httpd.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        httpd.server_close()
+        service.executor.shutdown(wait=True)
+        service.transcode_pool.shutdown(wait=True)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Long-lived worker for voice, audio and transcription jobs")
+    parser.add_argument("--host", default=DEFAULT_HOST)
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    parser.add_argument("--concurrency", type=int, default=DEFAULT_CONCURRENCY,
+                        help="Jobs run at once (default: $VOICE_WORKER_CONCURRENCY or 2)")
+    args = parser.parse_args()
+    run_worker_service(args.host, args.port, args.concurrency)
@@ -1,2 +1,6 @@
 
 from .upload_manager import upload_file_to_gcp
+from .recordings_manifest import (
+    ensure_recordings_manifest, invalidate_recordings_manifest, latest_recording, load_recordings_manifest,
+    rebuild_recordings_manifest, record_upload, track_upload
+)
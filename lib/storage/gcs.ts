@@ -1,5 +1,6 @@
 import { Storage } from '@google-cloud/storage';
 import fs from 'fs';
+import { trackRecordingDelete, trackRecordingUpload } from './recordingsManifest';
 
 // Initialize GCS client with proper error handling
 let storage: Storage;
@@ -54,6 +55,7 @@ export async function uploadFile(file: Buffer | File | Blob, fileName: string):
   } else {
     await blob.save(file);
   }
+  await trackRecordingUpload(bucket, blob);
 
   // Generate signed URL for temporary access
   const [url] = await blob.getSignedUrl({
@@ -68,7 +70,9 @@ export async function uploadFile(file: Buffer | File | Blob, fileName: string):
 export async function deleteFile(fileName: string) {
   try {
     console.log(`Deleting file: ${fileName}`);
-    await storage.bucket(bucketName).file(fileName).delete();
+    const bucket = storage.bucket(bucketName);
+    await bucket.file(fileName).delete();
+    await trackRecordingDelete(bucket, fileName);
     console.log('File deletion successful');
     return true;
   } catch (error) {
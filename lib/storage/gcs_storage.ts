@@ -1,5 +1,6 @@
 
 import { Storage } from '@google-cloud/storage';
+import { trackRecordingDelete, trackRecordingUpload } from './recordingsManifest';
 
 const storage = new Storage();
 const bucketName = process.env.GCP_BUCKET_NAME || 'memorial-voices';
@@ -9,6 +10,7 @@ export async function uploadRecording(file: File, fileName: string): Promise<str
   const blob = bucket.file(fileName);
   
   await blob.save(Buffer.from(await file.arrayBuffer()));
+  await trackRecordingUpload(bucket, blob);
   
   // Generate signed URL for temporary access
   const [url] = await blob.getSignedUrl({
@@ -23,6 +25,7 @@ export async function deleteRecording(fileName: string): Promise<void> {
   const bucket = storage.bucket(bucketName);
   const file = bucket.file(fileName);
   await file.delete();
+  await trackRecordingDelete(bucket, fileName);
 }
 
 export async function listRecordings(prefix: string): Promise<string[]> {
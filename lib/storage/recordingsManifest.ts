@@ -0,0 +1,177 @@
+import type { Bucket, File } from '@google-cloud/storage';
+
+// Mirrors lib/storage/recordings_manifest.py; both writers keep the same JSON layout.
+// Readers trust the manifest, so every route that writes or deletes under
+// {user}/recordings/ goes through trackRecordingUpload / trackRecordingDelete,
+// which drop the manifest when they can't update it.
+const MANIFEST_VERSION = 1;
+const MANIFEST_UPDATE_RETRIES = 8;
+const RECORDING_EXTENSIONS = ['.mp3', '.webm', '.wav', '.ogg', '.opus', '.flac'];
+const QUESTION_PATTERN = /(?:^|\/)(?:question|q)?(\d+)(?:[\/_]|$)/;
+const UNSORTED = 'unsorted';
+const RECORDING_PATH = /^([^/]+)\/recordings\/.+/;
+
+interface RecordingEntry {
+  name: string;
+  generation: number | null;
+  size: number | null;
+  content_type: string | null;
+  md5: string | null;
+  created: string | null;
+}
+
+interface RecordingsManifest {
+  version: number;
+  user_id: string;
+  updated_at: string | null;
+  questions: Record<string, { latest: RecordingEntry | null; recordings: RecordingEntry[] }>;
+}
+
+const manifestPath = (userId: string) => `${userId}/recordings_manifest.json`;
+const recordingsPrefix = (userId: string) => `${userId}/recordings/`;
+
+function questionFor(userId: string, name: string): string {
+  const match = name.slice(recordingsPrefix(userId).length).match(QUESTION_PATTERN);
+  return match ? String(parseInt(match[1], 10)) : UNSORTED;
+}
+
+/** The user a recording object belongs to, or null for anything the manifest doesn't index */
+export function recordingOwner(name: string): string | null {
+  const match = name.match(RECORDING_PATH);
+  if (!match || !RECORDING_EXTENSIONS.some((ext) => name.toLowerCase().endsWith(ext))) return null;
+  return match[1];
+}
+
+function recordingEntry(file: File): RecordingEntry {
+  const metadata = file.metadata || {};
+  return {
+    name: file.name,
+    generation: metadata.generation != null ? Number(metadata.generation) : null,
+    size: metadata.size != null ? Number(metadata.size) : null,
+    content_type: metadata.contentType || null,
+    md5: metadata.md5Hash || null,
+    // Python writes isoformat() with +00:00; keep the same shape so entries sort together
+    created: metadata.timeCreated ? new Date(metadata.timeCreated).toISOString().replace('Z', '+00:00') : null,
+  };
+}
+
+function removeRecording(manifest: RecordingsManifest, userId: string, name: string) {
+  const key = questionFor(userId, name);
+  const question = manifest.questions[key];
+  if (!question) return;
+  const recordings = question.recordings.filter((existing) => existing.name !== name);
+  if (recordings.length) {
+    manifest.questions[key] = { latest: recordings[recordings.length - 1], recordings };
+  } else {
+    delete manifest.questions[key];
+  }
+}
+
+function addRecording(manifest: RecordingsManifest, userId: string, entry: RecordingEntry) {
+  const key = questionFor(userId, entry.name);
+  const question = manifest.questions[key] || { latest: null, recordings: [] };
+  const recordings = question.recordings.filter((existing) => existing.name !== entry.name);
+  recordings.push(entry);
+  recordings.sort((a, b) => (a.created || '').localeCompare(b.created || '') || a.name.localeCompare(b.name));
+  manifest.questions[key] = { latest: recordings[recordings.length - 1], recordings };
+}
+
+async function buildManifest(bucket: Bucket, userId: string): Promise<RecordingsManifest> {
+  const manifest: RecordingsManifest = { version: MANIFEST_VERSION, user_id: userId, updated_at: null, questions: {} };
+  const [files] = await bucket.getFiles({ prefix: recordingsPrefix(userId) });
+  for (const file of files) {
+    if (RECORDING_EXTENSIONS.some((ext) => file.name.toLowerCase().endsWith(ext))) {
+      addRecording(manifest, userId, recordingEntry(file));
+    }
+  }
+  return manifest;
+}
+
+async function updateManifest(bucket: Bucket, userId: string,
+                              change: ((manifest: RecordingsManifest) => void) | null) {
+  const manifestFile = bucket.file(manifestPath(userId));
+  for (let attempt = 0; attempt < MANIFEST_UPDATE_RETRIES; attempt++) {
+    if (attempt) {
+      await new Promise((resolve) => setTimeout(resolve, Math.random() * 50 * 2 ** Math.min(attempt, 5)));
+    }
+
+    let manifest: RecordingsManifest | null = null;
+    let generation = 0;
+    try {
+      const [metadata] = await manifestFile.getMetadata();
+      generation = Number(metadata.generation);
+      if (change) {
+        const [contents] = await bucket.file(manifestFile.name, { generation }).download();
+        const current: RecordingsManifest = JSON.parse(contents.toString('utf-8'));
+        change(current);
+        manifest = current;
+      }
+    } catch (error: any) {
+      if (error?.code !== 404) throw error;
+      generation = 0;
+    }
+    // No manifest yet (or a rebuild): the listing already reflects the change
+    if (!manifest) manifest = await buildManifest(bucket, userId);
+
+    manifest.updated_at = new Date().toISOString();
+    try {
+      await manifestFile.save(JSON.stringify(manifest), {
+        contentType: 'application/json',
+        resumable: false,
+        preconditionOpts: { ifGenerationMatch: generation },
+      });
+      return manifest;
+    } catch (error: any) {
+      if (error?.code !== 412) throw error;
+    }
+  }
+  throw new Error(`Recordings manifest for ${userId} kept changing; rebuild it`);
+}
+
+/**
+ * Add a freshly uploaded recording to the user's manifest.
+ * The write is conditional on the generation that was read, so concurrent
+ * uploads (from here or from upload_manager.py) retry instead of clobbering each other.
+ */
+export async function recordUpload(bucket: Bucket, userId: string, file: File) {
+  return updateManifest(bucket, userId, (manifest) => addRecording(manifest, userId, recordingEntry(file)));
+}
+
+export async function recordDelete(bucket: Bucket, userId: string, name: string) {
+  return updateManifest(bucket, userId, (manifest) => removeRecording(manifest, userId, name));
+}
+
+/** Regenerate the manifest from a listing, e.g. for a new or renamed user folder */
+export async function rebuildManifest(bucket: Bucket, userId: string) {
+  return updateManifest(bucket, userId, null);
+}
+
+/** Delete the manifest so readers list the bucket until the next write rebuilds it */
+export async function invalidateManifest(bucket: Bucket, userId: string) {
+  await bucket.file(manifestPath(userId)).delete({ ignoreNotFound: true });
+}
+
+async function keepManifestCurrent(bucket: Bucket, userId: string, update: () => Promise<unknown>) {
+  try {
+    await update();
+  } catch (error) {
+    console.warn(`Could not update recordings manifest for ${userId}, invalidating it:`, error);
+    try {
+      await invalidateManifest(bucket, userId);
+    } catch (invalidateError) {
+      console.error(`Could not invalidate recordings manifest for ${userId}:`, invalidateError);
+    }
+  }
+}
+
+/** Call after saving any object; recordings are added to their owner's manifest, other objects are ignored */
+export async function trackRecordingUpload(bucket: Bucket, file: File) {
+  const userId = recordingOwner(file.name);
+  if (userId) await keepManifestCurrent(bucket, userId, () => recordUpload(bucket, userId, file));
+}
+
+/** Call after deleting any object; recordings are removed from their owner's manifest */
+export async function trackRecordingDelete(bucket: Bucket, name: string) {
+  const userId = recordingOwner(name);
+  if (userId) await keepManifestCurrent(bucket, userId, () => recordDelete(bucket, userId, name));
+}
@@ -0,0 +1,221 @@
+import os
+import re
+import sys
+import json
+import time
+import random
+import argparse
+import datetime
+from google.cloud import storage
+
+BUCKET_NAME = os.getenv('GCP_BUCKET_NAME', 'memorial-voices')
+# lib/storage/recordingsManifest.ts writes the same layout from the Next.js routes. Every
+# writer under {user}/recordings/ updates the manifest or, failing that, deletes it, so
+# readers can use it in place of a listing and list only when it is missing or stale
+RECORDING_EXTENSIONS = ('.mp3', '.webm', '.wav', '.ogg', '.opus', '.flac')
+MANIFEST_VERSION = 1
+# Concurrent uploads for one user race on the manifest; each retry re-reads it
+MANIFEST_UPDATE_RETRIES = int(os.getenv('RECORDINGS_MANIFEST_RETRIES', '8'))
+UNSORTED = "unsorted"
+
+# recordings/question3/..., recordings/3/... and recordings/question3_<timestamp>.mp3 layouts
+QUESTION_PATTERN = re.compile(r'(?:^|/)(?:question|q)?(\d+)(?:[/_]|$)')
+
+
+def manifest_path(user_id):
+    return f"{user_id}/recordings_manifest.json"
+
+
+def recordings_prefix(user_id):
+    return f"{user_id}/recordings/"
+
+
+def question_for(user_id, name):
+    """Question number a recording belongs to, as a string, or UNSORTED"""
+    match = QUESTION_PATTERN.search(name[len(recordings_prefix(user_id)):])
+    return str(int(match.group(1))) if match else UNSORTED
+
+
+def recording_entry(blob):
+    created = blob.time_created
+    return {
+        "name": blob.name,
+        "generation": blob.generation,
+        "size": blob.size,
+        "content_type": blob.content_type,
+        "md5": blob.md5_hash,
+        "created": created.isoformat() if created else None,
+    }
+
+
+def empty_manifest(user_id):
+    return {"version": MANIFEST_VERSION, "user_id": user_id, "updated_at": None, "questions": {}}
+
+
+def add_recording(manifest, user_id, entry):
+    """Insert or replace one recording and recompute its question's latest entry"""
+    question = manifest["questions"].setdefault(question_for(user_id, entry["name"]), {"latest": None, "recordings": []})
+    recordings = [existing for existing in question["recordings"] if existing["name"] != entry["name"]]
+    recordings.append(entry)
+    recordings.sort(key=lambda item: (item["created"] or "", item["name"]))
+    question["recordings"] = recordings
+    question["latest"] = recordings[-1]
+    return manifest
+
+
+def build_manifest(user_id, blobs):
+    manifest = empty_manifest(user_id)
+    for blob in blobs:
+        if blob.name.lower().endswith(RECORDING_EXTENSIONS):
+            add_recording(manifest, user_id, recording_entry(blob))
+    manifest["updated_at"] = datetime.datetime.now(datetime.timezone.utc).isoformat()
+    return manifest
+
+
+def _read(bucket, user_id):
+    """(manifest, generation) or (None, 0) when there is none yet"""
+    from google.api_core.exceptions import NotFound
+    blob = bucket.blob(manifest_path(user_id))
+    try:
+        data = blob.download_as_bytes()
+    except NotFound:
+        return None, 0
+    return json.loads(data), blob.generation
+
+
+def _write(bucket, user_id, manifest, if_generation_match=None):
+    manifest["updated_at"] = datetime.datetime.now(datetime.timezone.utc).isoformat()
+    kwargs = {} if if_generation_match is None else {"if_generation_match": if_generation_match}
+    bucket.blob(manifest_path(user_id)).upload_from_string(json.dumps(manifest), content_type='application/json',
+                                                           **kwargs)
+
+
+def load_recordings_manifest(bucket, user_id):
+    """The user's manifest from a single GET, or None if it hasn't been built or can't be read"""
+    try:
+        return _read(bucket, user_id)[0]
+    except Exception as e:
+        print(f"Warning: could not read recordings manifest for {user_id}: {str(e)}", file=sys.stderr)
+        return None
+
+
+def _update(bucket, user_id, change=None):
+    """Read-modify-write guarded by the manifest's generation, so concurrent
+    writers retry instead of overwriting each other. Without a manifest (or a
+    change) the manifest is built from a full listing, which already reflects
+    whatever was just written.
+    """
+    from google.api_core.exceptions import PreconditionFailed
+    for attempt in range(MANIFEST_UPDATE_RETRIES):
+        if attempt:
+            # Jittered backoff so racing writers don't collide again in lockstep
+            time.sleep(random.uniform(0, 0.05 * 2 ** min(attempt, 5)))
+        manifest, generation = _read(bucket, user_id)
+        if manifest is None or change is None:
+            manifest = build_manifest(user_id, bucket.list_blobs(prefix=recordings_prefix(user_id)))
+        else:
+            change(manifest)
+        try:
+            _write(bucket, user_id, manifest, if_generation_match=generation)
+            return manifest
+        except PreconditionFailed:
+            continue
+    raise RuntimeError(f"Recordings manifest for {user_id} kept changing; rebuild it")
+
+
+def rebuild_recordings_manifest(user_id, bucket=None, storage_client=None, bucket_name=BUCKET_NAME):
+    """Regenerate the manifest from a full listing of the user's recordings"""
+    if bucket is None:
+        bucket = (storage_client or storage.Client()).bucket(bucket_name)
+    return _update(bucket, user_id)
+
+
+def ensure_recordings_manifest(bucket, user_id):
+    """The user's manifest, built from one listing if they don't have one yet.
+
+    The write only succeeds if no manifest exists, so a reader can't replace
+    one that an upload created while it was listing.
+    """
+    from google.api_core.exceptions import PreconditionFailed
+    manifest = load_recordings_manifest(bucket, user_id)
+    if manifest is not None:
+        return manifest
+    manifest = build_manifest(user_id, bucket.list_blobs(prefix=recordings_prefix(user_id)))
+    try:
+        _write(bucket, user_id, manifest, if_generation_match=0)
+    except PreconditionFailed:
+        return load_recordings_manifest(bucket, user_id) or manifest
+    return manifest
+
+
+def invalidate_recordings_manifest(bucket, user_id):
+    """Delete the manifest so readers list the bucket until the next write rebuilds it"""
+    from google.api_core.exceptions import NotFound
+    try:
+        bucket.blob(manifest_path(user_id)).delete()
+    except NotFound:
+        pass
+
+
+def record_upload(bucket, user_id, blob):
+    """Add a freshly uploaded recording to the manifest"""
+    return _update(bucket, user_id, lambda manifest: add_recording(manifest, user_id, recording_entry(blob)))
+
+
+def track_upload(bucket, user_id, blob):
+    """record_upload for writers whose upload already succeeded: a manifest that
+    can't be updated is deleted rather than left stale"""
+    try:
+        record_upload(bucket, user_id, blob)
+    except Exception as e:
+        print(f"Warning: could not update recordings manifest for {user_id}, invalidating it: {str(e)}",
+              file=sys.stderr)
+        try:
+            invalidate_recordings_manifest(bucket, user_id)
+        except Exception as invalidate_error:
+            print(f"Error invalidating recordings manifest for {user_id}: {str(invalidate_error)}", file=sys.stderr)
+
+
+def entry_blob(bucket, entry):
+    """Blob handle for a manifest entry, pinned to the indexed generation so a
+    replaced or deleted recording raises NotFound instead of serving other bytes"""
+    blob = bucket.blob(entry["name"], generation=entry["generation"])
+    blob.md5_hash = entry["md5"]
+    return blob
+
+
+def manifest_blobs(bucket, manifest):
+    """Pinned blob handles for every recording in the manifest, in name order"""
+    entries = [entry for question in manifest["questions"].values() for entry in question["recordings"]]
+    return [entry_blob(bucket, entry) for entry in sorted(entries, key=lambda entry: entry["name"])]
+
+
+def question_recordings(manifest, question):
+    key = str(int(question)) if str(question).isdigit() else str(question)
+    return manifest["questions"].get(key, {}).get("recordings", [])
+
+
+def latest_recording(manifest, question, prefix=None, extensions=None):
+    """Newest manifest entry for a question, optionally limited to a name prefix and extensions"""
+    candidates = [
+        entry for entry in question_recordings(manifest, question)
+        if (prefix is None or entry["name"].startswith(prefix))
+        and (extensions is None or entry["name"].lower().endswith(extensions))
+    ]
+    return candidates[-1] if candidates else None
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Build or inspect per-user recordings manifests")
+    parser.add_argument("command", choices=["rebuild", "show"])
+    parser.add_argument("user_ids", nargs='+', help="top-level user folders in the bucket")
+    args = parser.parse_args()
+
+    bucket = storage.Client().bucket(BUCKET_NAME)
+    for user_id in args.user_ids:
+        if args.command == "rebuild":
+            manifest = rebuild_recordings_manifest(user_id, bucket=bucket)
+            count = sum(len(question["recordings"]) for question in manifest["questions"].values())
+            print(f"{user_id}: {count} recordings in {len(manifest['questions'])} questions", file=sys.stderr)
+        else:
+            print(json.dumps(load_recordings_manifest(bucket, user_id), indent=2))
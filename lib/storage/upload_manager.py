@@ -1,5 +1,6 @@
 from google.cloud import storage
 import os
+from .recordings_manifest import RECORDING_EXTENSIONS, track_upload
 
 def upload_file_to_gcp(file_path: str, user_id: str, file_type: str):
     """
@@ -23,6 +24,10 @@ def upload_file_to_gcp(file_path: str, user_id: str, file_type: str):
         blob.upload_from_filename(file_path)
         
         print(f"File {file_path} uploaded to {destination_blob_name}")
+
+        # Keep the per-user recordings index current; the upload itself has already succeeded
+        if file_type.split('/')[0] == 'recordings' and file_name.lower().endswith(RECORDING_EXTENSIONS):
+            track_upload(bucket, user_id, blob)
         return {
             'success': True,
             'path': destination_blob_name
@@ -0,0 +1,108 @@
+import json
+import time
+import socket
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# A few MPEG frame headers followed by padding; clients only treat it as opaque bytes
+FAKE_MP3_FRAME = b'\xff\xfb\x90\x64' + b'\x00' * 413
+
+
+class FakeElevenLabsServer:
+    """Local stand-in for the ElevenLabs text-to-speech API.
+
+    Serves POST /v1/text-to-speech/<voice_id> and .../stream with fake MP3 bytes
+    sized from the request text. Latency, chunking and injected failures are
+    configurable so clients can be benchmarked and load-tested offline.
+    """
+
+    def __init__(self, host='127.0.0.1', port=0, first_byte_latency=0.0, bytes_per_char=64,
+                 chunk_size=4096, chunk_interval=0.0, fail_statuses=None, ssl_context=None):
+        self.first_byte_latency = first_byte_latency
+        self.bytes_per_char = bytes_per_char
+        self.chunk_size = chunk_size
+        self.chunk_interval = chunk_interval
+        # Statuses returned, in order, before requests start succeeding
+        self.fail_statuses = list(fail_statuses or [])
+        self.requests = 0
+        self.connections = 0
+        self._lock = threading.Lock()
+
+        self.httpd = ThreadingHTTPServer((host, port), self._make_handler())
+        self.httpd.daemon_threads = True
+        if ssl_context is not None:
+            self.httpd.socket = ssl_context.wrap_socket(self.httpd.socket, server_side=True)
+        self.scheme = 'https' if ssl_context is not None else 'http'
+        self._thread = None
+
+    @property
+    def url(self):
+        host, port = self.httpd.server_address[:2]
+        return f"{self.scheme}://{host}:{port}"
+
+    def _make_handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def setup(self):
+                super().setup()
+                # Headers and body go out as separate writes; without this Nagle
+                # plus the client's delayed ACK adds ~40ms to every reused connection
+                self.connection.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+                with server._lock:
+                    server.connections += 1
+
+            def do_POST(self):
+                length = int(self.headers.get('Content-Length', 0))
+                payload = json.loads(self.rfile.read(length) or b'{}')
+                with server._lock:
+                    server.requests += 1
+                    status = server.fail_statuses.pop(0) if server.fail_statuses else 200
+
+                if not self.path.startswith('/v1/text-to-speech/'):
+                    status = 404
+                if status != 200:
+                    body = json.dumps({"detail": "fake failure"}).encode()
+                    self.send_response(status)
+                    self.send_header('Content-Type', 'application/json')
+                    self.send_header('Content-Length', str(len(body)))
+                    self.end_headers()
+                    self.wfile.write(body)
+                    return
+
+                size = max(len(FAKE_MP3_FRAME), len(payload.get('text', '')) * server.bytes_per_char)
+                audio = (FAKE_MP3_FRAME * (size // len(FAKE_MP3_FRAME) + 1))[:size]
+                if server.first_byte_latency:
+                    time.sleep(server.first_byte_latency)
+
+                self.send_response(200)
+                self.send_header('Content-Type', 'audio/mpeg')
+                self.send_header('Content-Length', str(len(audio)))
+                self.end_headers()
+                for offset in range(0, len(audio), server.chunk_size):
+                    self.wfile.write(audio[offset:offset + server.chunk_size])
+                    self.wfile.flush()
+                    if server.chunk_interval:
+                        time.sleep(server.chunk_interval)
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
+
+    def start(self):
+        self._thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
@@ -0,0 +1,195 @@
+import time
+import base64
+import hashlib
+import datetime
+import threading
+
+try:
+    from google.api_core.exceptions import NotFound, PreconditionFailed
+except ImportError:
+    class NotFound(Exception):
+        pass
+
+    class PreconditionFailed(Exception):
+        pass
+
+
+class _Store:
+    """Objects for every fake bucket, shared by all clients created from one FakeClient"""
+
+    def __init__(self, latency=0.0):
+        self.latency = latency
+        self.objects = {}
+        self.generation = 0
+        self.lock = threading.Lock()
+
+    def wait(self):
+        # Simulated per-request round-trip
+        if self.latency:
+            time.sleep(self.latency)
+
+
+class Blob:
+    def __init__(self, name, bucket, generation=None):
+        self.name = name
+        self.bucket = bucket
+        # A handle pinned to a generation only sees that generation (no object versioning here)
+        self._pinned = generation
+        self.generation = generation
+        self.md5_hash = None
+        self.size = None
+        self.content_type = None
+        self.time_created = None
+        self.updated = None
+        self.metadata = None
+
+    def _load(self, record):
+        self.generation = record["generation"]
+        self.md5_hash = record["md5_hash"]
+        self.size = len(record["data"])
+        self.content_type = record["content_type"]
+        self.time_created = record["time_created"]
+        self.updated = record["time_created"]
+        self.metadata = record["metadata"]
+        return self
+
+    def _record(self):
+        store = self.bucket.client.store
+        store.wait()
+        with store.lock:
+            record = store.objects.get((self.bucket.name, self.name))
+        if record is None or (self._pinned is not None and record["generation"] != self._pinned):
+            raise NotFound(f"No such object: {self.bucket.name}/{self.name}")
+        self._load(record)
+        return record
+
+    @property
+    def public_url(self):
+        return f"https://storage.googleapis.com/{self.bucket.name}/{self.name}"
+
+    def exists(self, client=None):
+        try:
+            self._record()
+            return True
+        except NotFound:
+            return False
+
+    def reload(self, client=None):
+        self._record()
+
+    def upload_from_string(self, data, content_type='text/plain', client=None, if_generation_match=None, **kwargs):
+        if isinstance(data, str):
+            data = data.encode('utf-8')
+        store = self.bucket.client.store
+        store.wait()
+        with store.lock:
+            if if_generation_match is not None:
+                current = store.objects.get((self.bucket.name, self.name))
+                if (current["generation"] if current else 0) != if_generation_match:
+                    raise PreconditionFailed(f"Generation mismatch for {self.bucket.name}/{self.name}")
+            store.generation += 1
+            record = {
+                "data": bytes(data),
+                "generation": store.generation,
+                "md5_hash": base64.b64encode(hashlib.md5(data).digest()).decode('ascii'),
+                "content_type": content_type,
+                "time_created": datetime.datetime.now(datetime.timezone.utc),
+                "metadata": self.metadata,
+            }
+            store.objects[(self.bucket.name, self.name)] = record
+        self._load(record)
+
+    def upload_from_file(self, file_obj, content_type=None, client=None, **kwargs):
+        self.upload_from_string(file_obj.read(), content_type=content_type or 'application/octet-stream', **kwargs)
+
+    def upload_from_filename(self, filename, content_type=None, client=None, **kwargs):
+        with open(filename, 'rb') as f:
+            self.upload_from_file(f, content_type=content_type, **kwargs)
+
+    def download_as_bytes(self, client=None, **kwargs):
+        return self._record()["data"]
+
+    def download_as_string(self, client=None, **kwargs):
+        return self.download_as_bytes()
+
+    def download_as_text(self, client=None, encoding='utf-8', **kwargs):
+        return self.download_as_bytes().decode(encoding)
+
+    def download_to_file(self, file_obj, client=None, **kwargs):
+        file_obj.write(self.download_as_bytes())
+
+    def download_to_filename(self, filename, client=None, **kwargs):
+        with open(filename, 'wb') as f:
+            self.download_to_file(f)
+
+    def delete(self, client=None):
+        store = self.bucket.client.store
+        store.wait()
+        with store.lock:
+            if store.objects.pop((self.bucket.name, self.name), None) is None:
+                raise NotFound(f"No such object: {self.bucket.name}/{self.name}")
+
+
+class Bucket:
+    def __init__(self, client, name):
+        self.client = client
+        self.name = name
+
+    def blob(self, blob_name, generation=None, **kwargs):
+        return Blob(blob_name, self, generation)
+
+    def get_blob(self, blob_name, client=None, **kwargs):
+        blob = Blob(blob_name, self)
+        return blob if blob.exists() else None
+
+    def list_blobs(self, prefix=None, max_results=None, client=None, **kwargs):
+        store = self.client.store
+        store.wait()
+        with store.lock:
+            records = sorted(
+                (name, record) for (bucket, name), record in store.objects.items()
+                if bucket == self.name and name.startswith(prefix or "")
+            )
+        if max_results is not None:
+            records = records[:max_results]
+        return iter([Blob(name, self)._load(record) for name, record in records])
+
+    def delete_blob(self, blob_name, client=None, **kwargs):
+        Blob(blob_name, self).delete()
+
+    def exists(self, client=None):
+        return True
+
+
+class Client:
+    """In-memory stand-in for google.cloud.storage.Client.
+
+    Covers the bucket/blob calls used across lib/: blob(), list_blobs(),
+    upload_from_*, download_*, exists() and the name/generation/md5_hash/
+    time_created attributes. Every bucket implicitly exists. `latency` adds a
+    fixed delay to each simulated request.
+    """
+
+    def __init__(self, project=None, latency=0.0, store=None, **kwargs):
+        self.project = project or "fake-project"
+        self.store = store or _Store(latency)
+
+    def bucket(self, bucket_name, user_project=None):
+        return Bucket(self, bucket_name)
+
+    def get_bucket(self, bucket_or_name, **kwargs):
+        return self.bucket(getattr(bucket_or_name, 'name', bucket_or_name))
+
+    def lookup_bucket(self, bucket_name, **kwargs):
+        return self.bucket(bucket_name)
+
+    def list_blobs(self, bucket_or_name, prefix=None, max_results=None, **kwargs):
+        return self.get_bucket(bucket_or_name).list_blobs(prefix=prefix, max_results=max_results)
+
+
+def install(client=None):
+    """Make google.cloud.storage.Client() return `client` (a shared fake) and return it"""
+    from google.cloud import storage
+    client = client or Client()
+    storage.Client = lambda *args, **kwargs: client
+    return client
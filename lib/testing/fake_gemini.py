@@ -0,0 +1,112 @@
+import time
+import threading
+
+
+class _Chunk:
+    def __init__(self, text):
+        self.text = text
+
+
+class FakeResponse:
+    """Looks like a google.generativeai response: .text, or iterate chunks when streamed"""
+
+    def __init__(self, model, reply, stream):
+        self._model = model
+        self._reply = reply
+        self._stream = stream
+        self._text = None if stream else reply
+
+    def __iter__(self):
+        words = self._reply.split(' ')
+        per_chunk = self._model.words_per_chunk
+        for i in range(0, len(words), per_chunk):
+            time.sleep(self._model.token_latency * len(words[i:i + per_chunk]))
+            yield _Chunk(' '.join(words[i:i + per_chunk]) + (' ' if i + per_chunk < len(words) else ''))
+        self._text = self._reply
+
+    @property
+    def text(self):
+        if self._text is None:
+            self._text = "".join(chunk.text for chunk in self)
+        return self._text
+
+
+class FakeChat:
+    def __init__(self, model, history=None):
+        self.model = model
+        self.history = list(history or [])
+
+    def send_message(self, content, stream=False, **kwargs):
+        response = self.model.generate_content(content, stream=stream)
+        self.history.append({"role": "user", "parts": [content]})
+        self.history.append({"role": "model", "parts": [self.model.last_reply]})
+        return response
+
+
+class FakeGemini:
+    """Configurable stand-in for google.generativeai.GenerativeModel.
+
+    Replies are deterministic and sized by `reply_sentences` x `sentence_words`.
+    Each call waits `first_token_latency`, then `token_latency` per word as it
+    is yielded (all up front when not streaming), approximating real
+    time-to-first-token and generation speed.
+    """
+
+    def __init__(self, first_token_latency=0.3, token_latency=0.01, reply_sentences=3, sentence_words=12,
+                 words_per_chunk=4):
+        self.first_token_latency = first_token_latency
+        self.token_latency = token_latency
+        self.reply_sentences = reply_sentences
+        self.sentence_words = sentence_words
+        self.words_per_chunk = words_per_chunk
+        self.requests = 0
+        self.prompt_chars = 0
+        self._lock = threading.Lock()
+
+    def reply_for(self, content):
+        topic = " ".join(str(content).split()[:4]) or "that"
+        filler = "and I remember it fondly from all those years ago with you".split()
+        sentences = []
+        for i in range(self.reply_sentences):
+            words = [f"About {topic}"] + [filler[(i + j) % len(filler)] for j in range(self.sentence_words - 2)]
+            sentences.append(" ".join(words) + ".")
+        return " ".join(sentences)
+
+    def model(self, model_name=None, system_instruction=None, **kwargs):
+        return FakeGenerativeModel(self, model_name, system_instruction)
+
+    def install(self):
+        """Patch google.generativeai so GenerativeModel(...) returns models backed by this fake"""
+        import google.generativeai as genai
+        genai.GenerativeModel = self.model
+        genai.configure = lambda *args, **kwargs: None
+        return self
+
+
+class FakeGenerativeModel:
+    def __init__(self, fake, model_name=None, system_instruction=None):
+        self.fake = fake
+        self.model_name = model_name
+        self.system_instruction = system_instruction
+        self.last_reply = None
+
+    @property
+    def words_per_chunk(self):
+        return self.fake.words_per_chunk
+
+    @property
+    def token_latency(self):
+        return self.fake.token_latency
+
+    def start_chat(self, history=None, **kwargs):
+        return FakeChat(self, history)
+
+    def generate_content(self, contents, stream=False, **kwargs):
+        with self.fake._lock:
+            self.fake.requests += 1
+            self.fake.prompt_chars += len(str(contents)) + len(self.system_instruction or "")
+        time.sleep(self.fake.first_token_latency)
+        self.last_reply = self.fake.reply_for(contents)
+        if not stream:
+            time.sleep(self.fake.token_latency * len(self.last_reply.split(' ')))
+        return FakeResponse(self, self.last_reply, stream)
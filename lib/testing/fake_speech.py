@@ -0,0 +1,111 @@
+import time
+import threading
+from types import SimpleNamespace
+
+try:
+    from google.api_core.exceptions import InvalidArgument, OutOfRange
+except ImportError:
+    class InvalidArgument(Exception):
+        pass
+
+    class OutOfRange(Exception):
+        pass
+
+
+def _response(transcripts):
+    return SimpleNamespace(results=[
+        SimpleNamespace(alternatives=[SimpleNamespace(transcript=text, confidence=0.9)], is_final=True)
+        for text in transcripts
+    ])
+
+
+class FakeOperation:
+    def __init__(self, response, latency):
+        self._response = response
+        self._latency = latency
+
+    def result(self, timeout=None):
+        if self._latency:
+            time.sleep(min(self._latency, timeout) if timeout else self._latency)
+        return self._response
+
+
+class FakeSpeechClient:
+    """Offline stand-in for speech_v1.SpeechClient.
+
+    Audio duration is estimated from byte counts at `bytes_per_second`, and the
+    real service limits are enforced: sync recognize rejects clips over
+    `sync_limit_seconds` and a streaming session fails past
+    `streaming_limit_seconds`. Transcripts are deterministic, one phrase per
+    `segment_seconds` of audio. `calls` counts requests per mode.
+    """
+
+    def __init__(self, bytes_per_second=16000, sync_limit_seconds=60, streaming_limit_seconds=305,
+                 segment_seconds=10, latency=0.0, long_running_latency=0.0):
+        self.bytes_per_second = bytes_per_second
+        self.sync_limit_seconds = sync_limit_seconds
+        self.streaming_limit_seconds = streaming_limit_seconds
+        self.segment_seconds = segment_seconds
+        self.latency = latency
+        self.long_running_latency = long_running_latency
+        self.calls = {"recognize": 0, "long_running_recognize": 0, "streaming_recognize": 0}
+        self.bytes_received = 0
+        self._lock = threading.Lock()
+
+    def _count(self, method, size):
+        with self._lock:
+            self.calls[method] += 1
+            self.bytes_received += size
+
+    def _transcripts(self, start_seconds, seconds):
+        count = max(1, int(seconds // self.segment_seconds) + (1 if seconds % self.segment_seconds else 0))
+        return [
+            f"speech from {start_seconds + i * self.segment_seconds:.0f} seconds"
+            for i in range(count)
+        ]
+
+    def _seconds(self, audio):
+        content = getattr(audio, 'content', b'') or b''
+        if getattr(audio, 'uri', None) and not content:
+            # gs:// audio: the fake has no bucket access, treat it as an hour-long interview
+            return 3600.0, 0
+        return len(content) / self.bytes_per_second, len(content)
+
+    def recognize(self, config=None, audio=None, **kwargs):
+        seconds, size = self._seconds(audio)
+        self._count("recognize", size)
+        if seconds > self.sync_limit_seconds:
+            raise InvalidArgument("Sync input too long. For audio longer than 1 min use LongRunningRecognize "
+                                  "with a 'uri' parameter.")
+        if self.latency:
+            time.sleep(self.latency)
+        return _response(self._transcripts(0, seconds))
+
+    def long_running_recognize(self, config=None, audio=None, **kwargs):
+        seconds, size = self._seconds(audio)
+        self._count("long_running_recognize", size)
+        return FakeOperation(_response(self._transcripts(0, seconds)), self.long_running_latency)
+
+    def streaming_recognize(self, config=None, requests=None, **kwargs):
+        """Yield a final result for every segment_seconds of audio as it is received"""
+        self._count("streaming_recognize", 0)
+        segment_bytes = self.segment_seconds * self.bytes_per_second
+        received = 0
+        pending = 0
+        for request in requests:
+            chunk = getattr(request, 'audio_content', b'') or b''
+            received += len(chunk)
+            pending += len(chunk)
+            with self._lock:
+                self.bytes_received += len(chunk)
+            if received / self.bytes_per_second > self.streaming_limit_seconds:
+                raise OutOfRange("Exceeded maximum allowed stream duration of 305 seconds.")
+            while pending >= segment_bytes:
+                start = (received - pending) / self.bytes_per_second
+                pending -= segment_bytes
+                if self.latency:
+                    time.sleep(self.latency)
+                yield _response(self._transcripts(start, self.segment_seconds)[:1])
+        if pending:
+            yield _response(self._transcripts((received - pending) / self.bytes_per_second,
+                                              pending / self.bytes_per_second)[:1])
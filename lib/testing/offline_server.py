@@ -0,0 +1,77 @@
+#!/usr/bin/env python3
+"""Run socket_server.py against local fakes for GCS, Gemini and ElevenLabs.
+
+Nothing leaves the machine: storage.Client() returns a seeded in-memory
+bucket, genai.GenerativeModel returns FakeGemini models, and ElevenLabs
+calls go to a FakeElevenLabsServer on a free local port. Users are seeded as
+loadtest-0000 .. loadtest-NNNN with a profile, name and voice ID.
+
+    python3 lib/testing/offline_server.py --port 8765 --users 100
+"""
+import os
+import sys
+import json
+import argparse
+
+ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.join(ROOT, 'lib', 'audio'))
+sys.path.insert(0, os.path.join(ROOT, 'lib'))
+sys.path.insert(0, ROOT)
+
+from lib.testing import fake_gcs  # noqa: E402
+from lib.testing.fake_gemini import FakeGemini  # noqa: E402
+from lib.testing.fake_elevenlabs import FakeElevenLabsServer  # noqa: E402
+
+LOADTEST_USER = "loadtest-{index:04d}"
+
+
+def seed_users(client, bucket_name, users):
+    bucket = client.bucket(bucket_name)
+    for index in range(users):
+        user_id = LOADTEST_USER.format(index=index)
+        bucket.blob(f"{user_id}/voice_id/voice_id.json").upload_from_string(
+            json.dumps({"voice_id": f"fake-voice-{index}"}), content_type='application/json')
+        bucket.blob(f"{user_id}/metadata.json").upload_from_string(
+            json.dumps({"name": f"Load Test {index}"}), content_type='application/json')
+        bucket.blob(f"{user_id}/profile.txt").upload_from_string(
+            "Grew up by the sea, loved gardening, told long stories about the old house.")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--users', type=int, default=100, help='users to seed in the fake bucket')
+    parser.add_argument('--gcs-latency', type=float, default=0.02, help='seconds per fake GCS request')
+    parser.add_argument('--first-token-latency', type=float, default=0.3)
+    parser.add_argument('--token-latency', type=float, default=0.01, help='seconds per generated word')
+    parser.add_argument('--reply-sentences', type=int, default=3)
+    parser.add_argument('--tts-first-byte', type=float, default=0.15, help='fake ElevenLabs time to first byte')
+    parser.add_argument('--tts-chunk-interval', type=float, default=0.005)
+    parser.add_argument('--tts-cache', action='store_true', help='leave the synthesis cache enabled')
+    args = parser.parse_args()
+
+    tts = FakeElevenLabsServer(first_byte_latency=args.tts_first_byte, chunk_interval=args.tts_chunk_interval).start()
+    # Read at import time by elevenlabs_client / tts_cache / conversation_handler
+    os.environ['ELEVENLABS_API_BASE'] = tts.url
+    os.environ.setdefault('ELEVEN_LABS_API', 'offline')
+    os.environ['CONVERSATION_PERSIST_BACKEND'] = 'off'
+    if not args.tts_cache:
+        os.environ['TTS_CACHE_ENABLED'] = '0'
+
+    client = fake_gcs.install(fake_gcs.Client(latency=args.gcs_latency))
+    seed_users(client, os.getenv('GCP_BUCKET_NAME', 'memorial-voices'), args.users)
+    FakeGemini(
+        first_token_latency=args.first_token_latency,
+        token_latency=args.token_latency,
+        reply_sentences=args.reply_sentences
+    ).install()
+    print(f"Offline fakes ready: ElevenLabs at {tts.url}, {args.users} users seeded")
+
+    import socket_server
+    socket_server.run_worker(args.host, args.port)
+    tts.stop()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,63 @@
+#!/usr/bin/env python3
+"""Compare scipy's FFT resampler with the streaming polyphase resampler.
+
+Synthetic noise recordings are resampled to 16 kHz with both
+`scipy.signal.resample` (whole-signal FFT) and `lib/audio/resample.py`
+(fixed-size blocks). Wall time and peak traced allocation are reported for
+each. The "+1" lengths add one sample to each recording; that makes the FFT
+length awkward, which is the case where the FFT resampler slows down most.
+
+    python3 scripts/bench_resample.py --minutes 10 30 60
+"""
+import os
+import sys
+import time
+import argparse
+import tracemalloc
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'lib', 'audio'))
+from resample import DEFAULT_BLOCK_SIZE, resample  # noqa: E402
+
+
+def measure(fn):
+    """Time fn untraced, then run it again under tracemalloc for its peak allocation"""
+    start = time.perf_counter()
+    fn()
+    elapsed = time.perf_counter() - start
+    tracemalloc.start()
+    fn()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return elapsed, peak / (1024 * 1024)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--minutes', type=float, nargs='+', default=[10, 30])
+    parser.add_argument('--rates', type=int, nargs='+', default=[44100, 48000])
+    parser.add_argument('--block-size', type=int, default=DEFAULT_BLOCK_SIZE)
+    parser.add_argument('--skip-fft', action='store_true', help='Only run the streaming resampler')
+    args = parser.parse_args()
+
+    from scipy import signal
+
+    rng = np.random.default_rng(0)
+    print(f"{'input':<22} {'method':<10} {'seconds':>9} {'peak MiB':>9}")
+    for minutes in args.minutes:
+        for rate in args.rates:
+            for extra in (0, 1):
+                samples = int(minutes * 60 * rate) + extra
+                audio = rng.standard_normal(samples, dtype=np.float32) * 0.1
+                label = f"{minutes:g}min@{rate}{'+1' if extra else ''}"
+                target = int(samples * 16000 / rate)
+
+                if not args.skip_fft:
+                    elapsed, peak = measure(lambda: signal.resample(audio, target))
+                    print(f"{label:<22} {'fft':<10} {elapsed:>9.2f} {peak:>9.1f}")
+                elapsed, peak = measure(lambda: resample(audio, rate, 16000, block_size=args.block_size))
+                print(f"{label:<22} {'polyphase':<10} {elapsed:>9.2f} {peak:>9.1f}")
+
+
+if __name__ == '__main__':
+    main()
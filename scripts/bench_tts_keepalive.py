@@ -0,0 +1,98 @@
+#!/usr/bin/env python3
+"""Show the connection-setup savings of the pooled ElevenLabs client.
+
+Runs N sequential TTS requests against a local fake ElevenLabs server, once
+with a bare `requests.post` per call (a new connection each time, as
+text_to_voice used to do) and once through ElevenLabsClient's keep-alive
+session. With --tls the fake server uses a throwaway self-signed certificate,
+so the numbers include the TLS handshake as well (requires openssl).
+
+    python3 scripts/bench_tts_keepalive.py --requests 200 --tls
+"""
+import os
+import sys
+import ssl
+import time
+import argparse
+import tempfile
+import statistics
+import subprocess
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, 'lib', 'audio'))
+sys.path.insert(0, ROOT)
+
+import requests  # noqa: E402
+from elevenlabs_client import DEFAULT_MODEL_ID, DEFAULT_VOICE_SETTINGS, ElevenLabsClient  # noqa: E402
+from lib.testing.fake_elevenlabs import FakeElevenLabsServer  # noqa: E402
+
+TEXT = "I remember the summer we drove to the lake."
+
+
+def make_tls_context(workdir):
+    cert = os.path.join(workdir, 'cert.pem')
+    key = os.path.join(workdir, 'key.pem')
+    subprocess.run([
+        'openssl', 'req', '-x509', '-newkey', 'rsa:2048', '-nodes', '-days', '1',
+        '-keyout', key, '-out', cert, '-subj', '/CN=127.0.0.1',
+        '-addext', 'subjectAltName=IP:127.0.0.1'
+    ], check=True, capture_output=True)
+    context = ssl.SSLContext(ssl.PROTOCOL_TLS_SERVER)
+    context.load_cert_chain(cert, key)
+    return context, cert
+
+
+def bare_post(url):
+    response = requests.post(
+        f"{url}/v1/text-to-speech/fake-voice",
+        headers={"xi-api-key": "fake", "Content-Type": "application/json"},
+        json={"text": TEXT, "model_id": DEFAULT_MODEL_ID, "voice_settings": DEFAULT_VOICE_SETTINGS},
+    )
+    response.raise_for_status()
+    return response.content
+
+
+def run(label, fn, count):
+    samples = []
+    for _ in range(count):
+        start = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - start) * 1000)
+    samples.sort()
+    p95 = samples[int(len(samples) * 0.95) - 1]
+    print(f"{label:<18} mean={statistics.mean(samples):7.2f}ms p50={statistics.median(samples):7.2f}ms "
+          f"p95={p95:7.2f}ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--requests', type=int, default=100)
+    parser.add_argument('--tls', action='store_true', help='Serve the fake API over TLS')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as workdir:
+        context = None
+        if args.tls:
+            context, cert = make_tls_context(workdir)
+            os.environ['REQUESTS_CA_BUNDLE'] = cert
+
+        with FakeElevenLabsServer(ssl_context=context) as server:
+            client = ElevenLabsClient(api_key='fake', base_url=server.url)
+            # Warm both paths once so imports and the first pooled connection are excluded
+            bare_post(server.url)
+            client.synthesize('fake-voice', TEXT)
+
+            before = server.connections
+            run('requests.post', lambda: bare_post(server.url), args.requests)
+            bare_connections = server.connections - before
+
+            before = server.connections
+            run('pooled client', lambda: client.synthesize('fake-voice', TEXT), args.requests)
+            pooled_connections = server.connections - before
+            client.close()
+
+    print(f"connections opened: requests.post={bare_connections} pooled client={pooled_connections}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,63 @@
+#!/usr/bin/env python3
+"""Measure how long `create_voice.py` takes to become ready to work.
+
+Each sample runs in a fresh interpreter, the same way the voice/create route
+spawns it. The "common" path imports the module and constructs VoiceCreator;
+the "with-models" path additionally touches `.model` to force Wav2Vec2 to load.
+
+    python3 scripts/bench_voice_startup.py --runs 5
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import statistics
+import subprocess
+
+AUDIO_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'lib', 'audio')
+
+SNIPPETS = {
+    'common': (
+        "import sys, json; sys.path.insert(0, {audio_dir!r}); "
+        "import create_voice; create_voice.VoiceCreator(); "
+        "print(json.dumps({{'torch': 'torch' in sys.modules, 'transformers': 'transformers' in sys.modules}}))"
+    ),
+    'with-models': (
+        "import sys, json; sys.path.insert(0, {audio_dir!r}); "
+        "import create_voice; create_voice.VoiceCreator().model; "
+        "print(json.dumps({{'torch': 'torch' in sys.modules, 'transformers': 'transformers' in sys.modules}}))"
+    ),
+}
+
+
+def time_snippet(code):
+    start = time.perf_counter()
+    result = subprocess.run([sys.executable, '-c', code], capture_output=True, text=True)
+    elapsed = time.perf_counter() - start
+    if result.returncode != 0:
+        raise RuntimeError(result.stderr.strip())
+    return elapsed, json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--runs', type=int, default=5, help='Fresh interpreters per scenario')
+    parser.add_argument('--skip-models', action='store_true', help='Only time the common path')
+    args = parser.parse_args()
+
+    scenarios = ['common'] if args.skip_models else ['common', 'with-models']
+    for name in scenarios:
+        code = SNIPPETS[name].format(audio_dir=AUDIO_DIR)
+        samples = []
+        loaded = None
+        for _ in range(args.runs):
+            elapsed, loaded = time_snippet(code)
+            samples.append(elapsed)
+        print(f"{name:<12} median={statistics.median(samples):.3f}s "
+              f"min={min(samples):.3f}s max={max(samples):.3f}s "
+              f"torch_imported={loaded['torch']} transformers_imported={loaded['transformers']}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,67 @@
+#!/usr/bin/env python3
+"""Measure wav2vec2 CPU transcription throughput in seconds of audio per wall-second.
+
+Runs `lib/audio/wav2vec2_transcriber.py` over the given recordings (or a
+synthetic mix of clip lengths when none are given) for every combination of
+--threads and --max-batch. --max-batch 1 is the unbatched baseline. The model
+is loaded and warmed up once before timing, and each configuration is timed
+over --repeat passes with the best pass reported.
+
+    python3 scripts/bench_wav2vec2.py --threads 1 4 8 --max-batch 1 8 16
+    python3 scripts/bench_wav2vec2.py --audio recordings/*.mp3 --threads 4
+"""
+import os
+import sys
+import time
+import argparse
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'lib', 'audio'))
+from wav2vec2_transcriber import SAMPLE_RATE, Wav2Vec2Transcriber, to_float  # noqa: E402
+from create_voice import transcode_audio  # noqa: E402
+
+
+def synthetic_clips(lengths, seed=0):
+    """Noise-modulated tones; the model output is meaningless but the compute is the same as speech"""
+    rng = np.random.default_rng(seed)
+    clips = []
+    for seconds in lengths:
+        t = np.arange(int(seconds * SAMPLE_RATE)) / SAMPLE_RATE
+        envelope = 0.5 + 0.5 * np.sin(2 * np.pi * 3 * t)
+        clips.append((0.1 * envelope * (np.sin(2 * np.pi * 220 * t) + rng.standard_normal(len(t)))).astype(np.float32))
+    return clips
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--audio', nargs='*', help='recordings to transcribe (default: synthetic clips)')
+    parser.add_argument('--lengths', type=float, nargs='+', default=[3, 5, 8, 12, 15, 20, 30, 45, 60, 90],
+                        help='synthetic clip lengths in seconds')
+    parser.add_argument('--threads', type=int, nargs='+', default=[os.cpu_count() or 1])
+    parser.add_argument('--max-batch', type=int, nargs='+', default=[1, 8, 16])
+    parser.add_argument('--repeat', type=int, default=2)
+    args = parser.parse_args()
+
+    if args.audio:
+        clips = [to_float(audio) for audio in map(transcode_audio, args.audio) if audio is not None]
+    else:
+        clips = synthetic_clips(args.lengths)
+    audio_seconds = sum(len(clip) for clip in clips) / SAMPLE_RATE
+    print(f"{len(clips)} clips, {audio_seconds:.1f}s of audio")
+
+    Wav2Vec2Transcriber(threads=args.threads[0]).transcribe_arrays(clips[:1])
+    print(f"{'threads':>7} {'max batch':>9} {'wall s':>8} {'audio s/s':>10}")
+    for threads in args.threads:
+        for max_batch in args.max_batch:
+            transcriber = Wav2Vec2Transcriber(threads=threads, max_batch=max_batch)
+            best = None
+            for _ in range(args.repeat):
+                start = time.perf_counter()
+                transcriber.transcribe_arrays(clips)
+                elapsed = time.perf_counter() - start
+                best = elapsed if best is None else min(best, elapsed)
+            print(f"{threads:>7} {max_batch:>9} {best:>8.2f} {audio_seconds / best:>10.1f}")
+
+
+if __name__ == '__main__':
+    main()
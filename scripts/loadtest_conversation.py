@@ -0,0 +1,233 @@
+#!/usr/bin/env python3
+"""Load-test the conversation WebSocket server with N simulated users.
+
+Each user connects, sends start_conversation, then runs --turns user_message
+turns with --think-time between them. Reports throughput and p50/p95/p99 of
+turn latency (message sent -> turn finished) and time to first audio.
+
+Without --url the server is started offline via lib/testing/offline_server.py
+(fake GCS, Gemini and ElevenLabs; no paid services), so this can run in CI.
+Threshold flags make the exit status non-zero when a run regresses.
+
+    python3 scripts/loadtest_conversation.py --users 50 --turns 5 --stream
+    python3 scripts/loadtest_conversation.py --url ws://localhost:8080 --users 10 --framing
+    python3 scripts/loadtest_conversation.py --users 50 --max-p95-turn 4 --max-error-rate 0.01
+"""
+import os
+import sys
+import json
+import math
+import time
+import signal
+import socket
+import asyncio
+import argparse
+import subprocess
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, 'lib', 'audio'))
+sys.path.insert(0, ROOT)
+
+import websockets  # noqa: E402
+from audio_framing import FLAG_EOS, decode_frame  # noqa: E402
+from lib.testing.offline_server import LOADTEST_USER  # noqa: E402
+
+OFFLINE_SERVER = os.path.join(ROOT, 'lib', 'testing', 'offline_server.py')
+QUESTIONS = [
+    "What was your favourite place to go on holiday?",
+    "Tell me about the garden.",
+    "What did you cook on Sundays?",
+    "How did you meet everyone at the harbour?",
+]
+
+
+class TurnError(Exception):
+    pass
+
+
+def percentile(values, pct):
+    """Nearest-rank percentile; None for an empty list"""
+    if not values:
+        return None
+    ordered = sorted(values)
+    rank = max(0, min(len(ordered) - 1, math.ceil(pct / 100 * len(ordered)) - 1))
+    return ordered[rank]
+
+
+async def run_turn(websocket, text, stream, framing, timeout):
+    """Send one user_message and wait for the turn to finish; returns (latency, first_audio)"""
+    start = time.perf_counter()
+    first_audio = None
+    await websocket.send(json.dumps({"type": "user_message", "text": text, "stream": stream}))
+    while True:
+        message = await asyncio.wait_for(websocket.recv(), timeout)
+        now = time.perf_counter() - start
+        if isinstance(message, bytes):
+            if framing:
+                frame = decode_frame(message)
+                if first_audio is None and frame.payload:
+                    first_audio = now
+                await websocket.send(json.dumps({"type": "audio_ack", "stream_id": frame.stream_id, "seq": frame.seq}))
+                if frame.flags & FLAG_EOS and not stream:
+                    return now, first_audio
+            else:
+                if first_audio is None:
+                    first_audio = now
+                if not stream:
+                    return now, first_audio
+            continue
+
+        data = json.loads(message)
+        if data.get("type") == "assistant_turn_complete":
+            return now, first_audio
+        if data.get("type") == "error":
+            raise TurnError(data.get("message"))
+
+
+async def run_user(index, args, results):
+    user_id = LOADTEST_USER.format(index=index % args.seeded_users)
+    await asyncio.sleep(args.ramp_up * index / max(args.users, 1))
+    try:
+        async with websockets.connect(args.url, compression=None, max_size=None) as websocket:
+            await websocket.send(json.dumps({
+                "type": "start_conversation",
+                "user_id": user_id,
+                "audio_framing": args.framing
+            }))
+            while True:
+                data = json.loads(await asyncio.wait_for(websocket.recv(), args.timeout))
+                if data.get("type") == "conversation_started":
+                    break
+                if data.get("type") == "error":
+                    raise TurnError(data.get("message"))
+
+            for turn in range(args.turns):
+                text = QUESTIONS[(index + turn) % len(QUESTIONS)]
+                try:
+                    latency, first_audio = await run_turn(websocket, text, args.stream, args.framing, args.timeout)
+                    results["turns"].append(latency)
+                    if first_audio is not None:
+                        results["first_audio"].append(first_audio)
+                except (TurnError, asyncio.TimeoutError) as e:
+                    results["errors"].append(f"{user_id}: {type(e).__name__} {e}")
+                await asyncio.sleep(args.think_time)
+    except (OSError, TurnError, asyncio.TimeoutError, websockets.exceptions.WebSocketException) as e:
+        results["errors"].append(f"{user_id}: {type(e).__name__} {e}")
+
+
+async def run_load(args):
+    results = {"turns": [], "first_audio": [], "errors": []}
+    start = time.perf_counter()
+    await asyncio.gather(*(run_user(i, args, results) for i in range(args.users)))
+    elapsed = time.perf_counter() - start
+
+    attempted = args.users * args.turns
+    report = {
+        "users": args.users,
+        "turns_per_user": args.turns,
+        "mode": ("stream" if args.stream else "full") + ("+framing" if args.framing else ""),
+        "elapsed_s": round(elapsed, 3),
+        "turns_ok": len(results["turns"]),
+        "errors": len(results["errors"]),
+        "error_rate": round(1 - len(results["turns"]) / attempted, 4) if attempted else 0.0,
+        "throughput_turns_per_s": round(len(results["turns"]) / elapsed, 3) if elapsed else 0.0,
+    }
+    for name in ("turns", "first_audio"):
+        for pct in (50, 95, 99):
+            value = percentile(results[name], pct)
+            report[f"{name}_p{pct}_s"] = round(value, 4) if value is not None else None
+    report["sample_errors"] = results["errors"][:5]
+    return report
+
+
+def check_thresholds(report, args):
+    failures = []
+    if args.max_p95_turn is not None and (report["turns_p95_s"] or 0) > args.max_p95_turn:
+        failures.append(f"p95 turn latency {report['turns_p95_s']}s > {args.max_p95_turn}s")
+    if args.max_p95_first_audio is not None and (report["first_audio_p95_s"] or 0) > args.max_p95_first_audio:
+        failures.append(f"p95 time to first audio {report['first_audio_p95_s']}s > {args.max_p95_first_audio}s")
+    if args.min_throughput is not None and report["throughput_turns_per_s"] < args.min_throughput:
+        failures.append(f"throughput {report['throughput_turns_per_s']}/s < {args.min_throughput}/s")
+    if args.max_error_rate is not None and report["error_rate"] > args.max_error_rate:
+        failures.append(f"error rate {report['error_rate']} > {args.max_error_rate}")
+    return failures
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def start_offline_server(args):
+    port = free_port()
+    command = [
+        sys.executable, OFFLINE_SERVER, '--port', str(port), '--users', str(args.seeded_users),
+        '--first-token-latency', str(args.first_token_latency), '--token-latency', str(args.token_latency),
+        '--tts-first-byte', str(args.tts_first_byte), '--gcs-latency', str(args.gcs_latency)
+    ]
+    process = subprocess.Popen(command)
+    deadline = time.time() + 60
+    while time.time() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"offline server exited with {process.returncode}")
+        try:
+            socket.create_connection(('127.0.0.1', port), timeout=0.5).close()
+            return process, f"ws://127.0.0.1:{port}"
+        except OSError:
+            time.sleep(0.2)
+    process.kill()
+    raise RuntimeError("offline server did not start within 60s")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--url', help='server to test; omit to start an offline server with fakes')
+    parser.add_argument('--users', type=int, default=20)
+    parser.add_argument('--turns', type=int, default=3)
+    parser.add_argument('--stream', action='store_true', help='use sentence streaming turns')
+    parser.add_argument('--framing', action='store_true', help='opt in to framed, acked audio')
+    parser.add_argument('--think-time', type=float, default=0.5, help='pause between a user\'s turns')
+    parser.add_argument('--ramp-up', type=float, default=2.0, help='seconds over which users connect')
+    parser.add_argument('--timeout', type=float, default=60.0, help='per-message receive timeout')
+    parser.add_argument('--seeded-users', type=int, help='distinct user IDs (default: --users)')
+    parser.add_argument('--json', help='also write the report to this file')
+    offline = parser.add_argument_group('offline fakes')
+    offline.add_argument('--first-token-latency', type=float, default=0.3)
+    offline.add_argument('--token-latency', type=float, default=0.01)
+    offline.add_argument('--tts-first-byte', type=float, default=0.15)
+    offline.add_argument('--gcs-latency', type=float, default=0.02)
+    thresholds = parser.add_argument_group('regression thresholds')
+    thresholds.add_argument('--max-p95-turn', type=float)
+    thresholds.add_argument('--max-p95-first-audio', type=float)
+    thresholds.add_argument('--min-throughput', type=float)
+    thresholds.add_argument('--max-error-rate', type=float)
+    args = parser.parse_args()
+    args.seeded_users = args.seeded_users or args.users
+
+    process = None
+    if not args.url:
+        process, args.url = start_offline_server(args)
+    try:
+        report = asyncio.run(run_load(args))
+    finally:
+        if process is not None:
+            process.send_signal(signal.SIGTERM)
+            try:
+                process.wait(timeout=30)
+            except subprocess.TimeoutExpired:
+                process.kill()
+
+    print(json.dumps(report, indent=2))
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(report, f, indent=2)
+
+    failures = check_thresholds(report, args)
+    for failure in failures:
+        print(f"FAIL: {failure}", file=sys.stderr)
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == '__main__':
+    main()